@@ -0,0 +1,137 @@
+"""Archival tier for db.transactions.
+
+Transactions older than the horizon (rounded down to a month boundary) are
+moved into transactions_archive, one document per kid-month holding the
+entries array plus ledger totals, so the hot collection only keeps recent
+history. transaction_history() pages across both tiers newest-first.
+"""
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from reconcile import WALLET_FIELDS, ledger_contribution
+
+ENTRY_FIELDS = ("id", "type", "amount", "description", "category", "reference_id", "created_at")
+
+
+def archive_cutoff(horizon_days, now=None):
+    """ISO timestamp of the first day of the month the horizon falls in."""
+    edge = (now or datetime.now(timezone.utc)) - timedelta(days=horizon_days)
+    return edge.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
+
+
+async def ensure_indexes(db):
+    await db.transactions.create_index([("kid_id", 1), ("created_at", -1)])
+    await db.transactions.create_index("created_at")
+    await db.transactions.create_index("id")
+    await db.transactions_archive.create_index([("kid_id", 1), ("month", -1)], unique=True)
+
+
+def bucket_update(kid_id, month, entries):
+    totals = {field: 0 for field in WALLET_FIELDS}
+    for entry in entries:
+        for field, value in ledger_contribution(entry).items():
+            totals[field] += value
+    ids = [entry["id"] for entry in entries]
+    return UpdateOne(
+        {"kid_id": kid_id, "month": month, "entries.id": {"$nin": ids}},
+        {
+            "$push": {"entries": {"$each": entries, "$sort": {"created_at": -1}}},
+            "$inc": {"count": len(entries), **{f"totals.{field}": value for field, value in totals.items()}},
+            "$min": {"first_at": entries[-1]["created_at"]},
+            "$max": {"last_at": entries[0]["created_at"]},
+        },
+        upsert=True,
+    )
+
+
+async def _archived_ids(db, buckets):
+    """Ids from these (kid_id, month, entries) buckets that the archive already holds."""
+    ids = [entry["id"] for _, _, entries in buckets for entry in entries]
+    query = {"$or": [{"kid_id": kid_id, "month": month} for kid_id, month, _ in buckets], "entries.id": {"$in": ids}}
+    wanted = set(ids)
+    present = set()
+    async for bucket in db.transactions_archive.find(query, {"_id": 0, "entries": 1}):
+        present.update(entry["id"] for entry in bucket["entries"] if entry["id"] in wanted)
+    return present
+
+
+async def _flush(db, buckets):
+    if not buckets:
+        return
+    # An interrupted run can leave a bucket holding part of a batch, so
+    # only the missing entries are pushed.
+    present = await _archived_ids(db, buckets)
+    updates = []
+    for kid_id, month, entries in buckets:
+        missing = [entry for entry in entries if entry["id"] not in present]
+        if missing:
+            updates.append(bucket_update(kid_id, month, missing))
+    if updates:
+        try:
+            await db.transactions_archive.bulk_write(updates, ordered=False)
+        except BulkWriteError as exc:
+            # A concurrent run created the bucket first; whatever did not
+            # land stays in the hot collection for the next run.
+            if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                raise
+        present = await _archived_ids(db, buckets)
+    if present:
+        await db.transactions.delete_many({"id": {"$in": list(present)}})
+
+
+async def archive(db, horizon_days=365, batch=200):
+    """Move transactions older than the horizon into kid-month buckets."""
+    cutoff = archive_cutoff(horizon_days)
+    cursor = db.transactions.aggregate([
+        {"$match": {"created_at": {"$lt": cutoff}}},
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": {"kid_id": "$kid_id", "month": {"$substrBytes": ["$created_at", 0, 7]}},
+            "entries": {"$push": {field: f"${field}" for field in ENTRY_FIELDS}},
+        }},
+    ], allowDiskUse=True)
+    pending = []
+    buckets = moved = 0
+    async for bucket in cursor:
+        entries = bucket["entries"]
+        pending.append((bucket["_id"]["kid_id"], bucket["_id"]["month"], entries))
+        buckets += 1
+        moved += len(entries)
+        if len(pending) >= batch:
+            await _flush(db, pending)
+            pending = []
+    await _flush(db, pending)
+    return {"cutoff": cutoff, "buckets": buckets, "transactions_moved": moved}
+
+
+def _project(entry, projection):
+    fields = {k for k, v in projection.items() if v and k != "_id"}
+    return {k: v for k, v in entry.items() if k in fields} if fields else entry
+
+
+async def transaction_history(db, kid_id, limit, before=None, projection=None):
+    """Newest-first page of a kid's transactions, older than `before` if given."""
+    projection = projection or {"_id": 0}
+    query = {"kid_id": kid_id}
+    if before:
+        query["created_at"] = {"$lt": before}
+    page = await db.transactions.find(query, projection).sort("created_at", -1).limit(limit).to_list(limit)
+    if len(page) == limit:
+        return page
+    boundary = before
+    if page:
+        boundary = page[-1]["created_at"] if "created_at" in page[-1] else before
+    month_query = {"kid_id": kid_id}
+    if boundary:
+        month_query["month"] = {"$lte": boundary[:7]}
+    cursor = db.transactions_archive.find(month_query, {"_id": 0, "entries": 1}).sort("month", -1)
+    async for bucket in cursor:
+        for entry in bucket["entries"]:
+            if boundary and entry["created_at"] >= boundary:
+                continue
+            page.append(_project({"kid_id": kid_id, **entry}, projection))
+            if len(page) == limit:
+                return page
+    return page
@@ -0,0 +1,135 @@
+"""Maintenance commands for the Kids Money backend.
+
+Run from the backend directory: python cli.py --help
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+
+import archive as archival
+import datagen
+import money
+import onboarding
+import reconcile as ledger
+import rollups
+import rules
+from repository import open_repository
+from settings import Settings
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(no_args_is_help=True)
+
+
+@app.callback()
+def main():
+    """Kids Money maintenance commands."""
+
+
+def run(job):
+    db = open_repository(Settings.from_env())
+    try:
+        return asyncio.run(job(db))
+    finally:
+        db.close()
+
+
+def echo(report):
+    typer.echo(json.dumps(report, indent=2, default=str))
+
+
+@app.command()
+def reconcile(
+    chunks: int = typer.Option(16, help="Number of kid_id ranges to split the keyspace into"),
+    parallel: int = typer.Option(4, help="Ranges aggregated concurrently"),
+    repair: bool = typer.Option(False, "--repair", help="Overwrite drifted wallets with ledger totals"),
+    shard: str = typer.Option("0/1", help="Run only ranges i, i+n, ... as i/n, for multi-process runs"),
+):
+    """Verify wallet totals against the transaction log."""
+    index, total = (int(part) for part in shard.split("/"))
+    report = run(lambda db: ledger.reconcile(db, chunks=chunks, parallel=parallel, fix=repair, shard=index, shards=total))
+    echo(report)
+    if report["mismatches"] and not repair:
+        raise typer.Exit(code=1)
+
+
+@app.command("backfill-rollups")
+def backfill_rollups(kid_id: str = typer.Option(None, help="Only rebuild this kid's buckets")):
+    """Rebuild weekly/monthly rollups from the transaction log."""
+    echo(run(lambda db: rollups.backfill(db, kid_id)))
+
+
+@app.command("backfill-kid-names")
+def backfill_kid_names():
+    """Add the lowercase name key that kid listing and search sort on."""
+    echo(run(onboarding.backfill_names))
+
+
+@app.command("migrate-money")
+def migrate_money():
+    """Convert float amounts written before minor units to integer paise (run with the API stopped)."""
+    echo(run(money.migrate))
+
+
+@app.command()
+def archive(horizon_days: int = typer.Option(int(os.environ.get('TRANSACTION_ARCHIVE_DAYS', 365)), help="Keep this many days of history in the hot collection")):
+    """Move old transactions into monthly archive buckets."""
+    async def job(db):
+        await archival.ensure_indexes(db)
+        return await archival.archive(db, horizon_days)
+    echo(run(job))
+
+
+@app.command("import-kids")
+def import_kids(path: Path = typer.Argument(..., exists=True, dir_okay=False, help="CSV or JSON file of kid rows with a parent_email column")):
+    """Create kids, wallets and starting balances for existing parent accounts."""
+    from server import AVATARS
+
+    rows = onboarding.parse(path.read_bytes(), "json" if path.suffix.lower() == ".json" else "csv")
+    credit_initial = rules.load(Settings.from_env().rules_path or rules.DEFAULT_PATH).credit_initial
+
+    async def job(db):
+        summary = None
+        async for result in onboarding.run_import(db, rows, {a["id"] for a in AVATARS}, credit_initial):
+            typer.echo(json.dumps(result))
+            summary = result.get("summary", summary)
+        return summary
+
+    summary = run(job)
+    if summary["errors"]:
+        raise typer.Exit(code=1)
+
+
+@app.command("generate-data")
+def generate_data(
+    families: int = typer.Option(1000, help="Parent accounts to create"),
+    seed: int = typer.Option(1, help="Same seed, same documents"),
+    years: float = typer.Option(2, help="Years of history per kid"),
+    kids_per_family: int = typer.Option(4, help="Each family gets 1..N kids"),
+    tasks_per_month: int = typer.Option(30, help="Each kid gets N/4..N tasks a month"),
+    end: str = typer.Option(None, help="Last day of history as YYYY-MM-DD (default: today, UTC)"),
+    processes: int = typer.Option(os.cpu_count() or 4, help="Worker processes writing in parallel"),
+):
+    """Fill the database with synthetic families, wallets and years of history."""
+    settings = Settings.from_env()
+    if settings.backend == "memory":
+        raise typer.BadParameter("generate-data needs a MongoDB backend; the memory backend is per process")
+    from server import AVATARS, STORIES
+
+    day = datetime.strptime(end, "%Y-%m-%d") if end else datetime.now(timezone.utc)
+    options = datagen.Options(
+        kids_per_family=(1, kids_per_family), years=years,
+        tasks_per_month=(max(1, tasks_per_month // 4), tasks_per_month),
+    )
+    end_of_history = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    echo(datagen.generate(settings, families, seed, end_of_history, options, rules.load(rules.DEFAULT_PATH), STORIES, [a["id"] for a in AVATARS], processes))
+
+
+if __name__ == "__main__":
+    app()
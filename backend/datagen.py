@@ -0,0 +1,350 @@
+"""Synthetic families for load and query testing.
+
+Every family is simulated month by month from its own random.Random seeded
+with (seed, family index), so a run is reproducible and any slice of
+families can be generated independently: tasks created and approved,
+rejected with penalties or still open; monthly SIP and EMI payments and
+goal contributions while the wallet can afford them; loans approved along
+the way; quizzes answered. Documents use the same shapes the API writes
+(amounts in integer minor units), each wallet equals the sum of its kid's
+transactions exactly, XP, levels and credit scores follow the gamification
+rules, and rollups are built from the generated transactions. Families are split into ranges that worker
+processes write with unordered insert_many calls.
+"""
+import asyncio
+import math
+import random
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import bcrypt
+
+import quiz
+import rollups
+from money import SCALE, round_minor
+from repository import open_repository
+
+CHUNK_SIZE = 5000
+PASSWORD = "password"
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+COLLECTIONS = ("users", "kids", "wallets", "tasks", "goals", "sips", "loans", "learning_progress", "transactions", "rollups")
+
+FIRST_NAMES = ("Aarav", "Anaya", "Ben", "Chloe", "Diya", "Ethan", "Farah", "Gabriel", "Hana", "Ishaan", "Jade", "Kabir",
+               "Lena", "Mateo", "Nia", "Omar", "Priya", "Quinn", "Riya", "Sam", "Tara", "Uma", "Vihaan", "Zoe")
+FAMILY_NAMES = ("Shah", "Iyer", "Garcia", "Smith", "Khan", "Nguyen", "Okafor", "Rossi", "Tanaka", "Kumar", "Silva", "Brown")
+TASKS = ("Make your bed", "Feed the pet", "Homework", "Water the plants", "Tidy your room", "Read for 20 minutes",
+         "Help with dishes", "Take out the trash", "Practice piano", "Fold laundry")
+GOALS = ("New bicycle", "Video game", "Art set", "Football", "Lego set", "Headphones", "Books", "Gift for mom")
+LOAN_PURPOSES = ("Birthday present", "School trip", "Science kit", "Sports shoes")
+
+
+class Options(NamedTuple):
+    kids_per_family: tuple = (1, 4)
+    years: float = 2
+    tasks_per_month: tuple = (8, 30)
+    goals_per_kid: tuple = (1, 4)
+    sips_per_kid: tuple = (0, 2)
+    loans_per_kid: tuple = (0, 3)
+
+
+def iso(when):
+    return when.isoformat()
+
+
+def month_starts(start, end):
+    month = datetime(start.year, start.month, 1, tzinfo=timezone.utc)
+    while month < end:
+        yield month
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def emi_for(principal, rate, months):
+    monthly_rate = rate / 100 / 12
+    if monthly_rate > 0:
+        return principal * monthly_rate * math.pow(1 + monthly_rate, months) / (math.pow(1 + monthly_rate, months) - 1)
+    return principal / months
+
+
+def sip_value(sip):
+    monthly_rate = sip["interest_rate"] / 1200
+    if monthly_rate <= 0:
+        return sip["total_invested"]
+    return round_minor(sip["amount"] * ((1 + monthly_rate) ** sip["payments_made"] - 1) / monthly_rate * (1 + monthly_rate))
+
+
+class KidSimulation:
+    """One kid's history; events must be applied in time order."""
+
+    def __init__(self, rng, kid, parent_id, compiled, docs):
+        self.rng = rng
+        self.kid = kid
+        self.kid_id = kid["id"]
+        self.parent_id = parent_id
+        self.compiled = compiled
+        self.docs = docs
+        self.wallet = {"balance": 0, "total_earned": 0, "total_spent": 0, "total_saved": 0}
+        self.xp = 0
+        self.credit = compiled.credit_initial
+
+    def new_id(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def award(self, event=None, xp=0):
+        if event:
+            grant = self.compiled.award(event)
+            xp += grant.xp
+            self.credit = min(self.compiled.credit_max, max(self.compiled.credit_min, self.credit + grant.credit))
+        self.xp += xp
+
+    def transaction(self, txn_type, amount, description, category, reference_id, when, field=None):
+        if txn_type == "credit":
+            self.wallet["balance"] += amount
+            self.wallet["total_earned"] += amount
+        else:
+            self.wallet["balance"] -= amount
+            self.wallet[field or "total_spent"] += amount
+        self.docs["transactions"].append({
+            "id": self.new_id(), "kid_id": self.kid_id, "type": txn_type, "amount": amount, "description": description,
+            "category": category, "reference_id": reference_id, "created_at": iso(when),
+        })
+
+    def can_pay(self, amount):
+        return self.wallet["balance"] >= amount
+
+    def task(self, when, end):
+        rng = self.rng
+        title = rng.choice(TASKS)
+        task = {
+            "id": self.new_id(), "parent_id": self.parent_id, "kid_id": self.kid_id, "title": title, "description": None,
+            "reward_amount": SCALE * rng.choice((1, 2, 2, 5, 5, 10, 15, 20)), "penalty_amount": SCALE * rng.choice((0, 0, 0, 1, 2)),
+            "frequency": rng.choice(("one-time", "daily", "weekly")), "approval_required": rng.random() < 0.7,
+            "status": "pending", "created_at": iso(when),
+        }
+        roll = rng.random()
+        if end - when < timedelta(days=7):
+            task["status"] = "completed" if task["approval_required"] and roll < 0.5 else "pending"
+        elif roll < 0.85:
+            task["status"] = "approved"
+            done = when + timedelta(hours=rng.uniform(1, 48))
+            label = "Task approved" if task["approval_required"] else "Task reward"
+            self.transaction("credit", task["reward_amount"], f"{label}: {title}", "task", task["id"], done)
+            self.award("task_approved")
+        elif roll < 0.95 and task["approval_required"]:
+            task["status"] = "rejected"
+            if task["penalty_amount"] > 0 and self.can_pay(task["penalty_amount"]):
+                self.transaction("debit", task["penalty_amount"], f"Task penalty: {title}", "penalty", task["id"], when + timedelta(hours=24))
+            self.award("task_rejected")
+        self.docs["tasks"].append(task)
+
+    def goal(self, when):
+        goal = {
+            "id": self.new_id(), "kid_id": self.kid_id, "parent_id": self.parent_id, "title": self.rng.choice(GOALS),
+            "target_amount": SCALE * self.rng.choice((50, 100, 150, 250, 500)), "saved_amount": 0, "deadline": None,
+            "status": "active", "created_at": iso(when),
+        }
+        self.docs["goals"].append(goal)
+        return goal
+
+    def contribute(self, goal, when):
+        amount = min(SCALE * self.rng.choice((2, 5, 5, 10, 20)), self.wallet["balance"])
+        if amount <= 0:
+            return
+        goal["saved_amount"] += amount
+        if goal["saved_amount"] >= goal["target_amount"]:
+            goal["status"] = "completed"
+        self.transaction("debit", amount, f"Goal savings: {goal['title']}", "goal", goal["id"], when, "total_saved")
+        self.award("goal_contribution")
+
+    def sip(self, when):
+        sip = {
+            "id": self.new_id(), "kid_id": self.kid_id, "parent_id": self.parent_id, "amount": SCALE * self.rng.choice((5, 10, 20, 25)),
+            "interest_rate": float(self.rng.choice((0, 6, 8, 10, 12))), "frequency": "monthly", "total_invested": 0,
+            "current_value": 0, "payments_made": 0, "status": "active", "created_at": iso(when),
+        }
+        self.docs["sips"].append(sip)
+        return sip
+
+    def pay_sip(self, sip, when):
+        if not self.can_pay(sip["amount"]):
+            return
+        sip["payments_made"] += 1
+        sip["total_invested"] += sip["amount"]
+        sip["current_value"] = sip_value(sip)
+        self.transaction("debit", sip["amount"], f"SIP payment #{sip['payments_made']}", "sip", sip["id"], when, "total_saved")
+        self.award("sip_payment")
+
+    def loan(self, when):
+        principal = SCALE * self.rng.choice((20, 50, 100, 150, 200))
+        rate = float(self.rng.choice((0, 5, 10, 12)))
+        months = self.rng.choice((3, 6, 9, 12))
+        loan = {
+            "id": self.new_id(), "kid_id": self.kid_id, "parent_id": self.parent_id, "principal": principal, "interest_rate": rate,
+            "duration_months": months, "emi_amount": round_minor(emi_for(principal, rate, months)), "remaining_balance": principal,
+            "payments_made": 0, "purpose": self.rng.choice(LOAN_PURPOSES), "status": "active", "created_at": iso(when),
+        }
+        self.docs["loans"].append(loan)
+        self.transaction("credit", principal, f"Loan approved: {loan['purpose']}", "loan", loan["id"], when + timedelta(hours=2))
+        return loan
+
+    def pay_loan(self, loan, when):
+        pay = min(loan["emi_amount"], loan["remaining_balance"])
+        if not self.can_pay(pay):
+            return
+        loan["last_payment_amount"] = pay
+        loan["remaining_balance"] = max(0, loan["remaining_balance"] - pay)
+        loan["payments_made"] += 1
+        if loan["remaining_balance"] <= 0:
+            loan["status"] = "completed"
+        self.transaction("debit", pay, f"EMI payment #{loan['payments_made']}", "emi", loan["id"], when)
+        self.award("emi_payment")
+
+    def lesson(self, story, key, when):
+        answers = [question.correct if self.rng.random() < 0.75 else self.rng.randrange(question.options) for question in key]
+        results = quiz.grade(key, answers)
+        self.docs["learning_progress"].append({
+            "id": self.new_id(), "kid_id": self.kid_id, "story_id": story["id"], "completed_at": iso(when), "score": sum(results),
+            "answers": answers, "results": list(results), "graded_at": iso(when), "attempts": 1,
+        })
+        self.award(xp=story["reward_xp"])
+
+    def run(self, start, end, options, stories, answer_keys):
+        rng = self.rng
+        goals = [self.goal(start + timedelta(days=rng.uniform(0, 30))) for _ in range(rng.randint(*options.goals_per_kid))]
+        sips = [self.sip(start + timedelta(days=rng.uniform(0, 60))) for _ in range(rng.randint(*options.sips_per_kid))]
+        months = list(month_starts(start, end))
+        loan_months = {rng.randrange(len(months)) for _ in range(rng.randint(*options.loans_per_kid))}
+        lesson_months = {story["id"]: rng.randrange(len(months)) for story in stories if rng.random() < 0.7}
+        loans = []
+        for index, month in enumerate(months):
+            payday = max(month, start) + timedelta(days=1, hours=rng.uniform(8, 20))
+            if payday >= end:
+                break
+            for sip in sips:
+                if sip["created_at"] < iso(payday):
+                    self.pay_sip(sip, payday)
+            for loan in loans:
+                if loan["status"] == "active":
+                    self.pay_loan(loan, payday + timedelta(minutes=5))
+            for goal in goals:
+                if goal["status"] == "active" and goal["created_at"] < iso(payday) and rng.random() < 0.6:
+                    self.contribute(goal, payday + timedelta(minutes=10))
+            if index in loan_months:
+                loans.append(self.loan(payday + timedelta(hours=1)))
+            for story in stories:
+                if lesson_months.get(story["id"]) == index:
+                    self.lesson(story, answer_keys[story["id"]], payday + timedelta(days=rng.uniform(1, 25)))
+            month_end = min(months[index + 1] if index + 1 < len(months) else end, end)
+            span = (month_end - payday).total_seconds()
+            if span > 3600:
+                when = [payday + timedelta(seconds=rng.uniform(3600, span)) for _ in range(rng.randint(*options.tasks_per_month))]
+                for created in sorted(when):
+                    self.task(created, end)
+        for sip in sips:
+            if rng.random() < 0.1:
+                sip["status"] = "paused"
+
+        level = self.compiled.level_for_xp(self.xp)["level"]
+        self.kid.update({"xp": self.xp, "level": level, "credit_score": self.credit})
+        self.docs["wallets"].append({"id": self.new_id(), "kid_id": self.kid_id, **self.wallet})
+
+
+def family_documents(seed, index, end, options, compiled, stories, avatars, password_hash, docs=None):
+    """All documents for family number `index`, appended to docs by collection."""
+    rng = random.Random(f"{seed}:{index}")
+    docs = docs if docs is not None else defaultdict(list)
+    start = end - timedelta(days=365 * options.years)
+    surname = rng.choice(FAMILY_NAMES)
+    parent_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    docs["users"].append({
+        "id": parent_id, "email": f"parent{index}.s{seed}@example.test", "full_name": f"{rng.choice(FIRST_NAMES)} {surname}",
+        "password_hash": password_hash, "role": "parent", "created_at": iso(start - timedelta(days=rng.uniform(1, 30))),
+    })
+    answer_keys = quiz.answer_key(stories)
+    taken = set()
+    for _ in range(rng.randint(*options.kids_per_family)):
+        name = rng.choice([n for n in FIRST_NAMES if n not in taken])
+        taken.add(name)
+        kid = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "parent_id": parent_id, "name": name, "name_lower": name.lower(),
+            "age": rng.randint(5, 15), "avatar": rng.choice(avatars), "grade": None, "ui_theme": rng.choice(("neutral", "boy", "girl")),
+            "pin": f"{rng.randrange(10000):04d}", "level": 1, "xp": 0, "credit_score": compiled.credit_initial,
+            "created_at": iso(start),
+        }
+        docs["kids"].append(kid)
+        KidSimulation(rng, kid, parent_id, compiled, docs).run(start, end, options, stories, answer_keys)
+    return docs
+
+
+def rollup_documents(transactions):
+    buckets = {}
+    for txn in transactions:
+        when = datetime.fromisoformat(txn["created_at"])
+        field = "earned" if txn["type"] == "credit" else "spent"
+        for granularity in rollups.GRANULARITIES:
+            key = (txn["kid_id"], granularity, rollups.period_key(granularity, when), txn["category"])
+            bucket = buckets.setdefault(key, {"kid_id": key[0], "granularity": granularity, "period": key[2], "category": key[3], "earned": 0, "spent": 0, "count": 0})
+            bucket[field] += txn["amount"]
+            bucket["count"] += 1
+    return list(buckets.values())
+
+
+async def write(db, docs):
+    docs["rollups"] = rollup_documents(docs["transactions"])
+    await asyncio.gather(*(db[name].insert_many(docs[name], ordered=False) for name in COLLECTIONS if docs.get(name)))
+    return {name: len(docs.get(name, ())) for name in COLLECTIONS}
+
+
+async def populate(db, seed, start, stop, end, options, compiled, stories, avatars, password_hash, chunk_size=CHUNK_SIZE):
+    """Generate and insert families start..stop-1; returns document counts."""
+    counts = dict.fromkeys(COLLECTIONS, 0)
+    docs = defaultdict(list)
+    for index in range(start, stop):
+        family_documents(seed, index, end, options, compiled, stories, avatars, password_hash, docs)
+        if len(docs["transactions"]) + len(docs["tasks"]) >= chunk_size or index == stop - 1:
+            for name, written in (await write(db, docs)).items():
+                counts[name] += written
+            docs = defaultdict(list)
+    return counts
+
+
+def _populate_range(settings, *args):
+    db = open_repository(settings)
+    try:
+        return asyncio.run(populate(db, *args))
+    finally:
+        db.close()
+
+
+def ranges(total, parts):
+    step = max(1, math.ceil(total / parts))
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+
+def password_hash(seed):
+    """bcrypt hash of PASSWORD with a salt derived from the seed, computed once per run."""
+    rng = random.Random(f"{seed}:salt")
+    salt = "".join(rng.choice(BCRYPT_ALPHABET) for _ in range(21)) + rng.choice(".Oeu")
+    return bcrypt.hashpw(PASSWORD.encode(), f"$2b$12${salt}".encode()).decode()
+
+
+def generate(settings, families, seed, end, options, compiled, stories, avatars, processes=4):
+    """Write `families` synthetic families across worker processes."""
+    started = time.perf_counter()
+    hashed = password_hash(seed)
+    counts = dict.fromkeys(COLLECTIONS, 0)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(_populate_range, settings, seed, start, stop, end, options, compiled, stories, avatars, hashed)
+            for start, stop in ranges(families, processes * 4)
+        ]
+        for future in futures:
+            for name, written in future.result().items():
+                counts[name] += written
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    return {"families": families, "documents": total, "by_collection": counts, "seconds": round(elapsed, 2),
+            "documents_per_second": round(total / elapsed) if elapsed else None}
@@ -0,0 +1,108 @@
+"""Goal completion forecasts from recent contribution velocity.
+
+One aggregation sums each goal's "goal" transactions over a trailing
+window; the daily rate is that sum over the days the goal was open in the
+window, and project() turns rates into completion dates for all of a
+kid's goals in a single pass. ForecastCache keeps the result per kid,
+stamped with the goals' (id, saved_amount, target, deadline, status), so
+any contribution, new goal or deletion - from any worker - forces a
+recompute while repeat reads skip the aggregation.
+"""
+import math
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+GOAL_FIELDS = {"_id": 0, "id": 1, "title": 1, "target_amount": 1, "saved_amount": 1, "deadline": 1, "status": 1, "created_at": 1}
+
+
+def velocity_pipeline(kid_id, since):
+    return [
+        {"$match": {"kid_id": kid_id, "category": "goal", "created_at": {"$gte": since}}},
+        {"$group": {"_id": "$reference_id", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}, "last_at": {"$max": "$created_at"}}},
+    ]
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value[:10]) if value else None
+    except ValueError:
+        return None
+
+
+def project(goals, contributions, now, window_days):
+    today = now.date()
+    window_start = now - timedelta(days=window_days)
+    forecasts = []
+    for goal in goals:
+        opened = max(window_start, datetime.fromisoformat(goal["created_at"])) if goal.get("created_at") else window_start
+        days = max(1.0, (now - opened).total_seconds() / 86400)
+        recent = contributions.get(goal["id"], {})
+        rate = recent.get("amount", 0) / days
+        remaining = max(0, goal["target_amount"] - goal["saved_amount"])
+        deadline = parse_date(goal.get("deadline"))
+        if remaining == 0 or goal.get("status") == "completed":
+            projected, on_track = today, True
+        elif rate > 0:
+            projected = today + timedelta(days=math.ceil(round(remaining / rate, 6)))
+            on_track = projected <= deadline if deadline else None
+        else:
+            projected, on_track = None, False if deadline else None
+        days_left = (deadline - today).days if deadline else None
+        forecasts.append({
+            "goal_id": goal["id"],
+            "title": goal["title"],
+            "target_amount": goal["target_amount"],
+            "saved_amount": goal["saved_amount"],
+            "remaining": remaining,
+            "daily_rate": round(rate),
+            "contributions": recent.get("count", 0),
+            "last_contribution_at": recent.get("last_at"),
+            "projected_date": projected.isoformat() if projected else None,
+            "deadline": goal.get("deadline"),
+            "on_track": on_track,
+            "required_daily_rate": round(remaining / days_left) if days_left and days_left > 0 and remaining else None,
+            "status": goal.get("status", "active"),
+        })
+    return forecasts
+
+
+async def forecast_goals(db, kid_id, goals, window_days=90, now=None):
+    now = now or datetime.now(timezone.utc)
+    since = (now - timedelta(days=window_days)).isoformat()
+    rows = await db.transactions.aggregate(velocity_pipeline(kid_id, since)).to_list(None)
+    return project(goals, {row["_id"]: row for row in rows}, now, window_days)
+
+
+def goals_stamp(goals):
+    return tuple((g["id"], g["saved_amount"], g["target_amount"], g.get("deadline"), g.get("status")) for g in goals)
+
+
+class ForecastCache:
+    def __init__(self, window_days=90, ttl=3600, max_kids=10000, clock=time.monotonic):
+        self.window_days = window_days
+        self.ttl = ttl
+        self.max_kids = max_kids
+        self.clock = clock
+        self._entries = OrderedDict()
+
+    async def get(self, db, kid_id):
+        goals = await db.goals.find({"kid_id": kid_id}, GOAL_FIELDS).sort("created_at", 1).to_list(100)
+        stamp = goals_stamp(goals)
+        now = self.clock()
+        entry = self._entries.get(kid_id)
+        if entry and entry[0] == stamp and entry[1] > now:
+            self._entries.move_to_end(kid_id)
+            return entry[2]
+        forecasts = await forecast_goals(db, kid_id, goals, self.window_days)
+        self._entries[kid_id] = (stamp, now + self.ttl, forecasts)
+        self._entries.move_to_end(kid_id)
+        if len(self._entries) > self.max_kids:
+            self._entries.popitem(last=False)
+        return forecasts
+
+    def invalidate(self, kid_id):
+        self._entries.pop(kid_id, None)
+
+    def __len__(self):
+        return len(self._entries)
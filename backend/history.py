@@ -0,0 +1,85 @@
+"""XP and credit-score history as monthly per-kid buckets.
+
+Every change is appended to one score_history document per kid-month with
+a single upserted $push: parallel t (epoch seconds), d (delta) and v
+(value after the change) arrays per metric. A range query reads only the
+months it spans, projected to the one metric, and downsample() folds the
+points into at most N time bins so a chart gets a bounded payload however
+many events a kid has.
+"""
+from datetime import datetime, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+METRICS = ("xp", "credit_score")
+
+
+def month_key(when):
+    return f"{when.year}-{when.month:02d}"
+
+
+def event_update(changes, when):
+    """One $push for an event's (metric, delta, value) changes."""
+    push = {}
+    for metric, delta, value in changes:
+        push.update({f"{metric}.t": int(when.timestamp()), f"{metric}.d": delta, f"{metric}.v": value})
+    return {"$push": push, "$inc": {"count": 1}}
+
+
+async def ensure_indexes(db):
+    await db.score_history.create_index([("kid_id", 1), ("month", 1)], unique=True)
+
+
+async def record(db, kid_id, changes, when=None):
+    when = when or datetime.now(timezone.utc)
+    query = {"kid_id": kid_id, "month": month_key(when)}
+    update = event_update(changes, when)
+    try:
+        await db.score_history.update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        # Another event created the kid-month bucket between our match and upsert.
+        await db.score_history.update_one(query, update, upsert=True)
+
+
+async def series(db, kid_id, metric, start, end, points=100):
+    """Downsampled [{"t", "value", "delta", "events"}] for start <= t <= end."""
+    first, last = int(start.timestamp()), int(end.timestamp())
+    cursor = db.score_history.find(
+        {"kid_id": kid_id, "month": {"$gte": month_key(start), "$lte": month_key(end)}},
+        {"_id": 0, metric: 1},
+    ).sort("month", 1)
+    raw = []
+    async for bucket in cursor:
+        packed = bucket.get(metric) or {}
+        raw.extend(
+            event for event in zip(packed.get("t", ()), packed.get("d", ()), packed.get("v", ()))
+            if first <= event[0] <= last
+        )
+    raw.sort(key=lambda event: event[0])
+    return downsample(raw, first, last, points)
+
+
+def downsample(events, first, last, points):
+    """Fold (t, delta, value) events into at most `points` equal time bins.
+
+    Each bin reports the value after its last event, the summed delta and
+    the event count, so the chart keeps the step shape of the series.
+    """
+    if len(events) <= points:
+        return [{"t": iso(t), "value": v, "delta": d, "events": 1} for t, d, v in events]
+    width = max(1, (last - first) / points)
+    bins = {}
+    for t, d, v in events:
+        index = min(int((t - first) // width), points - 1)
+        current = bins.get(index)
+        if current is None:
+            bins[index] = [t, d, v, 1]
+        else:
+            current[0], current[2] = t, v
+            current[1] += d
+            current[3] += 1
+    return [{"t": iso(t), "value": v, "delta": d, "events": n} for t, d, v, n in (bins[i] for i in sorted(bins))]
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
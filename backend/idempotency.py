@@ -0,0 +1,149 @@
+"""Idempotency-Key support for money-moving endpoints.
+
+The first response for a (caller, method, path, key) tuple is stored in a
+TTL-indexed Mongo collection, fronted by an in-process LRU, and replayed
+verbatim for duplicates so clients can retry aggressively. The caller is
+the authenticated principal from principal(scope), not the token text, so
+a retry made after refreshing an access token still replays; requests
+with no principal are passed through untouched.
+"""
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import orjson
+from pymongo.errors import DuplicateKeyError
+
+HEADER = b"idempotency-key"
+REPLAY_HEADER = b"idempotent-replayed"
+
+
+class LRUCache:
+    def __init__(self, maxsize=10000, ttl=86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class IdempotencyStore:
+    def __init__(self, get_collection, ttl=86400, cache_size=10000):
+        self.get_collection = get_collection
+        self.ttl = ttl
+        self.cache = LRUCache(cache_size, ttl)
+
+    async def ensure_indexes(self):
+        await self.get_collection().create_index("created_at", expireAfterSeconds=self.ttl)
+
+    async def get(self, key):
+        record = self.cache.get(key)
+        if record is not None:
+            return record
+        record = await self.get_collection().find_one({"_id": key})
+        if record and record["state"] == "done":
+            self.cache.set(key, record)
+        return record
+
+    async def claim(self, key, fingerprint):
+        try:
+            await self.get_collection().insert_one({"_id": key, "state": "pending", "fingerprint": fingerprint, "created_at": datetime.now(timezone.utc)})
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def complete(self, key, fingerprint, status, headers, body):
+        record = {"_id": key, "state": "done", "fingerprint": fingerprint, "status": status, "headers": headers, "body": body}
+        await self.get_collection().update_one({"_id": key}, {"$set": {k: v for k, v in record.items() if k != "_id"}})
+        self.cache.set(key, record)
+
+    async def release(self, key):
+        await self.get_collection().delete_one({"_id": key, "state": "pending"})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, store, paths, methods=("POST", "PUT"), principal=None):
+        self.app = app
+        self.store = store
+        self.paths = [re.compile(p) for p in paths]
+        self.methods = set(methods)
+        self.principal = principal or (lambda scope: dict(scope["headers"]).get(b"authorization", b"").decode())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods or not any(p.match(scope["path"]) for p in self.paths):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        idem_key = headers.get(HEADER)
+        caller = self.principal(scope)
+        if not idem_key or caller is None:
+            return await self.app(scope, receive, send)
+
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        key = hashlib.sha256(b"|".join([caller.encode(), scope["method"].encode(), scope["path"].encode(), idem_key])).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        record = await self.store.get(key)
+        if record is None:
+            if await self.store.claim(key, fingerprint):
+                return await self._run(scope, receive, send, body, key, fingerprint)
+            record = await self.store.get(key)
+        if record is None or (record["state"] != "done" and record["fingerprint"] == fingerprint):
+            return await self._error(send, 409, "A request with this Idempotency-Key is still in progress")
+        if record["fingerprint"] != fingerprint:
+            return await self._error(send, 422, "Idempotency-Key reused with a different request body")
+        await send({"type": "http.response.start", "status": record["status"], "headers": [(k.encode(), v.encode()) for k, v in record["headers"]] + [(REPLAY_HEADER, b"true")]})
+        await send({"type": "http.response.body", "body": record["body"]})
+
+    async def _run(self, scope, receive, send, body, key, fingerprint):
+        response = {"status": 500, "headers": [], "body": b""}
+        pending = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def replay_receive():
+            return pending.pop() if pending else await receive()
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(k.decode(), v.decode()) for k, v in message.get("headers", []) if k.lower() == b"content-type"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        if response["status"] >= 500:
+            await self.store.release(key)
+        else:
+            await self.store.complete(key, fingerprint, response["status"], response["headers"], response["body"])
+
+    async def _error(self, send, status, detail):
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": orjson.dumps({"detail": detail})})
@@ -0,0 +1,93 @@
+"""Opt-in global leaderboards mirrored in sorted in-process lists.
+
+Each Leaderboard keeps (-score, kid_id) keys for the kids that opted in,
+sorted, so the top N is a slice and a kid's rank is one bisect. The list
+is loaded from the (metric descending) index on first use and again every
+refresh_seconds so changes made by other workers show up; changes made
+here (XP and credit awards, opt-in edits) are applied immediately
+through update(). Family boards need no cache: the (parent_id, metric)
+index returns a family in order.
+"""
+import bisect
+import time
+
+ROW_FIELDS = ("name", "avatar", "level", "xp", "credit_score")
+PROJECTION = {"_id": 0, "id": 1, "leaderboard_opt_in": 1, **{field: 1 for field in ROW_FIELDS}}
+
+
+class Leaderboard:
+    def __init__(self, get_collection, metric, default=0, refresh_seconds=60, clock=time.monotonic):
+        self.get_collection = get_collection
+        self.metric = metric
+        self.default = default
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._keys = []
+        self._rows = {}
+        self._next_load = 0.0
+
+    async def ensure_indexes(self):
+        await self.get_collection().create_index([("parent_id", 1), (self.metric, -1)])
+        await self.get_collection().create_index([(self.metric, -1)], partialFilterExpression={"leaderboard_opt_in": True})
+
+    async def load(self, force=False):
+        now = self.clock()
+        if not force and now < self._next_load:
+            return
+        self._next_load = now + self.refresh_seconds
+        rows = {}
+        async for kid in self.get_collection().find({"leaderboard_opt_in": True}, PROJECTION).sort(self.metric, -1):
+            rows[kid["id"]] = self._row(kid)
+        self._rows = rows
+        self._keys = sorted(self._key(kid_id, row) for kid_id, row in rows.items())
+
+    def update(self, kid):
+        """Apply a kid's current document (or None once deleted) to the board."""
+        kid_id = kid["id"] if kid else None
+        self.remove(kid_id)
+        if kid and kid.get("leaderboard_opt_in"):
+            row = self._rows[kid_id] = self._row(kid)
+            bisect.insort(self._keys, self._key(kid_id, row))
+
+    def remove(self, kid_id):
+        row = self._rows.pop(kid_id, None)
+        if row is not None:
+            key = self._key(kid_id, row)
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    async def top(self, limit=10):
+        await self.load()
+        return [{"rank": self._rank(score), **self._rows[kid_id]} for score, kid_id in self._keys[:limit]]
+
+    async def rank(self, kid_id):
+        """1-based competition rank, or None if the kid has not opted in."""
+        await self.load()
+        row = self._rows.get(kid_id)
+        return self._rank(self._key(kid_id, row)[0]) if row else None
+
+    def _rank(self, negative_score):
+        return bisect.bisect_left(self._keys, (negative_score, "")) + 1
+
+    def _row(self, kid):
+        row = {field: kid[field] for field in ROW_FIELDS if field in kid}
+        row[self.metric] = kid.get(self.metric, self.default)
+        return row
+
+    def _key(self, kid_id, row):
+        return (-row[self.metric], kid_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+async def family(collection, parent_id, metric, default=0, limit=10):
+    kids = await collection.find({"parent_id": parent_id}, PROJECTION).sort([(metric, -1), ("id", 1)]).to_list(limit)
+    board, previous = [], None
+    for position, kid in enumerate(kids, 1):
+        score = kid.get(metric, default)
+        rank = board[-1]["rank"] if score == previous else position
+        board.append({"rank": rank, "id": kid["id"], **{field: kid[field] for field in ROW_FIELDS if field in kid}, metric: score})
+        previous = score
+    return board
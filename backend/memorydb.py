@@ -0,0 +1,856 @@
+"""In-process stand-in for a Motor collection.
+
+MemoryCollection keeps documents in a dict keyed by _id, with hash indexes
+on the leading field of every create_index() call and unique-key maps for
+unique indexes. It implements the subset of the Motor API the backend
+uses: filters with comparison, $in/$nin, $or/$and, $regex, $exists and $type;
+update operators and pipeline updates; find_one_and_*; bulk_write and a
+basic aggregate ($match, $sort, $skip, $limit, $project, $set, $unset,
+$group, $count). Every call runs without yielding to the event loop, so
+each operation is atomic just like a single-document write in MongoDB.
+"""
+import re
+from itertools import count
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+MISSING = object()
+_TYPE_ORDER = {type(None): 0, bool: 3, int: 1, float: 1, str: 2, dict: 4, list: 5}
+
+
+def clone(value):
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    return value
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return tuple((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def sort_key(value):
+    """Total order across types, approximating MongoDB's BSON ordering."""
+    if value is MISSING:
+        value = None
+    rank = _TYPE_ORDER.get(type(value), 6)
+    if rank == 5:
+        return (rank, tuple(sort_key(v) for v in value))
+    if rank == 4:
+        return (rank, tuple((k, sort_key(v)) for k, v in value.items()))
+    if rank == 6:
+        return (rank, str(value))
+    return (rank, value)
+
+
+def comparable(a, b):
+    number = (int, float)
+    return (isinstance(a, number) and isinstance(b, number) and not isinstance(a, bool) and not isinstance(b, bool)) or type(a) is type(b)
+
+
+def get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return MISSING
+    return value
+
+
+def set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def candidates(doc, path):
+    """Values a filter on `path` is tested against, expanding arrays."""
+    values = [doc]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = found
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+# ==================== QUERIES ====================
+
+def _compare(op, a, b):
+    if not comparable(a, b):
+        return False
+    return {"$gt": a > b, "$gte": a >= b, "$lt": a < b, "$lte": a <= b}[op]
+
+
+def _equals(values, target):
+    if target is None:
+        return not values or any(v is None for v in values)
+    return any(v == target for v in values)
+
+
+def _regex(spec, options=""):
+    if isinstance(spec, re.Pattern):
+        return spec
+    flags = re.IGNORECASE if "i" in options else 0
+    flags |= re.MULTILINE if "m" in options else 0
+    return re.compile(spec, flags)
+
+
+def bson_type(value):
+    if value is MISSING:
+        return "missing"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2**31 <= value < 2**31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def _has_type(value, names):
+    kind = bson_type(value)
+    return any(kind == name or name == "number" and kind in ("int", "long", "double") for name in names)
+
+
+def match_field(values, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, arg in condition.items():
+            if op == "$eq":
+                ok = _equals(values, arg)
+            elif op == "$ne":
+                ok = not _equals(values, arg)
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                ok = any(_compare(op, v, arg) for v in values)
+            elif op == "$in":
+                ok = any(_equals(values, target) for target in arg)
+            elif op == "$nin":
+                ok = not any(_equals(values, target) for target in arg)
+            elif op == "$exists":
+                ok = bool(values) == bool(arg)
+            elif op == "$regex":
+                pattern = _regex(arg, condition.get("$options", ""))
+                ok = any(isinstance(v, str) and pattern.search(v) for v in values)
+            elif op == "$options":
+                ok = True
+            elif op == "$not":
+                ok = not match_field(values, arg)
+            elif op == "$size":
+                ok = any(isinstance(v, list) and len(v) == arg for v in values)
+            elif op == "$elemMatch":
+                ok = any(isinstance(v, dict) and matches(v, arg) for v in values)
+            elif op == "$type":
+                ok = any(_has_type(v, arg if isinstance(arg, list) else [arg]) for v in values)
+            else:
+                raise NotImplementedError(f"Query operator {op} is not supported by MemoryCollection")
+            if not ok:
+                return False
+        return True
+    if isinstance(condition, re.Pattern):
+        return any(isinstance(v, str) and condition.search(v) for v in values)
+    return _equals(values, condition)
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            ok = any(matches(doc, sub) for sub in condition)
+        elif key == "$and":
+            ok = all(matches(doc, sub) for sub in condition)
+        elif key == "$nor":
+            ok = not any(matches(doc, sub) for sub in condition)
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key} is not supported by MemoryCollection")
+        else:
+            ok = match_field(candidates(doc, key), condition)
+        if not ok:
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection:
+        return clone(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {k: clone(v) for k, v in doc.items() if k in include or k == "_id" and projection.get("_id", 1)}
+        for path in include:
+            if "." in path:
+                value = get_path(doc, path)
+                if value is not MISSING:
+                    set_path(out, path, clone(value))
+        return out
+    out = clone(doc)
+    for path, flag in projection.items():
+        if not flag:
+            unset_path(out, path)
+    return out
+
+
+def sort_docs(docs, spec):
+    if isinstance(spec, str):
+        spec = [(spec, 1)]
+    elif isinstance(spec, dict):
+        spec = list(spec.items())
+    for field, direction in reversed(spec):
+        docs.sort(key=lambda d: sort_key(get_path(d, field)), reverse=direction == -1)
+    return docs
+
+
+# ==================== EXPRESSIONS ====================
+
+def _number_op(fn, args):
+    if any(a is None or a is MISSING for a in args):
+        return None
+    return fn(*args)
+
+
+def _add(*args):
+    total = 0
+    for a in args:
+        total += a
+    return total
+
+
+def _multiply(*args):
+    total = 1
+    for a in args:
+        total *= a
+    return total
+
+
+def _round(value, places=0):
+    result = round(value, places)
+    return int(result) if isinstance(value, int) else result
+
+
+def _cmp(op, a, b):
+    if a is MISSING:
+        a = None
+    if b is MISSING:
+        b = None
+    if op == "$eq":
+        return a == b
+    if op == "$ne":
+        return a != b
+    ka, kb = sort_key(a), sort_key(b)
+    return {"$gt": ka > kb, "$gte": ka >= kb, "$lt": ka < kb, "$lte": ka <= kb}[op]
+
+
+def truthy(value):
+    return value not in (None, False, 0, MISSING)
+
+
+def evaluate(expr, doc):
+    if isinstance(expr, str):
+        if expr.startswith("$$"):
+            if expr == "$$ROOT":
+                return doc
+            raise NotImplementedError(f"Variable {expr} is not supported by MemoryCollection")
+        if expr.startswith("$"):
+            return get_path(doc, expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        values = {k: evaluate(v, doc) for k, v in expr.items()}
+        return {k: v for k, v in values.items() if v is not MISSING}
+    op, arg = next(iter(expr.items()))
+    if op == "$literal":
+        return arg
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return evaluate(arg[1] if truthy(evaluate(arg[0], doc)) else arg[2], doc)
+    if op == "$switch":
+        for branch in arg["branches"]:
+            if truthy(evaluate(branch["case"], doc)):
+                return evaluate(branch["then"], doc)
+        if "default" not in arg:
+            raise ValueError("$switch could not find a matching branch and no default was given")
+        return evaluate(arg["default"], doc)
+    if op == "$ifNull":
+        values = [evaluate(a, doc) for a in arg]
+        return next((v for v in values[:-1] if v is not None and v is not MISSING), values[-1])
+    args = evaluate(arg if isinstance(arg, list) else [arg], doc)
+    if op == "$add":
+        return _number_op(_add, args)
+    if op == "$subtract":
+        return _number_op(lambda a, b: a - b, args)
+    if op == "$multiply":
+        return _number_op(_multiply, args)
+    if op == "$divide":
+        return _number_op(lambda a, b: a / b, args)
+    if op == "$pow":
+        return _number_op(lambda a, b: a ** b, args)
+    if op == "$round":
+        return _number_op(_round, args)
+    if op == "$abs":
+        return _number_op(abs, args)
+    if op in ("$min", "$max"):
+        values = [v for v in (args[0] if len(args) == 1 and isinstance(args[0], list) else args) if v is not None and v is not MISSING]
+        if not values:
+            return None
+        return (min if op == "$min" else max)(values, key=sort_key)
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        return _cmp(op, args[0], args[1])
+    if op == "$and":
+        return all(truthy(a) for a in args)
+    if op == "$or":
+        return any(truthy(a) for a in args)
+    if op == "$not":
+        return not truthy(args[0])
+    if op == "$in":
+        return args[0] in args[1]
+    if op == "$concat":
+        return None if any(a is None or a is MISSING for a in args) else "".join(args)
+    if op in ("$substr", "$substrBytes", "$substrCP"):
+        text, start, length = args
+        return str(text)[start:start + length] if length >= 0 else str(text)[start:]
+    if op == "$toString":
+        return None if args[0] is None or args[0] is MISSING else str(args[0])
+    if op in ("$toLower", "$toUpper"):
+        text = "" if args[0] is None or args[0] is MISSING else str(args[0])
+        return text.lower() if op == "$toLower" else text.upper()
+    if op in ("$toLong", "$toInt"):
+        return None if args[0] is None or args[0] is MISSING else int(args[0])
+    if op == "$type":
+        return bson_type(args[0])
+    if op == "$size":
+        return len(args[0])
+    raise NotImplementedError(f"Expression operator {op} is not supported by MemoryCollection")
+
+
+# ==================== UPDATES ====================
+
+def _apply_pipeline(doc, pipeline):
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op in ("$set", "$addFields"):
+            values = {field: evaluate(expr, doc) for field, expr in spec.items()}
+            for field, value in values.items():
+                if value is MISSING:
+                    unset_path(doc, field)
+                else:
+                    set_path(doc, field, clone(value))
+        elif op == "$unset":
+            for field in [spec] if isinstance(spec, str) else spec:
+                unset_path(doc, field)
+        else:
+            raise NotImplementedError(f"Update stage {op} is not supported by MemoryCollection")
+
+
+def _push(doc, path, spec, unique=False):
+    current = get_path(doc, path)
+    items = list(current) if isinstance(current, list) else []
+    each = spec["$each"] if isinstance(spec, dict) and "$each" in spec else [spec]
+    for item in each:
+        if not unique or item not in items:
+            items.append(clone(item))
+    if isinstance(spec, dict) and "$sort" in spec:
+        order = spec["$sort"]
+        if isinstance(order, dict):
+            sort_docs(items, order)
+        else:
+            items.sort(key=sort_key, reverse=order == -1)
+    if isinstance(spec, dict) and "$slice" in spec:
+        n = spec["$slice"]
+        items = items[:n] if n >= 0 else items[n:]
+    set_path(doc, path, items)
+
+
+def apply_update(doc, update, inserting=False):
+    if isinstance(update, list):
+        _apply_pipeline(doc, update)
+        return
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            current = get_path(doc, path)
+            if op in ("$set", "$setOnInsert"):
+                set_path(doc, path, clone(value))
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op == "$inc":
+                set_path(doc, path, value if current is MISSING or current is None else current + value)
+            elif op == "$min":
+                if current is MISSING or sort_key(value) < sort_key(current):
+                    set_path(doc, path, clone(value))
+            elif op == "$max":
+                if current is MISSING or sort_key(value) > sort_key(current):
+                    set_path(doc, path, clone(value))
+            elif op == "$push":
+                _push(doc, path, value)
+            elif op == "$addToSet":
+                _push(doc, path, value, unique=True)
+            elif op == "$pull":
+                if isinstance(current, list):
+                    set_path(doc, path, [v for v in current if not match_field(candidates({"v": v}, "v"), value)])
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by MemoryCollection")
+
+
+def upsert_seed(query):
+    """Document an upsert starts from: the filter's equality conditions."""
+    seed = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for sub in condition:
+                seed.update(upsert_seed(sub))
+        elif key.startswith("$"):
+            continue
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if "$eq" in condition:
+                set_path(seed, key, clone(condition["$eq"]))
+        else:
+            set_path(seed, key, clone(condition))
+    return seed
+
+
+# ==================== COLLECTION ====================
+
+class MemoryCursor:
+    def __init__(self, source, projection=None):
+        self._source = source
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def _results(self):
+        docs = self._source()
+        if self._sort:
+            docs = sort_docs(list(docs), self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        docs = self._results()
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+
+class MemoryCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.hashed = {}
+        self.unique = {}
+        self._ids = count()
+
+    # ---------- indexes ----------
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        fields = tuple(field for field, _ in keys)
+        name = "_".join(f"{field}_{direction}" for field, direction in keys)
+        if fields[0] not in self.hashed:
+            buckets = self.hashed[fields[0]] = {}
+            for _id, doc in self.docs.items():
+                for key in self._hash_keys(doc, fields[0]):
+                    buckets.setdefault(key, {})[_id] = None
+        if unique and fields not in self.unique:
+            seen = {}
+            for _id, doc in self.docs.items():
+                key = self._unique_key(doc, fields)
+                if key in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+                seen[key] = _id
+            self.unique[fields] = seen
+        return name
+
+    async def drop(self):
+        self.docs.clear()
+        for buckets in self.hashed.values():
+            buckets.clear()
+        for keys in self.unique.values():
+            keys.clear()
+
+    @staticmethod
+    def _hash_value(doc, field):
+        value = get_path(doc, field)
+        return None if value is MISSING else freeze(value)
+
+    @staticmethod
+    def _hash_keys(doc, field):
+        value = get_path(doc, field)
+        if isinstance(value, list):
+            return {freeze(value), *(freeze(item) for item in value)}
+        return {None if value is MISSING else freeze(value)}
+
+    @staticmethod
+    def _unique_key(doc, fields):
+        return tuple(MemoryCollection._hash_value(doc, field) for field in fields)
+
+    def _check_unique(self, doc, _id):
+        for fields, keys in self.unique.items():
+            owner = keys.get(self._unique_key(doc, fields))
+            if owner is not None and owner != _id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {'_'.join(fields)}", 11000)
+
+    def _index(self, _id, doc):
+        for field, buckets in self.hashed.items():
+            for key in self._hash_keys(doc, field):
+                buckets.setdefault(key, {})[_id] = None
+        for fields, keys in self.unique.items():
+            keys[self._unique_key(doc, fields)] = _id
+
+    def _unindex(self, _id, doc):
+        for field, buckets in self.hashed.items():
+            for key in self._hash_keys(doc, field):
+                bucket = buckets.get(key)
+                if bucket is not None:
+                    bucket.pop(_id, None)
+        for fields, keys in self.unique.items():
+            key = self._unique_key(doc, fields)
+            if keys.get(key) == _id:
+                del keys[key]
+
+    def _scan(self, query):
+        """Documents matching query, narrowed through a hash index when possible."""
+        ids = None
+        for field, condition in query.items():
+            if field == "_id" and not isinstance(condition, dict):
+                ids = [condition] if condition in self.docs else []
+                break
+            if field not in self.hashed or isinstance(condition, (list, re.Pattern)):
+                continue
+            if isinstance(condition, dict):
+                if set(condition) != {"$in"} or any(isinstance(v, (dict, list)) for v in condition["$in"]):
+                    continue
+                values = condition["$in"]
+            else:
+                values = [condition]
+            buckets = self.hashed[field]
+            ids = list(dict.fromkeys(_id for value in values for _id in buckets.get(value, ())))
+            break
+        source = self.docs.values() if ids is None else (self.docs[_id] for _id in ids if _id in self.docs)
+        return [doc for doc in source if matches(doc, query)]
+
+    # ---------- reads ----------
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, skip=0, **kwargs):
+        filter = filter or {}
+        cursor = MemoryCursor(lambda: self._scan(filter), projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    async def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = await self.find(filter, projection, sort=sort).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter, limit=0, skip=0, **kwargs):
+        total = max(len(self._scan(filter)) - skip, 0)
+        return min(total, limit) if limit else total
+
+    async def estimated_document_count(self, **kwargs):
+        return len(self.docs)
+
+    async def distinct(self, key, filter=None, **kwargs):
+        values = []
+        for doc in self._scan(filter or {}):
+            for value in candidates(doc, key):
+                if not isinstance(value, list) and value not in values:
+                    values.append(value)
+        return values
+
+    # ---------- writes ----------
+
+    def _insert(self, document):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        _id = document["_id"]
+        if _id in self.docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        doc = clone(document)
+        self._check_unique(doc, _id)
+        self.docs[_id] = doc
+        self._index(_id, doc)
+        return _id
+
+    def _replace(self, _id, before, after):
+        self._check_unique(after, _id)
+        self._unindex(_id, before)
+        self.docs[_id] = after
+        self._index(_id, after)
+
+    def _update(self, filter, update, upsert=False, multi=False, sort=None):
+        """Returns (matched, modified, upserted_id, [(before, after)])."""
+        docs = self._scan(filter)
+        if sort:
+            docs = sort_docs(docs, sort)
+        if not multi:
+            docs = docs[:1]
+        changes = []
+        modified = 0
+        for before in docs:
+            after = clone(before)
+            apply_update(after, update)
+            after["_id"] = before["_id"]
+            if after != before:
+                self._replace(before["_id"], before, after)
+                modified += 1
+            changes.append((before, after))
+        if docs or not upsert:
+            return len(docs), modified, None, changes
+        seed = upsert_seed(filter)
+        apply_update(seed, update, inserting=True)
+        _id = self._insert(seed)
+        return 0, 0, _id, [(None, self.docs[_id])]
+
+    async def insert_one(self, document, **kwargs):
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents, ordered=True, **kwargs):
+        ids = []
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                ids.append(self._insert(document))
+            except DuplicateKeyError as exc:
+                errors.append({"index": index, "code": 11000, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+        return InsertManyResult(ids, True)
+
+    async def update_one(self, filter, update, upsert=False, sort=None, **kwargs):
+        matched, modified, upserted, _ = self._update(filter, update, upsert, sort=sort)
+        return UpdateResult({"n": matched or int(upserted is not None), "nModified": modified, "upserted": upserted}, True)
+
+    async def update_many(self, filter, update, upsert=False, **kwargs):
+        matched, modified, upserted, _ = self._update(filter, update, upsert, multi=True)
+        return UpdateResult({"n": matched or int(upserted is not None), "nModified": modified, "upserted": upserted}, True)
+
+    async def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        docs = self._scan(filter)[:1]
+        if docs:
+            before = docs[0]
+            after = {"_id": before["_id"], **clone(replacement)}
+            self._replace(before["_id"], before, after)
+            return UpdateResult({"n": 1, "nModified": int(after != before)}, True)
+        if upsert:
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": self._insert({**upsert_seed(filter), **replacement})}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        _, _, _, changes = self._update(filter, update, upsert, sort=sort)
+        if not changes:
+            return None
+        before, after = changes[0]
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return None if doc is None else project(doc, projection)
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        docs = self._scan(filter)
+        if sort:
+            docs = sort_docs(docs, sort)
+        if not docs:
+            return None
+        self._delete(docs[0])
+        return project(docs[0], projection)
+
+    def _delete(self, doc):
+        self._unindex(doc["_id"], doc)
+        del self.docs[doc["_id"]]
+
+    async def delete_one(self, filter, **kwargs):
+        docs = self._scan(filter)[:1]
+        for doc in docs:
+            self._delete(doc)
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def delete_many(self, filter, **kwargs):
+        docs = self._scan(filter)
+        for doc in docs:
+            self._delete(doc)
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [], "writeErrors": []}
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    matched, modified, upserted, _ = self._update(request._filter, request._doc, request._upsert, multi=isinstance(request, UpdateMany))
+                    result["nMatched"] += matched
+                    result["nModified"] += modified
+                    if upserted is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": upserted})
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    docs = self._scan(request._filter)
+                    for doc in docs if isinstance(request, DeleteMany) else docs[:1]:
+                        self._delete(doc)
+                        result["nRemoved"] += 1
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by MemoryCollection")
+            except DuplicateKeyError as exc:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(exc), "op": request})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # ---------- aggregation ----------
+
+    def aggregate(self, pipeline, **kwargs):
+        return MemoryCursor(lambda: run_pipeline(self._scan({}), pipeline))
+
+
+def _accumulate(op, values):
+    present = [v for v in values if v is not None and v is not MISSING]
+    if op == "$sum":
+        return sum(v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool))
+    if op == "$avg":
+        numbers = [v for v in present if isinstance(v, (int, float))]
+        return sum(numbers) / len(numbers) if numbers else None
+    if op in ("$min", "$max"):
+        return (min if op == "$min" else max)(present, key=sort_key) if present else None
+    if op == "$first":
+        return values[0] if values else None
+    if op == "$last":
+        return values[-1] if values else None
+    if op == "$push":
+        return [v for v in values if v is not MISSING]
+    if op == "$addToSet":
+        unique = []
+        for v in values:
+            if v is not MISSING and v not in unique:
+                unique.append(v)
+        return unique
+    raise NotImplementedError(f"Accumulator {op} is not supported by MemoryCollection")
+
+
+def run_pipeline(docs, pipeline):
+    docs = [clone(doc) for doc in docs]
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif op == "$sort":
+            docs = sort_docs(docs, spec)
+        elif op == "$skip":
+            docs = docs[spec:]
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op in ("$set", "$addFields", "$unset"):
+            for doc in docs:
+                _apply_pipeline(doc, [stage])
+        elif op == "$project":
+            computed = {k: v for k, v in spec.items() if not isinstance(v, (bool, int))}
+            included = [k for k, v in spec.items() if k not in computed and v and k != "_id"]
+            projected = []
+            for doc in docs:
+                if not computed and not included:
+                    projected.append(project(doc, spec))
+                    continue
+                out = {"_id": doc["_id"]} if spec.get("_id", 1) and "_id" in doc else {}
+                for path in included:
+                    value = get_path(doc, path)
+                    if value is not MISSING:
+                        set_path(out, path, value)
+                for field, expr in computed.items():
+                    value = evaluate(expr, doc)
+                    if value is not MISSING:
+                        set_path(out, field, value)
+                projected.append(out)
+            docs = projected
+        elif op == "$group":
+            groups = {}
+            for doc in docs:
+                key = evaluate(spec["_id"], doc)
+                key = None if key is MISSING else key
+                groups.setdefault(freeze(key), (key, []))[1].append(doc)
+            docs = []
+            for key, members in groups.values():
+                out = {"_id": key}
+                for field, accumulator in spec.items():
+                    if field != "_id":
+                        (acc, expr), = accumulator.items()
+                        out[field] = _accumulate(acc, [evaluate(expr, doc) for doc in members])
+                docs.append(out)
+        elif op == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        else:
+            raise NotImplementedError(f"Aggregation stage {op} is not supported by MemoryCollection")
+    return docs
@@ -0,0 +1,96 @@
+"""Money as integer minor units.
+
+Every stored amount (wallet totals, transaction amounts, task rewards,
+goal, SIP and loan figures, rollup and archive totals) is an int count of
+minor units (paise), so $inc, $sum and the reconcile comparisons are exact
+and stay on MongoDB's integer fast path instead of accumulating float
+error. Conversion happens only at the API boundary: request models parse
+rupee amounts with MinorAmount (half-up to the nearest paisa) and response
+models turn stored ints back into rupees with MajorAmount.
+
+migrate() converts documents written before the switch. Legacy values are
+recognised by their BSON type (double), so it is idempotent and can be
+re-run after an interrupted pass; run it with the API stopped, because a
+live $inc of minor units into a not yet migrated double would mix scales.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Annotated
+
+from pydantic import BeforeValidator
+from pymongo import UpdateOne
+
+from reconcile import WALLET_FIELDS
+
+SCALE = 100
+
+MONEY_FIELDS = {
+    "wallets": WALLET_FIELDS,
+    "transactions": ("amount",),
+    "tasks": ("reward_amount", "penalty_amount"),
+    "goals": ("target_amount", "saved_amount"),
+    "sips": ("amount", "total_invested", "current_value"),
+    "loans": ("principal", "emi_amount", "remaining_balance", "last_payment_amount"),
+    "rollups": ("earned", "spent"),
+}
+
+
+def round_minor(value) -> int:
+    """Round a computed minor-unit quantity (EMI, SIP value) half-up to an int."""
+    return int(Decimal(repr(value)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_minor(amount) -> int:
+    if isinstance(amount, bool):
+        raise ValueError("amount must be a number")
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError("amount must be a number") from None
+    if not value.is_finite():
+        raise ValueError("amount must be a finite number")
+    return int((value * SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_major(minor):
+    return minor / SCALE if isinstance(minor, int) and not isinstance(minor, bool) else minor
+
+
+MinorAmount = Annotated[int, BeforeValidator(to_minor)]
+MajorAmount = Annotated[float, BeforeValidator(to_major)]
+
+
+def _converted(path):
+    return {"$cond": [
+        {"$eq": [{"$type": f"${path}"}, "double"]},
+        {"$toLong": {"$round": [{"$multiply": [f"${path}", SCALE]}, 0]}},
+        f"${path}",
+    ]}
+
+
+def _archive_update(doc):
+    entries = [{**entry, "amount": to_minor(entry["amount"])} if isinstance(entry.get("amount"), float) else entry for entry in doc.get("entries", [])]
+    totals = {field: to_minor(value) if isinstance(value, float) else value for field, value in doc.get("totals", {}).items()}
+    return UpdateOne({"_id": doc["_id"]}, {"$set": {"entries": entries, "totals": totals}})
+
+
+async def migrate(db, batch=500):
+    """Rewrite float amounts as minor units; returns modified counts per collection."""
+    report = {}
+    for name, fields in MONEY_FIELDS.items():
+        result = await db[name].update_many(
+            {"$or": [{field: {"$type": "double"}} for field in fields]},
+            [{"$set": {field: _converted(field) for field in fields}}],
+        )
+        report[name] = result.modified_count
+
+    legacy = {"$or": [{"entries.amount": {"$type": "double"}}, *({f"totals.{field}": {"$type": "double"}} for field in WALLET_FIELDS)]}
+    updates, archived = [], 0
+    async for doc in db.transactions_archive.find(legacy, {"entries": 1, "totals": 1}):
+        updates.append(_archive_update(doc))
+        if len(updates) >= batch:
+            archived += (await db.transactions_archive.bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        archived += (await db.transactions_archive.bulk_write(updates, ordered=False)).modified_count
+    report["transactions_archive"] = archived
+    return report
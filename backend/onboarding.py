@@ -0,0 +1,173 @@
+"""Bulk kid onboarding from CSV or JSON.
+
+Rows are parsed and validated in full before anything is written: field
+types, each parent resolved by email in one query, and kid names unique
+per parent (kid login matches names case-insensitively) against both the
+file and existing kids. If every row is valid the kids, wallets, starting-
+balance transactions and their rollups are written with chunked
+insert_many/bulk_write calls; otherwise nothing is written. run_import()
+yields one result per row followed by a summary so callers can stream it.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+import rollups
+from money import MinorAmount
+
+CHUNK_SIZE = 1000
+
+
+class KidRow(BaseModel):
+    parent_email: Optional[str] = None
+    name: str = Field(min_length=1, max_length=100)
+    age: int = Field(ge=0, le=25)
+    avatar: str = "panda"
+    grade: Optional[str] = None
+    ui_theme: str = "neutral"
+    pin: Optional[str] = None
+    starting_balance: MinorAmount = Field(0, ge=0)
+
+
+def parse(body, content_type=""):
+    """Rows from a JSON array (or {"kids": [...]}) or a CSV with a header line."""
+    text = body.decode("utf-8-sig") if isinstance(body, bytes) else body
+    if "json" in content_type or text.lstrip().startswith(("[", "{")):
+        data = json.loads(text)
+        return data.get("kids", []) if isinstance(data, dict) else data
+    return [{k: v for k, v in row.items() if v not in ("", None)} for row in csv.DictReader(io.StringIO(text))]
+
+
+def _errors(exc):
+    return [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()]
+
+
+async def validate(db, raw_rows, avatars, parent_id=None, parent_email=None):
+    """Return (rows, parent ids by row, {row index: [errors]})."""
+    rows, errors = [], {}
+    for index, raw in enumerate(raw_rows):
+        try:
+            row = KidRow.model_validate(raw)
+        except ValidationError as exc:
+            errors[index] = _errors(exc)
+            row = None
+        else:
+            if row.avatar not in avatars:
+                errors[index] = [f"avatar: unknown avatar {row.avatar!r}"]
+        rows.append(row)
+
+    if parent_id:
+        owners = [parent_id] * len(rows)
+        for index, row in enumerate(rows):
+            if row and row.parent_email and row.parent_email.lower() != parent_email:
+                errors.setdefault(index, []).append("parent_email: rows can only add kids to your own account")
+    else:
+        emails = sorted({row.parent_email.lower() for row in rows if row and row.parent_email})
+        parents = {p["email"]: p["id"] for p in await db.users.find({"email": {"$in": emails}}, {"_id": 0, "id": 1, "email": 1}).to_list(None)}
+        owners = []
+        for index, row in enumerate(rows):
+            owner = parents.get(row.parent_email.lower()) if row and row.parent_email else None
+            if row and not owner:
+                errors.setdefault(index, []).append(f"parent_email: no parent account for {row.parent_email!r}" if row.parent_email else "parent_email: required")
+            owners.append(owner)
+
+    taken = {}
+    existing = await db.kids.find({"parent_id": {"$in": sorted({o for o in owners if o})}}, {"_id": 0, "parent_id": 1, "name": 1}).to_list(None)
+    for kid in existing:
+        taken[(kid["parent_id"], kid["name"].lower())] = "an existing kid"
+    for index, (row, owner) in enumerate(zip(rows, owners)):
+        if not row or not owner:
+            continue
+        key = (owner, row.name.lower())
+        if key in taken:
+            errors.setdefault(index, []).append(f"name: {row.name!r} is already used by {taken[key]}")
+        else:
+            taken[key] = f"row {index + 1}"
+    return rows, owners, errors
+
+
+def build(row, parent_id, now, credit_initial):
+    kid_id = str(uuid.uuid4())
+    kid = {
+        "id": kid_id,
+        "parent_id": parent_id,
+        "name": row.name,
+        "name_lower": row.name.lower(),
+        "age": row.age,
+        "avatar": row.avatar,
+        "grade": row.grade,
+        "ui_theme": row.ui_theme,
+        "pin": row.pin,
+        "level": 1,
+        "xp": 0,
+        "credit_score": credit_initial,
+        "created_at": now,
+    }
+    wallet = {
+        "id": str(uuid.uuid4()),
+        "kid_id": kid_id,
+        "balance": row.starting_balance,
+        "total_earned": row.starting_balance,
+        "total_spent": 0,
+        "total_saved": 0,
+    }
+    txn = None
+    if row.starting_balance > 0:
+        txn = {
+            "id": str(uuid.uuid4()),
+            "kid_id": kid_id,
+            "type": "credit",
+            "amount": row.starting_balance,
+            "description": "Starting balance",
+            "category": "initial",
+            "reference_id": None,
+            "created_at": now,
+        }
+    return kid, wallet, txn
+
+
+async def backfill_names(db):
+    """Set the lowercase name key used for listing and prefix search on older kids."""
+    result = await db.kids.update_many({"name_lower": {"$exists": False}}, [{"$set": {"name_lower": {"$toLower": "$name"}}}])
+    return {"updated": result.modified_count}
+
+
+async def write_chunk(db, kids, wallets, txns):
+    await db.kids.insert_many(kids, ordered=False)
+    await db.wallets.insert_many(wallets, ordered=False)
+    if txns:
+        await db.transactions.insert_many(txns, ordered=False)
+        await db.rollups.bulk_write([update for txn in txns for update in rollups.rollup_updates(txn)], ordered=False)
+
+
+async def run_import(db, raw_rows, avatars, credit_initial, parent_id=None, parent_email=None, chunk_size=CHUNK_SIZE):
+    rows, owners, errors = await validate(db, raw_rows, avatars, parent_id, parent_email)
+    if errors:
+        for index in range(len(rows)):
+            if index in errors:
+                yield {"row": index + 1, "status": "error", "errors": errors[index]}
+            else:
+                yield {"row": index + 1, "status": "skipped"}
+        yield {"summary": {"rows": len(rows), "created": 0, "errors": len(errors)}}
+        return
+
+    now = datetime.now(timezone.utc).isoformat()
+    created = 0
+    for start in range(0, len(rows), chunk_size):
+        kids, wallets, txns = [], [], []
+        for row, owner in zip(rows[start:start + chunk_size], owners[start:start + chunk_size]):
+            kid, wallet, txn = build(row, owner, now, credit_initial)
+            kids.append(kid)
+            wallets.append(wallet)
+            if txn:
+                txns.append(txn)
+        await write_chunk(db, kids, wallets, txns)
+        for offset, kid in enumerate(kids):
+            yield {"row": start + offset + 1, "status": "created", "kid_id": kid["id"], "name": kid["name"]}
+        created += len(kids)
+    yield {"summary": {"rows": len(rows), "created": created, "errors": 0}}
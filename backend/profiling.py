@@ -0,0 +1,252 @@
+"""On-demand profiling of single requests.
+
+Only installed when a profiling secret is configured. A request carrying
+`X-Profile: <secret>` is run under either a sampling profiler (default) or
+cProfile (`X-Profile-Mode: cprofile`); every other request passes straight
+through. The sampler is a thread that reads the event-loop thread's stack
+every interval and counts collapsed stacks ("a;b;c count"), the format
+flamegraph.pl and speedscope read. While a profile is active,
+ProfiledRepository times each awaited database call; overlapping calls
+(gathered queries) are merged so mongo_ms is wall time spent waiting on
+MongoDB. cpu_ms is the event-loop thread's CPU time. Both are measured on
+the shared event loop, so concurrent requests are included -- profile on
+a quiet worker for clean numbers.
+
+The response is held until the request finishes and gets a Server-Timing
+header plus X-Profile-Id; the profile is kept in a small in-process store
+(and written to profile_dir when set) for GET /api/admin/profiles/{id}.
+"""
+import cProfile
+import hmac
+import inspect
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+
+from repository import RepositoryWrapper
+
+HEADER = b"x-profile"
+MODE_HEADER = b"x-profile-mode"
+CURSOR_METHODS = frozenset({"find", "aggregate", "list_indexes"})
+
+_active = ContextVar("profile", default=None)
+_cprofile_lock = threading.Lock()
+
+
+class TimedCursor:
+    def __init__(self, cursor, profile, name):
+        self._cursor = cursor
+        self._profile = profile
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._cursor, attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            if result is self._cursor:
+                return self
+            if isinstance(result, type(self._cursor)):
+                return TimedCursor(result, self._profile, self._name)
+            if inspect.isawaitable(result):
+                return self._profile.timed(f"{self._name}.{attr}", result)
+            return result
+        return call
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._profile.timed(f"{self._name}.next", self._cursor.__anext__())
+
+
+class TimedCollection:
+    def __init__(self, collection, profile):
+        self._collection = collection
+        self._profile = profile
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if not callable(value):
+            return value
+        name = f"{self._collection.name}.{attr}"
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            if attr in CURSOR_METHODS:
+                return TimedCursor(result, self._profile, name)
+            if inspect.isawaitable(result):
+                return self._profile.timed(name, result)
+            return result
+        return call
+
+
+class ProfiledRepository(RepositoryWrapper):
+    def collection(self, name):
+        collection = self.base.collection(name)
+        profile = _active.get()
+        return TimedCollection(collection, profile) if profile is not None else collection
+
+
+class Sampler:
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    def __init__(self, method, path, mode):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.mode = mode
+        self.operations = []
+
+    async def timed(self, name, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.operations.append((name, started, time.perf_counter()))
+
+    def mongo_seconds(self):
+        busy, until = 0.0, None
+        for _, start, end in sorted(self.operations, key=lambda op: op[1]):
+            if until is None or start > until:
+                busy += end - start
+                until = end
+            elif end > until:
+                busy += end - until
+                until = end
+        return busy
+
+    def summary(self, status, wall, cpu):
+        mongo = self.mongo_seconds()
+        by_operation = {}
+        for name, start, end in self.operations:
+            entry = by_operation.setdefault(name, {"calls": 0, "ms": 0.0})
+            entry["calls"] += 1
+            entry["ms"] += (end - start) * 1000
+        return {
+            "id": self.id, "method": self.method, "path": self.path, "mode": self.mode, "status": status,
+            "wall_ms": round(wall * 1000, 3), "cpu_ms": round(cpu * 1000, 3), "mongo_ms": round(mongo * 1000, 3),
+            "other_wait_ms": round(max(0.0, wall - cpu - mongo) * 1000, 3),
+            "mongo_calls": len(self.operations),
+            "operations": sorted(({"name": n, "calls": e["calls"], "ms": round(e["ms"], 3)} for n, e in by_operation.items()), key=lambda e: -e["ms"]),
+        }
+
+
+class ProfileStore:
+    def __init__(self, maxsize=100, directory=None):
+        self.maxsize = maxsize
+        self.directory = Path(directory) if directory else None
+        self._profiles = OrderedDict()
+
+    def add(self, summary, output):
+        self._profiles[summary["id"]] = (summary, output)
+        while len(self._profiles) > self.maxsize:
+            self._profiles.popitem(last=False)
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            suffix = "folded" if summary["mode"] == "sample" else "txt"
+            (self.directory / f"{summary['id']}.{suffix}").write_text(output)
+            (self.directory / f"{summary['id']}.json").write_text(json.dumps(summary, indent=2))
+
+    def get(self, profile_id):
+        return self._profiles.get(profile_id)
+
+
+def authorized(secret, value):
+    return bool(secret) and value is not None and hmac.compare_digest(value.encode() if isinstance(value, str) else value, secret.encode())
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles requests presenting the secret."""
+
+    def __init__(self, app, secret, store, interval=0.001):
+        self.app = app
+        self.secret = secret
+        self.store = store
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not authorized(self.secret, headers.get(HEADER)):
+            return await self.app(scope, receive, send)
+
+        mode = "cprofile" if headers.get(MODE_HEADER) == b"cprofile" else "sample"
+        profiler = None
+        if mode == "cprofile" and _cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        else:
+            mode = "sample"
+        profile = Profile(scope["method"], scope["path"], mode)
+        messages = []
+
+        async def hold(message):
+            messages.append(message)
+
+        token = _active.set(profile)
+        sampler = Sampler(threading.get_ident(), self.interval) if profiler is None else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if sampler:
+            sampler.start()
+        else:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, hold)
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            _active.reset(token)
+            if sampler:
+                sampler.stop()
+                output = sampler.collapsed()
+            else:
+                profiler.disable()
+                _cprofile_lock.release()
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(60)
+                output = text.getvalue()
+
+        start = next(m for m in messages if m["type"] == "http.response.start")
+        summary = profile.summary(start["status"], wall, cpu)
+        self.store.add(summary, output)
+        timing = f"cpu;dur={summary['cpu_ms']}, mongo;dur={summary['mongo_ms']}, total;dur={summary['wall_ms']}"
+        start["headers"] = list(start.get("headers", [])) + [(b"server-timing", timing.encode()), (b"x-profile-id", profile.id.encode())]
+        for message in messages:
+            await send(message)
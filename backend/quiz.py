@@ -0,0 +1,84 @@
+"""Server-side grading of story quizzes and per-question answer analytics.
+
+answer_key() compiles the correct option and option count of every
+question once at import, so grading a submission is a tuple walk. Each
+graded submission bumps one question_stats document per story with an
+upserted $inc (attempts, correct and per-choice counts for every
+question), so hardest() reads one small document per story instead of
+scanning learning_progress.
+"""
+from typing import NamedTuple, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+
+class Question(NamedTuple):
+    correct: int
+    options: int
+
+
+def answer_key(stories):
+    return {
+        story["id"]: tuple(Question(q["correct"], len(q["options"])) for q in story["questions"])
+        for story in stories
+    }
+
+
+def validate(key, answers):
+    """Return an error message for a malformed submission, else None."""
+    if len(answers) != len(key):
+        return f"Expected {len(key)} answers"
+    if any(not 0 <= answer < question.options for answer, question in zip(answers, key)):
+        return "Answer out of range"
+    return None
+
+
+def grade(key, answers) -> Tuple[bool, ...]:
+    return tuple(answer == question.correct for answer, question in zip(answers, key))
+
+
+def stats_update(answers, results):
+    inc = {"attempts": 1}
+    for i, (answer, ok) in enumerate(zip(answers, results)):
+        inc[f"questions.{i}.correct"] = int(ok)
+        inc[f"questions.{i}.choices.{answer}"] = 1
+    return {"$inc": inc}
+
+
+async def ensure_indexes(db):
+    await db.question_stats.create_index("story_id", unique=True)
+
+
+async def record(db, story_id, answers, results):
+    update = stats_update(answers, results)
+    try:
+        await db.question_stats.update_one({"story_id": story_id}, update, upsert=True)
+    except DuplicateKeyError:
+        # Another request created the story's document between our match and upsert.
+        await db.question_stats.update_one({"story_id": story_id}, update, upsert=True)
+
+
+async def hardest(db, stories, limit=10):
+    """Questions ordered by correct rate, lowest first; unanswered ones are skipped."""
+    by_id = {story["id"]: story for story in stories}
+    rows = []
+    async for stats in db.question_stats.find({"story_id": {"$in": list(by_id)}}, {"_id": 0}):
+        story = by_id[stats["story_id"]]
+        attempts = stats.get("attempts", 0)
+        if not attempts:
+            continue
+        for i, question in enumerate(story["questions"]):
+            counts = stats.get("questions", {}).get(str(i), {})
+            choices = counts.get("choices", {})
+            rows.append({
+                "story_id": story["id"],
+                "story_title": story["title"],
+                "question_index": i,
+                "question": question["question"],
+                "attempts": attempts,
+                "correct": counts.get("correct", 0),
+                "correct_rate": round(counts.get("correct", 0) / attempts, 4),
+                "choice_counts": [choices.get(str(option), 0) for option in range(len(question["options"]))],
+            })
+    rows.sort(key=lambda row: (row["correct_rate"], -row["attempts"], row["story_id"], row["question_index"]))
+    return rows[:limit]
@@ -0,0 +1,154 @@
+"""Token-bucket rate limiting per route class and principal.
+
+LocalBuckets keeps one bucket per key in an LRU-ordered dict: each check
+is O(1), the dict is capped at max_keys, and buckets that have refilled
+completely are swept periodically since they hold no state worth keeping.
+SharedBuckets keeps the buckets in a TTL-indexed collection so several
+workers enforce one budget. Client addresses come from scope["client"];
+behind a proxy run uvicorn with --proxy-headers so that is the real caller.
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Tuple
+
+import orjson
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+RETRY_AFTER = b"retry-after"
+
+
+class Limit(NamedTuple):
+    name: str
+    rate: float
+    burst: int
+    pattern: str = ""
+    methods: Tuple[str, ...] = ("POST", "PUT", "DELETE")
+    per: str = "ip"
+
+
+class LocalBuckets:
+    def __init__(self, max_keys=100000, sweep_interval=60, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._next_sweep = clock() + sweep_interval
+
+    async def ensure_indexes(self):
+        pass
+
+    async def take(self, key, rate, burst):
+        """Spend one token; return 0 if allowed, else seconds until one is available."""
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        if now >= self._next_sweep:
+            self.sweep(now)
+        return wait
+
+    def sweep(self, now=None):
+        """Drop full buckets from the least recently used end."""
+        now = self.clock() if now is None else now
+        self._next_sweep = now + self.sweep_interval
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SharedBuckets:
+    def __init__(self, get_collection, clock=time.time):
+        self.get_collection = get_collection
+        self.clock = clock
+
+    async def ensure_indexes(self):
+        await self.get_collection().create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key, rate, burst):
+        try:
+            return await self._take(key, rate, burst)
+        except DuplicateKeyError:
+            # Another worker created the bucket between our match and upsert.
+            return await self._take(key, rate, burst)
+
+    async def _take(self, key, rate, burst):
+        now = self.clock()
+        refilled = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$at", now]}]}, rate]},
+        ]}]}
+        bucket = await self.get_collection().find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "at": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=burst / rate),
+                }},
+            ],
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+
+def client_ip(scope):
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying the first matching Limit to each request.
+
+    principal(scope) returns the caller id for per="principal" limits, or
+    None to fall back to the client address.
+    """
+
+    def __init__(self, app, store, limits, principal=None):
+        self.app = app
+        self.store = store
+        self.principal = principal
+        self.limits = [(limit, re.compile(limit.pattern)) for limit in limits]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for limit, pattern in self.limits:
+                if scope["method"] in limit.methods and pattern.match(scope["path"]):
+                    caller = self.principal(scope) if limit.per == "principal" and self.principal else None
+                    wait = await self.store.take(f"{limit.name}:{caller or client_ip(scope)}", limit.rate, limit.burst)
+                    if wait:
+                        return await too_many_requests(send, wait)
+                    break
+        await self.app(scope, receive, send)
+
+
+def retry_after(wait):
+    return str(max(1, math.ceil(wait)))
+
+
+async def too_many_requests(send, wait):
+    await send({"type": "http.response.start", "status": 429, "headers": [
+        (b"content-type", b"application/json"),
+        (RETRY_AFTER, retry_after(wait).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": orjson.dumps({"detail": "Too many requests"})})
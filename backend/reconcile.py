@@ -0,0 +1,161 @@
+"""Ledger reconciliation: recompute wallet totals from db.transactions.
+
+Each kid_id range is checked with one aggregation that starts from the
+wallets, pulls the kid's ledger sums through a $lookup on the
+transactions.kid_id index ($lookup with localField and a pipeline needs
+MongoDB 5.0+), adds the totals of archived kid-month buckets and returns
+observed vs expected totals. Amounts are integer minor units (see money),
+so the sums are exact and any difference is drift. Ranges
+are independent, so they can run concurrently in one process or be split
+across processes with shards.
+"""
+import asyncio
+import time
+
+WALLET_FIELDS = ("balance", "total_earned", "total_spent", "total_saved")
+SAVE_CATEGORIES = ["goal", "sip"]
+REFUND_CATEGORIES = ["goal_refund"]
+
+_is_credit = {"$eq": ["$type", "credit"]}
+_is_debit = {"$eq": ["$type", "debit"]}
+
+LEDGER_GROUP = {
+    "_id": None,
+    "balance": {"$sum": {"$cond": [_is_credit, "$amount", {"$multiply": [-1, "$amount"]}]}},
+    "total_earned": {"$sum": {"$cond": [{"$and": [_is_credit, {"$not": [{"$in": ["$category", REFUND_CATEGORIES]}]}]}, "$amount", 0]}},
+    "total_spent": {"$sum": {"$cond": [{"$and": [_is_debit, {"$not": [{"$in": ["$category", SAVE_CATEGORIES]}]}]}, "$amount", 0]}},
+    "total_saved": {"$sum": {"$switch": {
+        "branches": [
+            {"case": {"$and": [_is_debit, {"$in": ["$category", SAVE_CATEGORIES]}]}, "then": "$amount"},
+            {"case": {"$and": [_is_credit, {"$in": ["$category", REFUND_CATEGORIES]}]}, "then": {"$multiply": [-1, "$amount"]}},
+        ],
+        "default": 0,
+    }}},
+    "transactions": {"$sum": 1},
+}
+
+EMPTY_LEDGER = {field: 0 for field in WALLET_FIELDS} | {"transactions": 0}
+
+ARCHIVE_GROUP = {
+    "_id": None,
+    **{field: {"$sum": f"$totals.{field}"} for field in WALLET_FIELDS},
+    "transactions": {"$sum": "$count"},
+}
+
+
+def ledger_contribution(txn):
+    """Per-transaction share of each wallet field, mirroring LEDGER_GROUP."""
+    amount = txn["amount"]
+    credit = txn["type"] == "credit"
+    saving = txn["category"] in SAVE_CATEGORIES
+    refund = txn["category"] in REFUND_CATEGORIES
+    return {
+        "balance": amount if credit else -amount,
+        "total_earned": amount if credit and not refund else 0,
+        "total_spent": amount if not credit and not saving else 0,
+        "total_saved": amount if not credit and saving else -amount if credit and refund else 0,
+    }
+
+
+def kid_id_ranges(chunks):
+    """Split the kid_id keyspace (uuid4 hex) into contiguous [lo, hi) ranges."""
+    bounds = [f"{i * 256 // chunks:02x}" for i in range(1, chunks)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def range_filter(lo, hi):
+    query = {}
+    if lo is not None:
+        query["$gte"] = lo
+    if hi is not None:
+        query["$lt"] = hi
+    return {"kid_id": query} if query else {}
+
+
+def ledger_pipeline(match):
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "kid_id": 1, **{field: 1 for field in WALLET_FIELDS}}},
+        {"$lookup": {"from": "transactions", "localField": "kid_id", "foreignField": "kid_id", "pipeline": [{"$group": LEDGER_GROUP}], "as": "ledger"}},
+        {"$lookup": {"from": "transactions_archive", "localField": "kid_id", "foreignField": "kid_id", "pipeline": [{"$group": ARCHIVE_GROUP}], "as": "archived"}},
+        {"$set": {
+            "ledger": {"$ifNull": [{"$first": "$ledger"}, EMPTY_LEDGER]},
+            "archived": {"$ifNull": [{"$first": "$archived"}, EMPTY_LEDGER]},
+        }},
+        {"$set": {"ledger": {field: {"$add": [f"$ledger.{field}", f"$archived.{field}"]} for field in EMPTY_LEDGER}}},
+        {"$unset": "archived"},
+    ]
+
+
+def diff_wallet(row):
+    """Return {field: {"wallet": x, "ledger": y}} for every drifted field."""
+    ledger = row["ledger"]
+    diff = {}
+    for field in WALLET_FIELDS:
+        observed = row.get(field, 0) or 0
+        expected = ledger.get(field, 0) or 0
+        if observed != expected:
+            diff[field] = {"wallet": observed, "ledger": expected}
+    return diff
+
+
+async def reconcile_range(db, lo, hi):
+    rows = await db.wallets.aggregate(ledger_pipeline(range_filter(lo, hi))).to_list(None)
+    mismatches = []
+    scanned = 0
+    for row in rows:
+        scanned += row["ledger"]["transactions"]
+        diff = diff_wallet(row)
+        if diff:
+            mismatches.append({"kid_id": row["kid_id"], "fields": diff})
+    return {"kids": len(rows), "transactions": scanned, "mismatches": mismatches}
+
+
+async def repair(db, mismatches):
+    """Re-check drifted wallets and overwrite them with the ledger totals.
+
+    The update is guarded by the wallet values seen in the re-check, so a
+    wallet that moved in between is left alone and reported as skipped.
+    """
+    if not mismatches:
+        return {"repaired": 0, "skipped": 0}
+    rows = await db.wallets.aggregate(ledger_pipeline({"kid_id": {"$in": [m["kid_id"] for m in mismatches]}})).to_list(None)
+    repaired = skipped = 0
+    for row in rows:
+        if not diff_wallet(row):
+            skipped += 1
+            continue
+        observed = {field: row.get(field, 0) for field in WALLET_FIELDS}
+        expected = {field: row["ledger"][field] for field in WALLET_FIELDS}
+        result = await db.wallets.update_one({"kid_id": row["kid_id"], **observed}, {"$set": expected})
+        if result.modified_count:
+            repaired += 1
+        else:
+            skipped += 1
+    return {"repaired": repaired, "skipped": skipped}
+
+
+async def reconcile(db, chunks=16, parallel=4, fix=False, shard=0, shards=1):
+    ranges = kid_id_ranges(chunks)[shard::shards]
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def run(lo, hi):
+        async with semaphore:
+            return await reconcile_range(db, lo, hi)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(lo, hi) for lo, hi in ranges))
+    elapsed = time.perf_counter() - started
+    mismatches = [m for r in results for m in r["mismatches"]]
+    transactions = sum(r["transactions"] for r in results)
+    report = {
+        "ranges": len(ranges),
+        "kids_checked": sum(r["kids"] for r in results),
+        "transactions_scanned": transactions,
+        "mismatches": mismatches,
+        "elapsed_seconds": round(elapsed, 3),
+        "transactions_per_second": round(transactions / elapsed) if elapsed else None,
+    }
+    if fix:
+        report.update(await repair(db, mismatches))
+    return report
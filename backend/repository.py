@@ -0,0 +1,188 @@
+"""Storage backends behind the module-level `db` used by the handlers.
+
+A repository exposes each collection as an attribute (db.kids, db.wallets,
+...) with the Motor collection API, plus ping() and close(). The Motor
+backend talks to MongoDB; the memory backend keeps everything in-process
+(see memorydb.py) so the whole API can run without a deployment. The
+Motor backend can also hand out per-session views (see routing.py).
+"""
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from pymongo.read_concern import ReadConcern
+
+from memorydb import MemoryCollection
+
+COLLECTIONS = (
+    "users", "kids", "wallets", "transactions", "tasks", "goals", "sips", "loans", "learning_progress",
+    "rollups", "transactions_archive", "idempotency_keys", "rate_limits",
+    "sessions", "revocations", "question_stats", "score_history",
+)
+BACKENDS = ("motor", "memory")
+
+
+class Repository:
+    def collection(self, name):
+        raise NotImplementedError
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.collection(name)
+
+    def __getitem__(self, name):
+        return self.collection(name)
+
+    async def ping(self):
+        pass
+
+    async def start_session(self):
+        """A causally consistent client session, or None if the backend has none."""
+        return None
+
+    def view(self, session, secondary=False):
+        """This repository as seen from one session, reading from secondaries if asked."""
+        return self
+
+    def close(self):
+        pass
+
+
+class RepositoryWrapper(Repository):
+    """Delegates everything to another repository; subclasses adjust collection()."""
+
+    def __init__(self, base):
+        self.base = base
+
+    def collection(self, name):
+        return self.base.collection(name)
+
+    async def ping(self):
+        await self.base.ping()
+
+    async def start_session(self):
+        return await self.base.start_session()
+
+    def view(self, session, secondary=False):
+        return self.base.view(session, secondary)
+
+    def close(self):
+        self.base.close()
+
+
+class MotorRepository(Repository):
+    def __init__(self, settings):
+        self.client = AsyncIOMotorClient(settings.mongo_url, **settings.client_options())
+        self.database = self.client[settings.db_name]
+
+    def collection(self, name):
+        return self.database[name]
+
+    async def ping(self):
+        await self.database.command("ping")
+
+    async def start_session(self):
+        return await self.client.start_session(causal_consistency=True)
+
+    def view(self, session, secondary=False):
+        database = self.database
+        if secondary:
+            database = database.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED, read_concern=ReadConcern("majority"))
+        return SessionView(database, session)
+
+    def close(self):
+        self.client.close()
+
+
+class SessionCursor:
+    """Cursor proxy whose fetches take the session lock."""
+
+    FETCHES = frozenset({"to_list", "next", "explain"})
+
+    def __init__(self, cursor, lock):
+        self._cursor = cursor
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+        if name in self.FETCHES:
+            async def fetch(*args, **kwargs):
+                async with self._lock:
+                    return await attr(*args, **kwargs)
+            return fetch
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chain
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        async with self._lock:
+            return await self._cursor.__anext__()
+
+
+class SessionCollection:
+    """Collection proxy that passes the request's session to every call.
+
+    Every operation through one session is serialized, reads included:
+    a ClientSession is not thread-safe, and handlers that gather several
+    queries would otherwise race on its transaction number and on the
+    operation and cluster times that make the reads causal. Cursor
+    methods return a SessionCursor so their fetches take the same lock.
+    """
+
+    CURSORS = frozenset({"find", "aggregate", "list_indexes"})
+
+    def __init__(self, collection, session, lock):
+        self._collection = collection
+        self._session = session
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+        if name in self.CURSORS:
+            def cursor(*args, **kwargs):
+                kwargs.setdefault("session", self._session)
+                return SessionCursor(attr(*args, **kwargs), self._lock)
+            return cursor
+
+        async def call(*args, **kwargs):
+            kwargs.setdefault("session", self._session)
+            async with self._lock:
+                return await attr(*args, **kwargs)
+        return call
+
+
+class SessionView(Repository):
+    def __init__(self, database, session):
+        self.database = database
+        self.session = session
+        self.lock = asyncio.Lock()
+        self.active = True
+
+    def collection(self, name):
+        return SessionCollection(self.database[name], self.session, self.lock)
+
+
+class MemoryRepository(Repository):
+    def __init__(self):
+        self.collections = {name: MemoryCollection(name) for name in COLLECTIONS}
+
+    def collection(self, name):
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name)
+        return self.collections[name]
+
+
+def open_repository(settings):
+    if settings.backend == "memory":
+        return MemoryRepository()
+    return MotorRepository(settings)
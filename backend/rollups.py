@@ -0,0 +1,99 @@
+"""Weekly and monthly earning/spending rollups per kid and category.
+
+add_transaction bumps one document per granularity with an upserted $inc,
+so trend queries read at most periods x categories small documents no
+matter how long a kid's history is. backfill() rebuilds the collection
+from db.transactions in one server-side aggregation.
+"""
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+GRANULARITIES = ("week", "month")
+
+
+def period_key(granularity, when):
+    if granularity == "week":
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{when.year}-{when.month:02d}"
+
+
+def first_period(granularity, periods, now=None):
+    now = now or datetime.now(timezone.utc)
+    if granularity == "week":
+        return period_key("week", now - timedelta(weeks=periods - 1))
+    month_index = now.year * 12 + now.month - 1 - (periods - 1)
+    return f"{month_index // 12}-{month_index % 12 + 1:02d}"
+
+
+def rollup_updates(txn):
+    when = datetime.fromisoformat(txn["created_at"])
+    field = "earned" if txn["type"] == "credit" else "spent"
+    return [
+        UpdateOne(
+            {"kid_id": txn["kid_id"], "granularity": granularity, "period": period_key(granularity, when), "category": txn["category"]},
+            {"$inc": {field: txn["amount"], "count": 1}},
+            upsert=True,
+        )
+        for granularity in GRANULARITIES
+    ]
+
+
+async def ensure_indexes(db):
+    await db.rollups.create_index([("kid_id", 1), ("granularity", 1), ("period", 1), ("category", 1)], unique=True)
+
+
+def backfill_pipeline(granularity, match=None):
+    created = {"$dateFromString": {"dateString": "$created_at"}}
+    if granularity == "week":
+        period = {"$concat": [
+            {"$toString": {"$isoWeekYear": created}}, "-W",
+            {"$cond": [{"$lt": [{"$isoWeek": created}, 10]}, "0", ""]}, {"$toString": {"$isoWeek": created}},
+        ]}
+    else:
+        period = {"$dateToString": {"format": "%Y-%m", "date": created}}
+    return [
+        {"$match": match or {}},
+        {"$group": {
+            "_id": {"kid_id": "$kid_id", "period": period, "category": "$category"},
+            "earned": {"$sum": {"$cond": [{"$eq": ["$type", "credit"]}, "$amount", 0]}},
+            "spent": {"$sum": {"$cond": [{"$eq": ["$type", "credit"]}, 0, "$amount"]}},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "kid_id": "$_id.kid_id", "granularity": granularity, "period": "$_id.period",
+            "category": "$_id.category", "earned": 1, "spent": 1, "count": 1,
+        }},
+        {"$merge": {"into": "rollups", "on": ["kid_id", "granularity", "period", "category"], "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def backfill(db, kid_id=None):
+    """Recompute rollups from the transaction log (replaces existing buckets)."""
+    await ensure_indexes(db)
+    match = {"kid_id": kid_id} if kid_id else {}
+    for granularity in GRANULARITIES:
+        await db.transactions.aggregate(backfill_pipeline(granularity, match)).to_list(None)
+    return {"buckets": await db.rollups.count_documents(match)}
+
+
+async def trend(db, kid_id, granularity="week", periods=12):
+    start = first_period(granularity, periods)
+    buckets = await db.rollups.find(
+        {"kid_id": kid_id, "granularity": granularity, "period": {"$gte": start}},
+        {"_id": 0, "period": 1, "category": 1, "earned": 1, "spent": 1, "count": 1},
+    ).sort("period", 1).to_list(None)
+    series, categories = {}, {}
+    for bucket in buckets:
+        for totals, key in ((series, bucket["period"]), (categories, bucket["category"])):
+            entry = totals.setdefault(key, {"earned": 0, "spent": 0, "count": 0})
+            entry["earned"] += bucket.get("earned", 0)
+            entry["spent"] += bucket.get("spent", 0)
+            entry["count"] += bucket.get("count", 0)
+    return {
+        "kid_id": kid_id,
+        "granularity": granularity,
+        "series": [{"period": period, **totals} for period, totals in series.items()],
+        "by_category": [{"category": category, **totals} for category, totals in sorted(categories.items())],
+    }
@@ -0,0 +1,106 @@
+"""Read-preference routing for read-only endpoints.
+
+When enabled, every authenticated request runs in its own causally
+consistent client session. GET requests whose path matches one of the
+configured read routes use a view of the database with a secondaryPreferred
+read preference and majority read concern; everything else stays on the
+primary. After each request the session's cluster and operation times are
+remembered per principal (kid or parent) and the next session for that
+principal is advanced to them, so a secondary read waits until it has
+replicated that caller's own earlier writes -- a kid who just completed a
+task sees it on the dashboard poll that follows. The remembered times live
+in the worker; with several workers the guarantee holds per worker.
+
+Handlers keep using the module-level `db`: RoutedRepository looks up the
+current request's view in a context variable and falls back to the base
+repository outside a request or once that request has finished (background
+flushes, startup, CLI).
+"""
+import re
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from repository import RepositoryWrapper
+
+_current_view = ContextVar("repository_view", default=None)
+
+
+class RoutedRepository(RepositoryWrapper):
+    def collection(self, name):
+        view = _current_view.get()
+        if view is not None and view.active:
+            return view.collection(name)
+        return self.base.collection(name)
+
+
+class ReadRouter:
+    def __init__(self, routes, max_principals=100000):
+        self.routes = [re.compile(pattern) for pattern in routes]
+        self.max_principals = max_principals
+        self._times = OrderedDict()
+
+    def reads_from_secondary(self, method, path):
+        return method in ("GET", "HEAD") and any(pattern.match(path) for pattern in self.routes)
+
+    def resume(self, principal, session):
+        """Advance a new session to the principal's last seen cluster and operation time."""
+        times = self._times.get(principal)
+        if times is None:
+            return
+        self._times.move_to_end(principal)
+        cluster_time, operation_time = times
+        if cluster_time is not None:
+            session.advance_cluster_time(cluster_time)
+        if operation_time is not None:
+            session.advance_operation_time(operation_time)
+
+    def remember(self, principal, session):
+        cluster_time, operation_time = session.cluster_time, session.operation_time
+        if operation_time is None:
+            return
+        previous = self._times.get(principal)
+        if previous and previous[1] is not None and previous[1] >= operation_time:
+            return
+        self._times[principal] = (cluster_time, operation_time)
+        self._times.move_to_end(principal)
+        while len(self._times) > self.max_principals:
+            self._times.popitem(last=False)
+
+    def __len__(self):
+        return len(self._times)
+
+
+class ReadRoutingMiddleware:
+    """Pure ASGI middleware that opens the causal session and picks the view.
+
+    get_repository() returns the base repository (it is only opened in the
+    lifespan); principal(scope) returns the caller id or None, and requests
+    without one run outside a session on the primary.
+    """
+
+    def __init__(self, app, router, get_repository, principal):
+        self.app = app
+        self.router = router
+        self.get_repository = get_repository
+        self.principal = principal
+
+    async def __call__(self, scope, receive, send):
+        caller = self.principal(scope) if scope["type"] == "http" else None
+        if caller is None:
+            return await self.app(scope, receive, send)
+        repository = self.get_repository()
+        session = await repository.start_session()
+        if session is None:
+            return await self.app(scope, receive, send)
+        try:
+            self.router.resume(caller, session)
+            view = repository.view(session, secondary=self.router.reads_from_secondary(scope["method"], scope["path"]))
+            token = _current_view.set(view)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                view.active = False
+                _current_view.reset(token)
+            self.router.remember(caller, session)
+        finally:
+            await session.end_session()
@@ -0,0 +1,108 @@
+"""Gamification rules: levels, XP/credit awards per event, and badges.
+
+The rules live in a JSON file (rules.json by default) and are compiled
+into lookup structures: sorted XP thresholds for bisect level lookups and
+the $switch expression the kids update uses, an event -> Award map, and
+badge thresholds grouped and sorted per stat so the earned badges for a
+stats dict come from one bisect per stat. RuleBook re-reads the file
+when its mtime changes (checked at most every check_interval seconds) and
+keeps the previous rules if the new file does not compile.
+"""
+import bisect
+import json
+import logging
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+DEFAULT_PATH = Path(__file__).with_name("rules.json")
+
+logger = logging.getLogger(__name__)
+
+
+class Award(NamedTuple):
+    xp: int = 0
+    credit: int = 0
+
+
+class Rules:
+    def __init__(self, data):
+        levels = sorted(data["levels"], key=lambda lvl: lvl["xp_required"])
+        if not levels:
+            raise ValueError("rules need at least one level")
+        self.levels = levels
+        self._thresholds = [lvl["xp_required"] for lvl in levels]
+        self._by_level = {lvl["level"]: lvl for lvl in levels}
+        self.level_expr = {"$switch": {
+            "branches": [{"case": {"$gte": ["$xp", lvl["xp_required"]]}, "then": lvl["level"]} for lvl in reversed(levels)],
+            "default": levels[0]["level"],
+        }}
+
+        credit = data.get("credit_score", {})
+        self.credit_initial = credit.get("initial", 500)
+        self.credit_min = credit.get("min", 0)
+        self.credit_max = credit.get("max", 1000)
+
+        self.awards = {event: Award(**spec) for event, spec in data.get("events", {}).items()}
+
+        by_stat = {}
+        for badge in data.get("badges", []):
+            by_stat.setdefault(badge["stat"], []).append(badge)
+        self._badges = []
+        for stat, badges in by_stat.items():
+            badges.sort(key=lambda badge: badge["min"])
+            self._badges.append((stat, [badge["min"] for badge in badges], [{k: badge[k] for k in ("name", "icon", "desc")} for badge in badges]))
+        self._level_numbers = sorted(self._by_level)
+        self._level_badges = [
+            {"name": f"Level {n}: {self._by_level[n]['name']}", "icon": self._by_level[n]["icon"], "desc": f"Reached level {n}"}
+            for n in self._level_numbers
+        ]
+
+    def level_for_xp(self, xp):
+        return self.levels[max(0, bisect.bisect_right(self._thresholds, xp) - 1)]
+
+    def next_level(self, level):
+        return self._by_level.get(level + 1)
+
+    def award(self, event):
+        return self.awards.get(event, Award())
+
+    def badges(self, stats, level):
+        earned = []
+        for stat, thresholds, badges in self._badges:
+            earned.extend(badges[:bisect.bisect_right(thresholds, stats.get(stat, 0))])
+        earned.extend(self._level_badges[:bisect.bisect_right(self._level_numbers, level)])
+        return earned
+
+
+def load(path):
+    with open(path, "rb") as handle:
+        return Rules(json.load(handle))
+
+
+class RuleBook:
+    def __init__(self, path=None, check_interval=5, clock=time.monotonic):
+        self.path = Path(path or DEFAULT_PATH)
+        self.check_interval = check_interval
+        self.clock = clock
+        self._mtime = self.path.stat().st_mtime
+        self.rules = load(self.path)
+        self._next_check = clock() + check_interval
+
+    def current(self):
+        now = self.clock()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.reload()
+        return self.rules
+
+    def reload(self):
+        try:
+            mtime = self.path.stat().st_mtime
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self.rules = load(self.path)
+                logger.info("Reloaded gamification rules from %s", self.path)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Keeping previous gamification rules: %s", exc)
+        return self.rules
@@ -1,30 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
-import os
+from contextlib import asynccontextmanager
+from collections import defaultdict
+import asyncio
+import base64
+import heapq
 import uuid
 import logging
 import bcrypt
+import csv
 import jwt
 import math
+import orjson
+import re
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from money import MajorAmount, MinorAmount
+from ratelimit import Limit, LocalBuckets, RateLimitMiddleware, SharedBuckets, client_ip, retry_after
+from repository import open_repository
+from settings import Settings
+import archive
+import forecast
+import history
+import leaderboard
+import money
+import onboarding
+import profiling
+import quiz
+import rollups
+import routing
+import rules
+import tokens
+import write_buffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+settings: Optional[Settings] = None
+db = None
+rate_limit_store = None
+revocations: Optional[tokens.RevocationList] = None
+leaderboards: dict = {}
+goal_forecasts: Optional[forecast.ForecastCache] = None
+rulebook: Optional[rules.RuleBook] = None
+transaction_buffer: Optional[write_buffer.WriteBuffer] = None
+active_app: Optional[FastAPI] = None
 
-JWT_SECRET = os.environ.get('JWT_SECRET')
-JWT_ALG = "HS256"
-
-app = FastAPI(title="Kids Money API")
 api = APIRouter(prefix="/api")
 security = HTTPBearer()
 
@@ -33,19 +62,6 @@ logger = logging.getLogger(__name__)
 
 # ==================== CONSTANTS ====================
 
-LEVELS = [
-    {"level": 1, "name": "Money Beginner", "xp_required": 0, "icon": "sprout"},
-    {"level": 2, "name": "Smart Saver", "xp_required": 100, "icon": "piggy-bank"},
-    {"level": 3, "name": "Goal Tracker", "xp_required": 250, "icon": "target"},
-    {"level": 4, "name": "Consistency Champ", "xp_required": 500, "icon": "trophy"},
-    {"level": 5, "name": "Budget Hero", "xp_required": 1000, "icon": "shield"},
-    {"level": 6, "name": "Mini Investor", "xp_required": 1750, "icon": "trending-up"},
-    {"level": 7, "name": "EMI Master", "xp_required": 2750, "icon": "award"},
-    {"level": 8, "name": "Discipline Pro", "xp_required": 4000, "icon": "star"},
-    {"level": 9, "name": "Finance Ninja", "xp_required": 5500, "icon": "zap"},
-    {"level": 10, "name": "Money Legend", "xp_required": 7500, "icon": "crown"},
-]
-
 AVATARS = [
     {"id": "lion", "name": "Lion", "color": "#FB923C", "icon": "cat"},
     {"id": "bear", "name": "Bear", "color": "#A78BFA", "icon": "paw-print"},
@@ -125,6 +141,66 @@ STORIES = [
     }
 ]
 
+ANSWER_KEY = quiz.answer_key(STORIES)
+
+MONEY_ROUTES = [
+    r"^/api/kids$",
+    r"^/api/tasks/[^/]+/(complete|approve|reject)$",
+    r"^/api/goals/[^/]+/contribute$",
+    r"^/api/sip/[^/]+/pay$",
+    r"^/api/loans/[^/]+/(approve|pay)$",
+    r"^/api/kid/tasks/[^/]+/complete$",
+    r"^/api/kid/goals/[^/]+/contribute$",
+    r"^/api/kid/sip/[^/]+/pay$",
+    r"^/api/kid/loans/[^/]+/pay$",
+]
+
+RATE_LIMITS = [
+    Limit("auth", rate=1 / 3, burst=20, pattern=r"^/api/auth/(login|kid-login|signup)$", methods=("POST",)),
+    Limit("money", rate=5, burst=30, pattern="|".join(MONEY_ROUTES), per="principal"),
+]
+READ_ROUTES = {
+    "wallet": r"^/api/(wallet/[^/]+|kid/wallet)$",
+    "transactions": r"^/api/(wallet/[^/]+/transactions|kid/transactions)$",
+    "tasks": r"^/api/(tasks/[^/]+|kid/tasks)$",
+    "goals": r"^/api/(goals/[^/]+(/forecast)?|kid/goals(/forecast)?)$",
+    "sip": r"^/api/(sip/[^/]+|kid/sip)$",
+    "loans": r"^/api/(loans/[^/]+|kid/loans)$",
+    "dashboards": r"^/api/(dashboard/kid/[^/]+|dashboard/family|kid/dashboard|kid/me)$",
+    "learning": r"^/api/(learning/progress/[^/]+|kid/learning/progress|learning/analytics/questions)$",
+    "analytics": r"^/api/(analytics/[^/]+|kid/analytics|history/[^/]+|kid/history)$",
+    "leaderboards": r"^/api/(kid/)?leaderboard/",
+    "achievements": r"^/api/kid/achievements$",
+}
+
+ACCOUNT_LOGIN_LIMIT = Limit("login-account", rate=1 / 60, burst=10)
+KID_PIN_LIMIT = Limit("kid-pin", rate=1 / 60, burst=10)
+KID_FAMILY_PIN_LIMIT = Limit("kid-pin-family", rate=1 / 12, burst=50)
+
+LEADERBOARD_METRICS = {"xp": 0, "credit_score": 500}
+METRIC_PATTERN = "^(xp|level|credit_score)$"
+MAX_IMPORT_ROWS = 20000
+
+# ==================== PROJECTIONS ====================
+
+NO_ID = {"_id": 0}
+ID_ONLY = {"_id": 0, "id": 1}
+USER_PUBLIC = {"_id": 0, "password_hash": 0}
+KID_PUBLIC = {"_id": 0, "pin": 0}
+KID_SUMMARY = {"_id": 0, "id": 1, "name": 1, "age": 1, "avatar": 1, "ui_theme": 1, "level": 1, "xp": 1, "credit_score": 1}
+WALLET_SUMMARY = {"_id": 0, "balance": 1, "total_earned": 1, "total_spent": 1, "total_saved": 1}
+TXN_SUMMARY = {"_id": 0, "id": 1, "type": 1, "amount": 1, "description": 1, "category": 1, "created_at": 1}
+TASK_SUMMARY = {"_id": 0, "id": 1, "kid_id": 1, "title": 1, "reward_amount": 1, "frequency": 1, "approval_required": 1, "status": 1, "created_at": 1}
+GOAL_SUMMARY = {"_id": 0, "id": 1, "title": 1, "target_amount": 1, "saved_amount": 1, "deadline": 1, "status": 1}
+SIP_SUMMARY = {"_id": 0, "id": 1, "amount": 1, "frequency": 1, "total_invested": 1, "current_value": 1, "payments_made": 1, "status": 1}
+LOAN_SUMMARY = {"_id": 0, "id": 1, "purpose": 1, "principal": 1, "emi_amount": 1, "remaining_balance": 1, "payments_made": 1, "status": 1}
+LEARNING_SUMMARY = {"_id": 0, "story_id": 1, "score": 1, "completed_at": 1}
+
+VIEW_PATTERN = "^(full|summary)$"
+
+def pick_projection(view: str, full: dict, summary: dict) -> dict:
+    return summary if view == "summary" else full
+
 # ==================== PYDANTIC MODELS ====================
 
 class SignupRequest(BaseModel):
@@ -141,7 +217,7 @@ class KidCreate(BaseModel):
     age: int
     avatar: str = "panda"
     grade: Optional[str] = None
-    starting_balance: float = 0
+    starting_balance: MinorAmount = 0
     ui_theme: str = "neutral"
     pin: Optional[str] = None
 
@@ -152,34 +228,35 @@ class KidUpdate(BaseModel):
     grade: Optional[str] = None
     ui_theme: Optional[str] = None
     pin: Optional[str] = None
+    leaderboard_opt_in: Optional[bool] = None
 
 class TaskCreate(BaseModel):
     kid_id: str
     title: str
     description: Optional[str] = ""
-    reward_amount: float
-    penalty_amount: float = 0
+    reward_amount: MinorAmount
+    penalty_amount: MinorAmount = 0
     frequency: str = "one-time"
     approval_required: bool = True
 
 class GoalCreate(BaseModel):
     kid_id: str
     title: str
-    target_amount: float
+    target_amount: MinorAmount
     deadline: Optional[str] = None
 
 class GoalContribute(BaseModel):
-    amount: float
+    amount: MinorAmount
 
 class SIPCreate(BaseModel):
     kid_id: str
-    amount: float
+    amount: MinorAmount
     interest_rate: float = 8.0
     frequency: str = "monthly"
 
 class LoanRequest(BaseModel):
     kid_id: str
-    amount: float
+    amount: MinorAmount
     purpose: str
     duration_months: int = 6
     interest_rate: float = 5.0
@@ -187,16 +264,256 @@ class LoanRequest(BaseModel):
 class LearningComplete(BaseModel):
     kid_id: str
     story_id: str
-    score: int
+    answers: List[int]
 
 class KidLoginRequest(BaseModel):
     parent_email: str
     kid_name: str
     pin: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class KidLearningComplete(BaseModel):
+    story_id: str
+    answers: List[int]
+
+# ==================== RESPONSE MODELS ====================
+
+class APIModel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+class KidOut(APIModel):
+    id: str
+    name: str
+    age: int
+    avatar: str
+    ui_theme: str = "neutral"
+    level: int = 1
+    xp: int = 0
+    credit_score: int = 500
+    grade: Optional[str] = None
+    parent_id: Optional[str] = None
+    pin: Optional[str] = None
+    leaderboard_opt_in: Optional[bool] = None
+    created_at: Optional[str] = None
+
+class WalletOut(APIModel):
+    balance: MajorAmount
+    total_earned: MajorAmount
+    total_spent: MajorAmount
+    total_saved: MajorAmount
+    id: Optional[str] = None
+    kid_id: Optional[str] = None
+
+class TransactionOut(APIModel):
+    id: str
+    type: str
+    amount: MajorAmount
+    description: str
+    category: str
+    created_at: str
+    kid_id: Optional[str] = None
+    reference_id: Optional[str] = None
+
+class TaskOut(APIModel):
+    id: str
+    kid_id: str
+    title: str
+    reward_amount: MajorAmount
+    frequency: str
+    approval_required: bool
+    status: str
+    created_at: str
+    parent_id: Optional[str] = None
+    description: Optional[str] = None
+    penalty_amount: Optional[MajorAmount] = None
+
+class GoalOut(APIModel):
+    id: str
+    title: str
+    target_amount: MajorAmount
+    saved_amount: MajorAmount
+    deadline: Optional[str] = None
+    status: str
+    kid_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    created_at: Optional[str] = None
+
+class GoalForecastOut(APIModel):
+    goal_id: str
+    title: str
+    target_amount: MajorAmount
+    saved_amount: MajorAmount
+    remaining: MajorAmount
+    daily_rate: MajorAmount
+    contributions: int
+    last_contribution_at: Optional[str] = None
+    projected_date: Optional[str] = None
+    deadline: Optional[str] = None
+    on_track: Optional[bool] = None
+    required_daily_rate: Optional[MajorAmount] = None
+    status: str
+
+class SIPOut(APIModel):
+    id: str
+    amount: MajorAmount
+    frequency: str
+    total_invested: MajorAmount
+    current_value: MajorAmount
+    payments_made: int
+    status: str
+    kid_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    interest_rate: Optional[float] = None
+    created_at: Optional[str] = None
+
+class LoanOut(APIModel):
+    id: str
+    purpose: str
+    principal: MajorAmount
+    emi_amount: MajorAmount
+    remaining_balance: MajorAmount
+    last_payment_amount: Optional[MajorAmount] = None
+    payments_made: int
+    status: str
+    kid_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    interest_rate: Optional[float] = None
+    duration_months: Optional[int] = None
+    created_at: Optional[str] = None
+
+class LearningProgressOut(APIModel):
     story_id: str
     score: int
+    completed_at: str
+    id: Optional[str] = None
+    kid_id: Optional[str] = None
+    answers: Optional[List[int]] = None
+    results: Optional[List[bool]] = None
+    attempts: Optional[int] = None
+
+class LeaderboardEntryOut(APIModel):
+    rank: int
+    name: str
+    avatar: Optional[str] = None
+    level: int = 1
+    xp: int = 0
+    credit_score: int = 500
+    id: Optional[str] = None
+
+class LeaderboardRankOut(APIModel):
+    metric: str
+    family_rank: Optional[int] = None
+    family_size: int
+    global_rank: Optional[int] = None
+    global_size: int
+
+class HistoryPointOut(APIModel):
+    t: str
+    value: int
+    delta: int
+    events: int
+
+class HistoryOut(APIModel):
+    metric: str
+    since: str
+    until: str
+    points: List[HistoryPointOut]
+
+class QuestionStatOut(APIModel):
+    story_id: str
+    story_title: str
+    question_index: int
+    question: str
+    attempts: int
+    correct: int
+    correct_rate: float
+    choice_counts: List[int]
+
+class LevelOut(APIModel):
+    level: int
+    name: str
+    xp_required: int
+    icon: str
+
+class DashboardStats(APIModel):
+    total_tasks_completed: int
+    total_stories_read: int
+    active_goals_count: int
+    active_sips_count: int
+
+class DashboardOut(APIModel):
+    kid: KidOut
+    wallet: Optional[WalletOut] = None
+    level_info: LevelOut
+    next_level: Optional[LevelOut] = None
+    active_tasks: List[TaskOut]
+    recent_transactions: List[TransactionOut]
+    active_goals: List[GoalOut]
+    active_sips: List[SIPOut]
+    active_loans: List[LoanOut]
+    learning_progress: List[LearningProgressOut]
+    stats: DashboardStats
+
+class FamilyKidOut(APIModel):
+    kid: KidOut
+    wallet: Optional[WalletOut] = None
+    level_info: LevelOut
+    pending_tasks: List[TaskOut]
+    active_goals: List[GoalOut]
+    active_sips: List[SIPOut]
+    active_loans: List[LoanOut]
+    pending_approvals: int
+
+class FamilyStats(APIModel):
+    kids_count: int
+    total_balance: MajorAmount
+    pending_approvals: int
+
+class FamilyDashboardOut(APIModel):
+    kids: List[FamilyKidOut]
+    stats: FamilyStats
+
+class ApprovalItemOut(APIModel):
+    kind: str
+    id: str
+    kid_id: str
+    title: str
+    amount: MajorAmount
+    created_at: str
+
+class ApprovalCounts(APIModel):
+    tasks: int
+    loans: int
+    total: int
+
+class ApprovalsOut(APIModel):
+    items: List[ApprovalItemOut]
+    next_cursor: Optional[str] = None
+    counts: ApprovalCounts
+
+class RollupTotals(APIModel):
+    earned: MajorAmount
+    spent: MajorAmount
+    count: int
+
+class RollupPeriodOut(RollupTotals):
+    period: str
+
+class RollupCategoryOut(RollupTotals):
+    category: str
+
+class AnalyticsOut(APIModel):
+    kid_id: str
+    granularity: str
+    series: List[RollupPeriodOut]
+    by_category: List[RollupCategoryOut]
+
+class KidMeOut(KidOut):
+    wallet: Optional[WalletOut] = None
+    level_info: LevelOut
+    next_level: Optional[LevelOut] = None
 
 # ==================== AUTH UTILS ====================
 
@@ -206,77 +523,184 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def create_token(user_id: str, role: str = "parent", kid_id: str = None) -> str:
-    payload = {
+async def enforce_rate_limit(limit: Limit, principal: str):
+    if not settings.rate_limit_enabled:
+        return
+    wait = await rate_limit_store.take(f"{limit.name}:{principal}", limit.rate, limit.burst)
+    if wait:
+        raise HTTPException(status_code=429, detail="Too many attempts, try again later", headers={"Retry-After": retry_after(wait)})
+
+def rate_limit_principal(scope) -> Optional[str]:
+    auth = dict(scope["headers"]).get(b"authorization", b"")
+    if not auth.startswith(b"Bearer "):
+        return None
+    try:
+        payload = tokens.decode(settings.jwt_secret, auth[7:].decode())
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get("kid_id") or payload.get("user_id")
+
+def create_token(user_id: str, role: str = "parent", kid_id: str = None, kid_ids: Optional[List[str]] = None, sid: str = None) -> str:
+    claims = tokens.access_claims(user_id, role, sid, kid_id, kid_ids)
+    return tokens.encode(settings.jwt_secret, claims, settings.access_token_ttl_seconds, tokens.ACCESS)
+
+async def owned_kid_ids(parent_id: str) -> List[str]:
+    kids = await db.kids.find({"parent_id": parent_id}, ID_ONLY).to_list(tokens.MAX_KID_CLAIMS + 1)
+    return [k["id"] for k in kids]
+
+async def issue_tokens(user_id: str, role: str = "parent", kid_id: str = None) -> dict:
+    sid = str(uuid.uuid4())
+    refresh_jti = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    await db.sessions.insert_one({
+        "id": sid,
         "user_id": user_id,
         "role": role,
-        "exp": datetime.now(timezone.utc) + timedelta(days=7),
-        "iat": datetime.now(timezone.utc)
+        "kid_id": kid_id,
+        "refresh_jti": refresh_jti,
+        "revoked": False,
+        "created_at": now.isoformat(),
+        "expires_at": now + timedelta(seconds=settings.refresh_token_ttl_seconds),
+    })
+    kid_ids = await owned_kid_ids(user_id) if role == "parent" else None
+    return {
+        "token": create_token(user_id, role, kid_id, kid_ids, sid),
+        "refresh_token": tokens.encode(settings.jwt_secret, {"sid": sid, "rjti": refresh_jti}, settings.refresh_token_ttl_seconds, tokens.REFRESH),
+        "expires_in": settings.access_token_ttl_seconds,
     }
-    if kid_id:
-        payload["kid_id"] = kid_id
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALG])
-        role = payload.get("role", "parent")
-        if role == "kid":
-            kid = await db.kids.find_one({"id": payload.get("kid_id")}, {"_id": 0})
-            if not kid:
-                raise HTTPException(status_code=401, detail="Kid not found")
-            return {**kid, "role": "kid", "user_id": payload["user_id"]}
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return {**user, "role": "parent"}
+        return tokens.decode(settings.jwt_secret, token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def verify_parent(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALG])
-        if payload.get("role") == "kid":
-            raise HTTPException(status_code=403, detail="Parent access required")
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
+async def access_payload(credentials: HTTPAuthorizationCredentials) -> dict:
+    payload = decode_token(credentials.credentials)
+    if payload.get("typ") == tokens.REFRESH:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("typ") == tokens.ACCESS:
+        await revocations.sync()
+        if revocations.is_revoked(payload):
+            raise HTTPException(status_code=401, detail="Token revoked")
+    return payload
 
-async def verify_kid(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALG])
-        if payload.get("role") != "kid":
-            raise HTTPException(status_code=403, detail="Kid access required")
-        kid = await db.kids.find_one({"id": payload.get("kid_id")}, {"_id": 0})
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = await access_payload(credentials)
+    role = payload.get("role", "parent")
+    if role == "kid":
+        kid = await db.kids.find_one({"id": payload.get("kid_id")}, KID_PUBLIC)
         if not kid:
             raise HTTPException(status_code=401, detail="Kid not found")
-        return kid
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        return {**kid, "role": "kid", "user_id": payload["user_id"]}
+    user = await db.users.find_one({"id": payload["user_id"]}, USER_PUBLIC)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return {**user, "role": "parent"}
+
+async def verify_parent(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = await access_payload(credentials)
+    if payload.get("role") == "kid":
+        raise HTTPException(status_code=403, detail="Parent access required")
+    if payload.get("typ") == tokens.ACCESS:
+        return {"id": payload["user_id"], "kid_ids": payload.get("kid_ids"), "sid": payload["sid"]}
+    user = await db.users.find_one({"id": payload["user_id"]}, USER_PUBLIC)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+async def verify_kid(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = await access_payload(credentials)
+    if payload.get("role") != "kid":
+        raise HTTPException(status_code=403, detail="Kid access required")
+    if payload.get("typ") == tokens.ACCESS:
+        return {"id": payload["kid_id"], "parent_id": payload["user_id"], "sid": payload["sid"]}
+    kid = await db.kids.find_one({"id": payload.get("kid_id")}, KID_PUBLIC)
+    if not kid:
+        raise HTTPException(status_code=401, detail="Kid not found")
+    return kid
+
+async def require_kid(user: dict, kid_id: str):
+    if kid_id in (user.get("kid_ids") or ()) and kid_id not in revocations:
+        return
+    if not await db.kids.count_documents({"id": kid_id, "parent_id": user["id"]}, limit=1):
+        raise HTTPException(status_code=404, detail="Kid not found")
 
 # ==================== HELPERS ====================
 
 def get_level_for_xp(xp: int) -> dict:
-    current = LEVELS[0]
-    for lvl in LEVELS:
-        if xp >= lvl["xp_required"]:
-            current = lvl
-    return current
+    return rulebook.current().level_for_xp(xp)
 
 def get_next_level(current_level: int) -> dict:
-    for lvl in LEVELS:
-        if lvl["level"] == current_level + 1:
-            return lvl
-    return None
+    return rulebook.current().next_level(current_level)
+
+async def build_dashboard(kid):
+    kid_id = kid["id"]
+    wallet = await db.wallets.find_one({"kid_id": kid_id}, WALLET_SUMMARY)
+    active_tasks = await db.tasks.find({"kid_id": kid_id, "status": {"$in": ["pending", "completed"]}}, TASK_SUMMARY).to_list(50)
+    await flush_transactions(kid_id)
+    recent_txns = await db.transactions.find({"kid_id": kid_id}, TXN_SUMMARY).sort("created_at", -1).to_list(10)
+    active_goals = await db.goals.find({"kid_id": kid_id, "status": "active"}, GOAL_SUMMARY).to_list(50)
+    active_sips = await db.sips.find({"kid_id": kid_id, "status": "active"}, SIP_SUMMARY).to_list(50)
+    active_loans = await db.loans.find({"kid_id": kid_id, "status": {"$in": ["pending", "active"]}}, LOAN_SUMMARY).to_list(50)
+    learning = await db.learning_progress.find({"kid_id": kid_id}, LEARNING_SUMMARY).to_list(100)
+    level_info = get_level_for_xp(kid.get("xp", 0))
+    next_level = get_next_level(level_info["level"])
+    return {
+        "kid": kid,
+        "wallet": wallet,
+        "level_info": level_info,
+        "next_level": next_level,
+        "active_tasks": active_tasks,
+        "recent_transactions": recent_txns,
+        "active_goals": active_goals,
+        "active_sips": active_sips,
+        "active_loans": active_loans,
+        "learning_progress": learning,
+        "stats": {
+            "total_tasks_completed": await db.tasks.count_documents({"kid_id": kid_id, "status": "approved"}),
+            "total_stories_read": len(learning),
+            "active_goals_count": len(active_goals),
+            "active_sips_count": len(active_sips),
+        }
+    }
+
+def group_by_kid(docs):
+    grouped = defaultdict(list)
+    for doc in docs:
+        grouped[doc["kid_id"]].append(doc)
+    return grouped
+
+def encode_cursor(doc, field: str = "created_at") -> str:
+    return base64.urlsafe_b64encode(f"{doc[field]}|{doc['id']}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, doc_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+def keyset_filter(cursor: Optional[str]) -> dict:
+    if not cursor:
+        return {}
+    created_at, doc_id = decode_cursor(cursor)
+    return {"$or": [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "id": {"$lt": doc_id}}]}
+
+def kid_list_filter(parent_id, cursor=None, q=None, age=None, level=None, ui_theme=None) -> dict:
+    query = {"parent_id": parent_id}
+    if q:
+        prefix = q.strip().lower()
+        query["name_lower"] = {"$gte": prefix, "$lt": prefix + "\uffff"}
+    for field, value in (("age", age), ("level", level), ("ui_theme", ui_theme)):
+        if value is not None:
+            query[field] = value
+    if cursor:
+        name_lower, kid_id = decode_cursor(cursor)
+        query["$or"] = [{"name_lower": {"$gt": name_lower}}, {"name_lower": name_lower, "id": {"$gt": kid_id}}]
+    return query
 
 async def add_transaction(kid_id, txn_type, amount, description, category="general", reference_id=None):
     txn = {
@@ -289,41 +713,204 @@ async def add_transaction(kid_id, txn_type, amount, description, category="gener
         "reference_id": reference_id,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.transactions.insert_one(txn)
+    await asyncio.gather(
+        transaction_buffer.add(txn) if transaction_buffer else db.transactions.insert_one(txn),
+        db.rollups.bulk_write(rollups.rollup_updates(txn), ordered=False),
+    )
+
+async def flush_transactions(kid_id):
+    if transaction_buffer:
+        await transaction_buffer.flush_kid(kid_id)
+
+async def debit_wallet(kid_id, amount, field="total_spent"):
+    result = await db.wallets.update_one({"kid_id": kid_id, "balance": {"$gte": amount}}, {"$inc": {"balance": -amount, field: amount}})
+    return result.matched_count > 0
 
 async def update_wallet_balance(kid_id, amount, operation="credit"):
-    wallet = await db.wallets.find_one({"kid_id": kid_id}, {"_id": 0})
-    if not wallet:
-        return None
     if operation == "credit":
         await db.wallets.update_one({"kid_id": kid_id}, {"$inc": {"balance": amount, "total_earned": amount}})
-    elif operation == "debit":
-        if wallet["balance"] < amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-        await db.wallets.update_one({"kid_id": kid_id}, {"$inc": {"balance": -amount, "total_spent": amount}})
-    elif operation == "save":
-        if wallet["balance"] < amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-        await db.wallets.update_one({"kid_id": kid_id}, {"$inc": {"balance": -amount, "total_saved": amount}})
-
-async def add_xp(kid_id, xp_amount):
-    kid = await db.kids.find_one({"id": kid_id}, {"_id": 0})
+        return
+    field = "total_saved" if operation == "save" else "total_spent"
+    if not await debit_wallet(kid_id, amount, field) and await db.wallets.count_documents({"kid_id": kid_id}, limit=1):
+        raise HTTPException(status_code=400, detail="Insufficient balance")
+
+async def grant(kid_id, xp=0, credit=0):
+    """Apply an XP and credit-score award in one kid update."""
+    compiled = rulebook.current()
+    stages = []
+    if xp:
+        stages += [
+            {"$set": {"xp": {"$add": [{"$ifNull": ["$xp", 0]}, xp]}}},
+            {"$set": {"level": compiled.level_expr}},
+        ]
+    if credit:
+        score = {"$add": [{"$ifNull": ["$credit_score", compiled.credit_initial]}, credit]}
+        stages.append({"$set": {"credit_score": {"$max": [compiled.credit_min, {"$min": [compiled.credit_max, score]}]}}})
+    if not stages:
+        return
+    kid = await db.kids.find_one_and_update({"id": kid_id}, stages, projection=leaderboard.PROJECTION, return_document=ReturnDocument.AFTER)
+    if not kid:
+        return
+    update_leaderboards(kid)
+    changes = []
+    if xp:
+        changes.append(("xp", xp, kid.get("xp", 0)))
+    if credit:
+        changes.append(("credit_score", credit, kid.get("credit_score", compiled.credit_initial)))
+    await history.record(db, kid_id, changes)
+
+async def award(kid_id, event):
+    points = rulebook.current().award(event)
+    await grant(kid_id, points.xp, points.credit)
+
+def update_leaderboards(kid):
     if kid:
-        new_xp = kid.get("xp", 0) + xp_amount
-        lvl = get_level_for_xp(new_xp)
-        await db.kids.update_one({"id": kid_id}, {"$set": {"xp": new_xp, "level": lvl["level"]}})
+        for board in leaderboards.values():
+            board.update(kid)
 
-async def update_credit_score(kid_id, change):
-    kid = await db.kids.find_one({"id": kid_id}, {"_id": 0})
-    if kid:
-        new_score = max(0, min(1000, kid.get("credit_score", 500) + change))
-        await db.kids.update_one({"id": kid_id}, {"$set": {"credit_score": new_score}})
+def board_for(metric):
+    return leaderboards["xp" if metric == "level" else metric]
+
+# ==================== TRANSITIONS ====================
+
+async def transition_failed(collection, query, not_found, wrong_state):
+    if await collection.count_documents(query, limit=1):
+        raise HTTPException(status_code=400, detail=wrong_state)
+    raise HTTPException(status_code=404, detail=not_found)
+
+async def run_complete_task(query):
+    task = await db.tasks.find_one_and_update(
+        {**query, "status": "pending"},
+        [{"$set": {"status": {"$cond": ["$approval_required", "completed", "approved"]}}}],
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
+    if not task:
+        await transition_failed(db.tasks, query, "Task not found", "Task is not pending")
+    if task["status"] == "approved":
+        await update_wallet_balance(task["kid_id"], task["reward_amount"], "credit")
+        await add_transaction(task["kid_id"], "credit", task["reward_amount"], f"Task reward: {task['title']}", "task", task["id"])
+        await award(task["kid_id"], "task_approved")
+    return task
+
+def goal_saved_pipeline(amount):
+    return [
+        {"$set": {"saved_amount": {"$add": ["$saved_amount", amount]}}},
+        {"$set": {"status": {"$cond": [{"$gte": ["$saved_amount", "$target_amount"]}, "completed", "active"]}}},
+    ]
+
+async def run_contribute_goal(query, amount):
+    goal = await db.goals.find_one_and_update(
+        {**query, "status": "active"}, goal_saved_pipeline(amount),
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
+    if not goal:
+        await transition_failed(db.goals, query, "Goal not found", "Goal is not active")
+    try:
+        await update_wallet_balance(goal["kid_id"], amount, "save")
+    except HTTPException:
+        await db.goals.update_one({"id": goal["id"]}, goal_saved_pipeline(-amount))
+        raise
+    await add_transaction(goal["kid_id"], "debit", amount, f"Goal savings: {goal['title']}", "goal", goal["id"])
+    goal_forecasts.invalidate(goal["kid_id"])
+    await award(goal["kid_id"], "goal_contribution")
+    return goal
+
+def sip_payment_pipeline(step):
+    monthly_rate = {"$divide": ["$interest_rate", 1200]}
+    annuity = {"$multiply": [
+        "$amount",
+        {"$divide": [{"$subtract": [{"$pow": [{"$add": [1, monthly_rate]}, "$payments_made"]}, 1]}, monthly_rate]},
+        {"$add": [1, monthly_rate]},
+    ]}
+    return [
+        {"$set": {"payments_made": {"$add": ["$payments_made", step]}, "total_invested": {"$add": ["$total_invested", {"$multiply": ["$amount", step]}]}}},
+        {"$set": {"current_value": {"$toLong": {"$round": [{"$cond": [{"$gt": ["$interest_rate", 0]}, annuity, "$total_invested"]}, 0]}}}},
+    ]
+
+async def run_pay_sip(query):
+    sip = await db.sips.find_one_and_update(
+        {**query, "status": "active"}, sip_payment_pipeline(1),
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
+    if not sip:
+        await transition_failed(db.sips, query, "SIP not found", "SIP is not active")
+    try:
+        await update_wallet_balance(sip["kid_id"], sip["amount"], "save")
+    except HTTPException:
+        await db.sips.update_one({"id": sip["id"]}, sip_payment_pipeline(-1))
+        raise
+    await add_transaction(sip["kid_id"], "debit", sip["amount"], f"SIP payment #{sip['payments_made']}", "sip", sip["id"])
+    await award(sip["kid_id"], "sip_payment")
+    return sip
+
+LOAN_PAYMENT_PIPELINE = [
+    {"$set": {"last_payment_amount": {"$min": ["$emi_amount", "$remaining_balance"]}}},
+    {"$set": {
+        "remaining_balance": {"$max": [0, {"$subtract": ["$remaining_balance", "$last_payment_amount"]}]},
+        "payments_made": {"$add": ["$payments_made", 1]},
+    }},
+    {"$set": {"status": {"$cond": [{"$lte": ["$remaining_balance", 0]}, "completed", "active"]}}},
+]
+
+LOAN_PAYMENT_REVERT_PIPELINE = [
+    {"$set": {
+        "remaining_balance": {"$add": ["$remaining_balance", "$last_payment_amount"]},
+        "payments_made": {"$add": ["$payments_made", -1]},
+        "status": "active",
+    }},
+]
+
+async def run_pay_loan(query):
+    loan = await db.loans.find_one_and_update(
+        {**query, "status": "active"}, LOAN_PAYMENT_PIPELINE,
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
+    if not loan:
+        await transition_failed(db.loans, query, "Loan not found", "Loan is not active")
+    pay_amount = loan["last_payment_amount"]
+    try:
+        await update_wallet_balance(loan["kid_id"], pay_amount, "debit")
+    except HTTPException:
+        await db.loans.update_one({"id": loan["id"]}, LOAN_PAYMENT_REVERT_PIPELINE)
+        raise
+    await add_transaction(loan["kid_id"], "debit", pay_amount, f"EMI payment #{loan['payments_made']}", "emi", loan["id"])
+    await award(loan["kid_id"], "emi_payment")
+    return loan
+
+async def run_complete_lesson(kid_id, story_id, answers):
+    story = next((s for s in STORIES if s["id"] == story_id), None)
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
+    key = ANSWER_KEY[story_id]
+    error = quiz.validate(key, answers)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    results = quiz.grade(key, answers)
+    score = sum(results)
+    now = datetime.now(timezone.utc).isoformat()
+    update = {
+        "$setOnInsert": {"id": str(uuid.uuid4()), "completed_at": now},
+        "$set": {"answers": answers, "results": list(results), "graded_at": now},
+        "$inc": {"attempts": 1},
+        "$max": {"score": score},
+    }
+    query = {"kid_id": kid_id, "story_id": story_id}
+    try:
+        existing = await db.learning_progress.find_one_and_update(query, update, projection=ID_ONLY, upsert=True, return_document=ReturnDocument.BEFORE)
+    except DuplicateKeyError:
+        existing = await db.learning_progress.find_one_and_update(query, update, projection=ID_ONLY, return_document=ReturnDocument.BEFORE)
+    await quiz.record(db, story_id, answers, results)
+    graded = {"score": score, "total": len(results), "results": list(results)}
+    if existing:
+        return {"message": "Progress updated", "already_completed": True, **graded}
+    await grant(kid_id, xp=story["reward_xp"])
+    return {"message": "Lesson completed!", "xp_earned": story["reward_xp"], **graded}
 
 # ==================== AUTH ROUTES ====================
 
 @api.post("/auth/signup")
 async def signup(req: SignupRequest):
-    existing = await db.users.find_one({"email": req.email.lower()}, {"_id": 0})
+    existing = await db.users.find_one({"email": req.email.lower()}, ID_ONLY)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     user_id = str(uuid.uuid4())
@@ -336,16 +923,15 @@ async def signup(req: SignupRequest):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user)
-    token = create_token(user_id)
-    return {"token": token, "user": {"id": user_id, "email": user["email"], "full_name": user["full_name"], "role": "parent"}}
+    return {**await issue_tokens(user_id), "user": {"id": user_id, "email": user["email"], "full_name": user["full_name"], "role": "parent"}}
 
 @api.post("/auth/login")
 async def login(req: LoginRequest):
+    await enforce_rate_limit(ACCOUNT_LOGIN_LIMIT, req.email.lower())
     user = await db.users.find_one({"email": req.email.lower()}, {"_id": 0})
     if not user or not verify_password(req.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    token = create_token(user["id"])
-    return {"token": token, "user": {"id": user["id"], "email": user["email"], "full_name": user["full_name"], "role": user["role"]}}
+    return {**await issue_tokens(user["id"]), "user": {"id": user["id"], "email": user["email"], "full_name": user["full_name"], "role": user["role"]}}
 
 @api.get("/auth/me")
 async def get_me(current=Depends(get_current_user)):
@@ -355,26 +941,69 @@ async def get_me(current=Depends(get_current_user)):
 
 
 @api.post("/auth/kid-login")
-async def kid_login(req: KidLoginRequest):
-    parent = await db.users.find_one({"email": req.parent_email.lower()}, {"_id": 0})
+async def kid_login(req: KidLoginRequest, request: Request):
+    family = req.parent_email.lower()
+    await enforce_rate_limit(KID_PIN_LIMIT, f"{family}:{client_ip(request.scope)}")
+    await enforce_rate_limit(KID_FAMILY_PIN_LIMIT, family)
+    parent = await db.users.find_one({"email": family}, ID_ONLY)
     if not parent:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    kid = await db.kids.find_one({"parent_id": parent["id"], "name": {"$regex": f"^{req.kid_name}$", "$options": "i"}, "pin": req.pin}, {"_id": 0})
+    kid = await db.kids.find_one({"parent_id": parent["id"], "name": {"$regex": f"^{re.escape(req.kid_name)}$", "$options": "i"}, "pin": req.pin}, KID_PUBLIC)
     if not kid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_token(parent["id"], "kid", kid["id"])
-    return {"token": token, "kid": {"id": kid["id"], "name": kid["name"], "age": kid["age"], "avatar": kid["avatar"], "ui_theme": kid.get("ui_theme", "neutral"), "level": kid["level"], "xp": kid.get("xp", 0), "credit_score": kid.get("credit_score", 500)}}
+    return {**await issue_tokens(parent["id"], "kid", kid["id"]), "kid": {"id": kid["id"], "name": kid["name"], "age": kid["age"], "avatar": kid["avatar"], "ui_theme": kid.get("ui_theme", "neutral"), "level": kid["level"], "xp": kid.get("xp", 0), "credit_score": kid.get("credit_score", 500)}}
+
+@api.post("/auth/refresh")
+async def refresh_session(req: RefreshRequest):
+    payload = decode_token(req.refresh_token)
+    if payload.get("typ") != tokens.REFRESH:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    next_jti = uuid.uuid4().hex
+    session = await db.sessions.find_one_and_update(
+        {"id": payload["sid"], "refresh_jti": payload["rjti"], "revoked": False},
+        {"$set": {"refresh_jti": next_jti}},
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
+    if not session:
+        # A stale refresh token means it was replayed: end the whole session.
+        await end_session(payload["sid"])
+        raise HTTPException(status_code=401, detail="Session expired")
+    if session["role"] == "kid":
+        if not await db.kids.count_documents({"id": session["kid_id"]}, limit=1):
+            await end_session(session["id"])
+            raise HTTPException(status_code=401, detail="Kid not found")
+        kid_ids = None
+    else:
+        kid_ids = await owned_kid_ids(session["user_id"])
+    return {
+        "token": create_token(session["user_id"], session["role"], session["kid_id"], kid_ids, session["id"]),
+        "refresh_token": tokens.encode(settings.jwt_secret, {"sid": session["id"], "rjti": next_jti}, settings.refresh_token_ttl_seconds, tokens.REFRESH),
+        "expires_in": settings.access_token_ttl_seconds,
+    }
+
+async def end_session(sid: str):
+    result = await db.sessions.update_one({"id": sid, "revoked": False}, {"$set": {"revoked": True}})
+    if result.modified_count:
+        await revocations.revoke(sid)
+
+@api.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    payload = await access_payload(credentials)
+    if payload.get("sid"):
+        await end_session(payload["sid"])
+    return {"message": "Logged out"}
 
 
 # ==================== KIDS ROUTES ====================
 
-@api.post("/kids")
+@api.post("/kids", response_model=KidOut)
 async def add_kid(req: KidCreate, user=Depends(verify_parent)):
     kid_id = str(uuid.uuid4())
     kid = {
         "id": kid_id,
         "parent_id": user["id"],
         "name": req.name,
+        "name_lower": req.name.lower(),
         "age": req.age,
         "avatar": req.avatar,
         "grade": req.grade,
@@ -382,7 +1011,7 @@ async def add_kid(req: KidCreate, user=Depends(verify_parent)):
         "pin": req.pin,
         "level": 1,
         "xp": 0,
-        "credit_score": 500,
+        "credit_score": rulebook.current().credit_initial,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.kids.insert_one(kid)
@@ -400,50 +1029,84 @@ async def add_kid(req: KidCreate, user=Depends(verify_parent)):
     kid_data = await db.kids.find_one({"id": kid_id}, {"_id": 0})
     return kid_data
 
-@api.get("/kids")
-async def list_kids(user=Depends(verify_parent)):
-    kids = await db.kids.find({"parent_id": user["id"]}, {"_id": 0}).to_list(100)
-    return kids
-
-@api.get("/kids/{kid_id}")
+@api.post("/kids/import")
+async def import_kids(request: Request, user=Depends(verify_parent)):
+    try:
+        rows = onboarding.parse(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, csv.Error) as exc:
+        raise HTTPException(status_code=400, detail=f"Could not parse import: {exc}")
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=400, detail="Import needs a list of kid rows")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(status_code=400, detail=f"Import is limited to {MAX_IMPORT_ROWS} rows")
+    parent = await db.users.find_one({"id": user["id"]}, {"_id": 0, "email": 1})
+    results = onboarding.run_import(db, rows, {a["id"] for a in AVATARS}, rulebook.current().credit_initial, user["id"], parent["email"])
+    return StreamingResponse((orjson.dumps(result) + b"\n" async for result in results), media_type="application/x-ndjson")
+
+@api.get("/kids", response_model=List[KidOut], response_model_exclude_unset=True)
+async def list_kids(
+    response: Response,
+    view: str = Query("full", pattern=VIEW_PATTERN),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    q: Optional[str] = Query(None, max_length=100),
+    age: Optional[int] = None,
+    level: Optional[int] = None,
+    ui_theme: Optional[str] = None,
+    user=Depends(verify_parent),
+):
+    query = kid_list_filter(user["id"], cursor, q, age, level, ui_theme)
+    projection = pick_projection(view, KID_PUBLIC, {**KID_SUMMARY, "name_lower": 1})
+    kids = await db.kids.find(query, projection).sort([("name_lower", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1)
+    if len(kids) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(kids[limit - 1], "name_lower")
+    return [{k: v for k, v in kid.items() if k != "name_lower"} for kid in kids[:limit]]
+
+@api.get("/kids/{kid_id}", response_model=KidOut)
 async def get_kid(kid_id: str, user=Depends(verify_parent)):
     kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
     if not kid:
         raise HTTPException(status_code=404, detail="Kid not found")
     return kid
 
-@api.put("/kids/{kid_id}")
+@api.put("/kids/{kid_id}", response_model=KidOut)
 async def update_kid(kid_id: str, req: KidUpdate, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, kid_id)
     updates = {k: v for k, v in req.model_dump().items() if v is not None}
+    if "name" in updates:
+        updates["name_lower"] = updates["name"].lower()
     if updates:
         await db.kids.update_one({"id": kid_id}, {"$set": updates})
-    return await db.kids.find_one({"id": kid_id}, {"_id": 0})
+    kid = await db.kids.find_one({"id": kid_id}, {"_id": 0})
+    if req.leaderboard_opt_in is not None:
+        update_leaderboards(kid)
+    return kid
 
 @api.delete("/kids/{kid_id}")
 async def delete_kid(kid_id: str, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, kid_id)
     await db.kids.delete_one({"id": kid_id})
     await db.wallets.delete_one({"kid_id": kid_id})
+    await flush_transactions(kid_id)
     await db.transactions.delete_many({"kid_id": kid_id})
     await db.tasks.delete_many({"kid_id": kid_id})
     await db.goals.delete_many({"kid_id": kid_id})
     await db.sips.delete_many({"kid_id": kid_id})
     await db.loans.delete_many({"kid_id": kid_id})
     await db.learning_progress.delete_many({"kid_id": kid_id})
+    await db.rollups.delete_many({"kid_id": kid_id})
+    await db.transactions_archive.delete_many({"kid_id": kid_id})
+    await db.score_history.delete_many({"kid_id": kid_id})
+    for board in leaderboards.values():
+        board.remove(kid_id)
+    await revocations.revoke(kid_id)
     return {"message": "Kid and all related data deleted"}
 
 # ==================== TASKS ROUTES ====================
 
-@api.post("/tasks")
+@api.post("/tasks", response_model=TaskOut)
 async def create_task(req: TaskCreate, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": req.kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, req.kid_id)
     task = {
         "id": str(uuid.uuid4()),
         "parent_id": user["id"],
@@ -460,88 +1123,61 @@ async def create_task(req: TaskCreate, user=Depends(verify_parent)):
     await db.tasks.insert_one(task)
     return await db.tasks.find_one({"id": task["id"]}, {"_id": 0})
 
-@api.get("/tasks/{kid_id}")
-async def list_tasks(kid_id: str, status: Optional[str] = None, user=Depends(verify_parent)):
+@api.get("/tasks/{kid_id}", response_model=List[TaskOut], response_model_exclude_unset=True)
+async def list_tasks(kid_id: str, status: Optional[str] = None, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
     query = {"kid_id": kid_id, "parent_id": user["id"]}
     if status:
         query["status"] = status
-    tasks = await db.tasks.find(query, {"_id": 0}).sort("created_at", -1).to_list(200)
+    tasks = await db.tasks.find(query, pick_projection(view, NO_ID, TASK_SUMMARY)).sort("created_at", -1).to_list(200)
     return tasks
 
-@api.put("/tasks/{task_id}/complete")
+@api.put("/tasks/{task_id}/complete", response_model=TaskOut)
 async def complete_task(task_id: str, user=Depends(verify_parent)):
-    task = await db.tasks.find_one({"id": task_id, "parent_id": user["id"]}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if task["status"] != "pending":
-        raise HTTPException(status_code=400, detail="Task is not pending")
-    if task["approval_required"]:
-        await db.tasks.update_one({"id": task_id}, {"$set": {"status": "completed"}})
-    else:
-        await db.tasks.update_one({"id": task_id}, {"$set": {"status": "approved"}})
-        await update_wallet_balance(task["kid_id"], task["reward_amount"], "credit")
-        await add_transaction(task["kid_id"], "credit", task["reward_amount"], f"Task reward: {task['title']}", "task", task_id)
-        await add_xp(task["kid_id"], 10)
-        await update_credit_score(task["kid_id"], 10)
-    return await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    return await run_complete_task({"id": task_id, "parent_id": user["id"]})
 
-@api.put("/tasks/{task_id}/approve")
+@api.put("/tasks/{task_id}/approve", response_model=TaskOut)
 async def approve_task(task_id: str, user=Depends(verify_parent)):
-    task = await db.tasks.find_one({"id": task_id, "parent_id": user["id"]}, {"_id": 0})
+    query = {"id": task_id, "parent_id": user["id"]}
+    task = await db.tasks.find_one_and_update({**query, "status": "completed"}, {"$set": {"status": "approved"}}, projection=NO_ID, return_document=ReturnDocument.AFTER)
     if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if task["status"] != "completed":
-        raise HTTPException(status_code=400, detail="Task must be completed first")
-    await db.tasks.update_one({"id": task_id}, {"$set": {"status": "approved"}})
+        await transition_failed(db.tasks, query, "Task not found", "Task must be completed first")
     await update_wallet_balance(task["kid_id"], task["reward_amount"], "credit")
     await add_transaction(task["kid_id"], "credit", task["reward_amount"], f"Task approved: {task['title']}", "task", task_id)
-    await add_xp(task["kid_id"], 10)
-    await update_credit_score(task["kid_id"], 10)
-    return await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    await award(task["kid_id"], "task_approved")
+    return task
 
-@api.put("/tasks/{task_id}/reject")
+@api.put("/tasks/{task_id}/reject", response_model=TaskOut)
 async def reject_task(task_id: str, user=Depends(verify_parent)):
-    task = await db.tasks.find_one({"id": task_id, "parent_id": user["id"]}, {"_id": 0})
+    query = {"id": task_id, "parent_id": user["id"]}
+    task = await db.tasks.find_one_and_update({**query, "status": "completed"}, {"$set": {"status": "rejected"}}, projection=NO_ID, return_document=ReturnDocument.AFTER)
     if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if task["status"] != "completed":
-        raise HTTPException(status_code=400, detail="Task must be completed first")
-    await db.tasks.update_one({"id": task_id}, {"$set": {"status": "rejected"}})
-    if task["penalty_amount"] > 0:
-        wallet = await db.wallets.find_one({"kid_id": task["kid_id"]}, {"_id": 0})
-        if wallet and wallet["balance"] >= task["penalty_amount"]:
-            await update_wallet_balance(task["kid_id"], task["penalty_amount"], "debit")
-            await add_transaction(task["kid_id"], "debit", task["penalty_amount"], f"Task penalty: {task['title']}", "penalty", task_id)
-    await update_credit_score(task["kid_id"], -10)
-    return await db.tasks.find_one({"id": task_id}, {"_id": 0})
+        await transition_failed(db.tasks, query, "Task not found", "Task must be completed first")
+    if task["penalty_amount"] > 0 and await debit_wallet(task["kid_id"], task["penalty_amount"]):
+        await add_transaction(task["kid_id"], "debit", task["penalty_amount"], f"Task penalty: {task['title']}", "penalty", task_id)
+    await award(task["kid_id"], "task_rejected")
+    return task
 
 # ==================== WALLET ROUTES ====================
 
-@api.get("/wallet/{kid_id}")
+@api.get("/wallet/{kid_id}", response_model=WalletOut)
 async def get_wallet(kid_id: str, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, kid_id)
     wallet = await db.wallets.find_one({"kid_id": kid_id}, {"_id": 0})
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     return wallet
 
-@api.get("/wallet/{kid_id}/transactions")
-async def get_transactions(kid_id: str, limit: int = Query(50, le=200), user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
-    txns = await db.transactions.find({"kid_id": kid_id}, {"_id": 0}).sort("created_at", -1).to_list(limit)
-    return txns
+@api.get("/wallet/{kid_id}/transactions", response_model=List[TransactionOut], response_model_exclude_unset=True)
+async def get_transactions(kid_id: str, limit: int = Query(50, le=200), before: Optional[str] = None, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
+    await require_kid(user, kid_id)
+    await flush_transactions(kid_id)
+    return await archive.transaction_history(db, kid_id, limit, before, pick_projection(view, NO_ID, TXN_SUMMARY))
 
 # ==================== GOALS ROUTES ====================
 
-@api.post("/goals")
+@api.post("/goals", response_model=GoalOut)
 async def create_goal(req: GoalCreate, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": req.kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, req.kid_id)
     goal = {
         "id": str(uuid.uuid4()),
         "kid_id": req.kid_id,
@@ -556,45 +1192,36 @@ async def create_goal(req: GoalCreate, user=Depends(verify_parent)):
     await db.goals.insert_one(goal)
     return await db.goals.find_one({"id": goal["id"]}, {"_id": 0})
 
-@api.get("/goals/{kid_id}")
-async def list_goals(kid_id: str, user=Depends(verify_parent)):
-    goals = await db.goals.find({"kid_id": kid_id, "parent_id": user["id"]}, {"_id": 0}).to_list(100)
+@api.get("/goals/{kid_id}", response_model=List[GoalOut], response_model_exclude_unset=True)
+async def list_goals(kid_id: str, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
+    goals = await db.goals.find({"kid_id": kid_id, "parent_id": user["id"]}, pick_projection(view, NO_ID, GOAL_SUMMARY)).to_list(100)
     return goals
 
-@api.put("/goals/{goal_id}/contribute")
+@api.get("/goals/{kid_id}/forecast", response_model=List[GoalForecastOut])
+async def get_goal_forecast(kid_id: str, user=Depends(verify_parent)):
+    await require_kid(user, kid_id)
+    await flush_transactions(kid_id)
+    return await goal_forecasts.get(db, kid_id)
+
+@api.put("/goals/{goal_id}/contribute", response_model=GoalOut)
 async def contribute_to_goal(goal_id: str, req: GoalContribute, user=Depends(verify_parent)):
-    goal = await db.goals.find_one({"id": goal_id, "parent_id": user["id"]}, {"_id": 0})
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    if goal["status"] != "active":
-        raise HTTPException(status_code=400, detail="Goal is not active")
-    await update_wallet_balance(goal["kid_id"], req.amount, "save")
-    new_saved = goal["saved_amount"] + req.amount
-    status = "completed" if new_saved >= goal["target_amount"] else "active"
-    await db.goals.update_one({"id": goal_id}, {"$set": {"saved_amount": new_saved, "status": status}})
-    await add_transaction(goal["kid_id"], "debit", req.amount, f"Goal savings: {goal['title']}", "goal", goal_id)
-    await add_xp(goal["kid_id"], 20)
-    await update_credit_score(goal["kid_id"], 5)
-    return await db.goals.find_one({"id": goal_id}, {"_id": 0})
+    return await run_contribute_goal({"id": goal_id, "parent_id": user["id"]}, req.amount)
 
 @api.delete("/goals/{goal_id}")
 async def delete_goal(goal_id: str, user=Depends(verify_parent)):
-    goal = await db.goals.find_one({"id": goal_id, "parent_id": user["id"]}, {"_id": 0})
+    goal = await db.goals.find_one_and_delete({"id": goal_id, "parent_id": user["id"]}, projection=NO_ID)
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     if goal["saved_amount"] > 0:
         await db.wallets.update_one({"kid_id": goal["kid_id"]}, {"$inc": {"balance": goal["saved_amount"], "total_saved": -goal["saved_amount"]}})
         await add_transaction(goal["kid_id"], "credit", goal["saved_amount"], f"Goal refund: {goal['title']}", "goal_refund", goal_id)
-    await db.goals.delete_one({"id": goal_id})
     return {"message": "Goal deleted and savings returned"}
 
 # ==================== SIP ROUTES ====================
 
-@api.post("/sip")
+@api.post("/sip", response_model=SIPOut)
 async def create_sip(req: SIPCreate, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": req.kid_id, "parent_id": user["id"]}, {"_id": 0})
-    if not kid:
-        raise HTTPException(status_code=404, detail="Kid not found")
+    await require_kid(user, req.kid_id)
     sip = {
         "id": str(uuid.uuid4()),
         "kid_id": req.kid_id,
@@ -611,46 +1238,31 @@ async def create_sip(req: SIPCreate, user=Depends(verify_parent)):
     await db.sips.insert_one(sip)
     return await db.sips.find_one({"id": sip["id"]}, {"_id": 0})
 
-@api.get("/sip/{kid_id}")
-async def list_sips(kid_id: str, user=Depends(verify_parent)):
-    sips = await db.sips.find({"kid_id": kid_id, "parent_id": user["id"]}, {"_id": 0}).to_list(100)
+@api.get("/sip/{kid_id}", response_model=List[SIPOut], response_model_exclude_unset=True)
+async def list_sips(kid_id: str, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
+    sips = await db.sips.find({"kid_id": kid_id, "parent_id": user["id"]}, pick_projection(view, NO_ID, SIP_SUMMARY)).to_list(100)
     return sips
 
-@api.post("/sip/{sip_id}/pay")
+@api.post("/sip/{sip_id}/pay", response_model=SIPOut)
 async def pay_sip(sip_id: str, user=Depends(verify_parent)):
-    sip = await db.sips.find_one({"id": sip_id, "parent_id": user["id"]}, {"_id": 0})
-    if not sip:
-        raise HTTPException(status_code=404, detail="SIP not found")
-    if sip["status"] != "active":
-        raise HTTPException(status_code=400, detail="SIP is not active")
-    await update_wallet_balance(sip["kid_id"], sip["amount"], "save")
-    new_invested = sip["total_invested"] + sip["amount"]
-    payments = sip["payments_made"] + 1
-    monthly_rate = sip["interest_rate"] / 100 / 12
-    if monthly_rate > 0:
-        new_value = sip["amount"] * ((math.pow(1 + monthly_rate, payments) - 1) / monthly_rate) * (1 + monthly_rate)
-    else:
-        new_value = new_invested
-    await db.sips.update_one({"id": sip_id}, {"$set": {"total_invested": new_invested, "current_value": round(new_value, 2), "payments_made": payments}})
-    await add_transaction(sip["kid_id"], "debit", sip["amount"], f"SIP payment #{payments}", "sip", sip_id)
-    await add_xp(sip["kid_id"], 15)
-    await update_credit_score(sip["kid_id"], 5)
-    return await db.sips.find_one({"id": sip_id}, {"_id": 0})
-
-@api.put("/sip/{sip_id}/pause")
+    return await run_pay_sip({"id": sip_id, "parent_id": user["id"]})
+
+@api.put("/sip/{sip_id}/pause", response_model=SIPOut)
 async def pause_sip(sip_id: str, user=Depends(verify_parent)):
-    sip = await db.sips.find_one({"id": sip_id, "parent_id": user["id"]}, {"_id": 0})
+    sip = await db.sips.find_one_and_update(
+        {"id": sip_id, "parent_id": user["id"]},
+        [{"$set": {"status": {"$cond": [{"$eq": ["$status", "active"]}, "paused", "active"]}}}],
+        projection=NO_ID, return_document=ReturnDocument.AFTER,
+    )
     if not sip:
         raise HTTPException(status_code=404, detail="SIP not found")
-    new_status = "paused" if sip["status"] == "active" else "active"
-    await db.sips.update_one({"id": sip_id}, {"$set": {"status": new_status}})
-    return await db.sips.find_one({"id": sip_id}, {"_id": 0})
+    return sip
 
 # ==================== LOANS ROUTES ====================
 
-@api.post("/loans/request")
+@api.post("/loans/request", response_model=LoanOut)
 async def request_loan(req: LoanRequest, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": req.kid_id, "parent_id": user["id"]}, {"_id": 0})
+    kid = await db.kids.find_one({"id": req.kid_id, "parent_id": user["id"]}, {"_id": 0, "credit_score": 1})
     if not kid:
         raise HTTPException(status_code=404, detail="Kid not found")
     if kid.get("credit_score", 500) < 300:
@@ -667,7 +1279,7 @@ async def request_loan(req: LoanRequest, user=Depends(verify_parent)):
         "principal": req.amount,
         "interest_rate": req.interest_rate,
         "duration_months": req.duration_months,
-        "emi_amount": round(emi, 2),
+        "emi_amount": money.round_minor(emi),
         "remaining_balance": req.amount,
         "payments_made": 0,
         "purpose": req.purpose,
@@ -677,40 +1289,24 @@ async def request_loan(req: LoanRequest, user=Depends(verify_parent)):
     await db.loans.insert_one(loan)
     return await db.loans.find_one({"id": loan["id"]}, {"_id": 0})
 
-@api.get("/loans/{kid_id}")
-async def list_loans(kid_id: str, user=Depends(verify_parent)):
-    loans = await db.loans.find({"kid_id": kid_id, "parent_id": user["id"]}, {"_id": 0}).to_list(100)
+@api.get("/loans/{kid_id}", response_model=List[LoanOut], response_model_exclude_unset=True)
+async def list_loans(kid_id: str, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
+    loans = await db.loans.find({"kid_id": kid_id, "parent_id": user["id"]}, pick_projection(view, NO_ID, LOAN_SUMMARY)).to_list(100)
     return loans
 
-@api.post("/loans/{loan_id}/approve")
+@api.post("/loans/{loan_id}/approve", response_model=LoanOut)
 async def approve_loan(loan_id: str, user=Depends(verify_parent)):
-    loan = await db.loans.find_one({"id": loan_id, "parent_id": user["id"]}, {"_id": 0})
+    query = {"id": loan_id, "parent_id": user["id"]}
+    loan = await db.loans.find_one_and_update({**query, "status": "pending"}, {"$set": {"status": "active"}}, projection=NO_ID, return_document=ReturnDocument.AFTER)
     if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    if loan["status"] != "pending":
-        raise HTTPException(status_code=400, detail="Loan is not pending approval")
-    await db.loans.update_one({"id": loan_id}, {"$set": {"status": "active"}})
+        await transition_failed(db.loans, query, "Loan not found", "Loan is not pending approval")
     await update_wallet_balance(loan["kid_id"], loan["principal"], "credit")
     await add_transaction(loan["kid_id"], "credit", loan["principal"], f"Loan approved: {loan['purpose']}", "loan", loan_id)
-    return await db.loans.find_one({"id": loan_id}, {"_id": 0})
+    return loan
 
-@api.post("/loans/{loan_id}/pay")
+@api.post("/loans/{loan_id}/pay", response_model=LoanOut)
 async def pay_loan_emi(loan_id: str, user=Depends(verify_parent)):
-    loan = await db.loans.find_one({"id": loan_id, "parent_id": user["id"]}, {"_id": 0})
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    if loan["status"] != "active":
-        raise HTTPException(status_code=400, detail="Loan is not active")
-    pay_amount = min(loan["emi_amount"], loan["remaining_balance"])
-    await update_wallet_balance(loan["kid_id"], pay_amount, "debit")
-    new_remaining = round(loan["remaining_balance"] - pay_amount, 2)
-    payments = loan["payments_made"] + 1
-    status = "completed" if new_remaining <= 0 else "active"
-    await db.loans.update_one({"id": loan_id}, {"$set": {"remaining_balance": max(0, new_remaining), "payments_made": payments, "status": status}})
-    await add_transaction(loan["kid_id"], "debit", pay_amount, f"EMI payment #{payments}", "emi", loan_id)
-    await add_xp(loan["kid_id"], 15)
-    await update_credit_score(loan["kid_id"], 15)
-    return await db.loans.find_one({"id": loan_id}, {"_id": 0})
+    return await run_pay_loan({"id": loan_id, "parent_id": user["id"]})
 
 # ==================== LEARNING ROUTES ====================
 
@@ -727,240 +1323,290 @@ async def get_story(story_id: str, user=Depends(verify_parent)):
 
 @api.post("/learning/complete")
 async def complete_lesson(req: LearningComplete, user=Depends(verify_parent)):
-    existing = await db.learning_progress.find_one({"kid_id": req.kid_id, "story_id": req.story_id}, {"_id": 0})
-    if existing:
-        if req.score > existing.get("score", 0):
-            await db.learning_progress.update_one({"kid_id": req.kid_id, "story_id": req.story_id}, {"$set": {"score": req.score}})
-        return {"message": "Progress updated", "already_completed": True}
-    progress = {
-        "id": str(uuid.uuid4()),
-        "kid_id": req.kid_id,
-        "story_id": req.story_id,
-        "score": req.score,
-        "completed_at": datetime.now(timezone.utc).isoformat()
-    }
-    await db.learning_progress.insert_one(progress)
-    story = next((s for s in STORIES if s["id"] == req.story_id), None)
-    if story:
-        await add_xp(req.kid_id, story["reward_xp"])
-    return {"message": "Lesson completed!", "xp_earned": story["reward_xp"] if story else 0}
-
-@api.get("/learning/progress/{kid_id}")
-async def get_learning_progress(kid_id: str, user=Depends(verify_parent)):
-    progress = await db.learning_progress.find({"kid_id": kid_id}, {"_id": 0}).to_list(100)
+    await require_kid(user, req.kid_id)
+    return await run_complete_lesson(req.kid_id, req.story_id, req.answers)
+
+@api.get("/learning/progress/{kid_id}", response_model=List[LearningProgressOut], response_model_exclude_unset=True)
+async def get_learning_progress(kid_id: str, view: str = Query("full", pattern=VIEW_PATTERN), user=Depends(verify_parent)):
+    progress = await db.learning_progress.find({"kid_id": kid_id}, pick_projection(view, NO_ID, LEARNING_SUMMARY)).to_list(100)
     return progress
 
+@api.get("/learning/analytics/questions", response_model=List[QuestionStatOut])
+async def hardest_questions(limit: int = Query(10, ge=1, le=100), user=Depends(verify_parent)):
+    return await quiz.hardest(db, STORIES, limit)
+
 # ==================== DASHBOARD ROUTES ====================
 
-@api.get("/dashboard/kid/{kid_id}")
+@api.get("/dashboard/kid/{kid_id}", response_model=DashboardOut, response_model_exclude_unset=True)
 async def kid_dashboard(kid_id: str, user=Depends(verify_parent)):
-    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, {"_id": 0})
+    kid = await db.kids.find_one({"id": kid_id, "parent_id": user["id"]}, KID_SUMMARY)
     if not kid:
         raise HTTPException(status_code=404, detail="Kid not found")
-    wallet = await db.wallets.find_one({"kid_id": kid_id}, {"_id": 0})
-    active_tasks = await db.tasks.find({"kid_id": kid_id, "status": {"$in": ["pending", "completed"]}}, {"_id": 0}).to_list(50)
-    recent_txns = await db.transactions.find({"kid_id": kid_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
-    active_goals = await db.goals.find({"kid_id": kid_id, "status": "active"}, {"_id": 0}).to_list(50)
-    active_sips = await db.sips.find({"kid_id": kid_id, "status": "active"}, {"_id": 0}).to_list(50)
-    active_loans = await db.loans.find({"kid_id": kid_id, "status": {"$in": ["pending", "active"]}}, {"_id": 0}).to_list(50)
-    learning = await db.learning_progress.find({"kid_id": kid_id}, {"_id": 0}).to_list(100)
-    level_info = get_level_for_xp(kid.get("xp", 0))
-    next_level = get_next_level(level_info["level"])
+    return await build_dashboard(kid)
+
+async def family_totals(parent_id):
+    kid_ids = [k["id"] for k in await db.kids.find({"parent_id": parent_id}, ID_ONLY).to_list(None)]
+    balances, tasks, loans = await asyncio.gather(
+        db.wallets.aggregate([{"$match": {"kid_id": {"$in": kid_ids}}}, {"$group": {"_id": None, "total": {"$sum": "$balance"}}}]).to_list(1),
+        db.tasks.count_documents({"parent_id": parent_id, "status": "completed"}),
+        db.loans.count_documents({"parent_id": parent_id, "status": "pending"}),
+    )
     return {
-        "kid": kid,
-        "wallet": wallet,
-        "level_info": level_info,
-        "next_level": next_level,
-        "active_tasks": active_tasks,
-        "recent_transactions": recent_txns,
-        "active_goals": active_goals,
-        "active_sips": active_sips,
-        "active_loans": active_loans,
-        "learning_progress": learning,
-        "stats": {
-            "total_tasks_completed": await db.tasks.count_documents({"kid_id": kid_id, "status": "approved"}),
-            "total_stories_read": len(learning),
-            "active_goals_count": len(active_goals),
-            "active_sips_count": len(active_sips),
-        }
+        "kids_count": len(kid_ids),
+        "total_balance": balances[0]["total"] if balances else 0,
+        "pending_approvals": tasks + loans,
+    }
+
+@api.get("/dashboard/family", response_model=FamilyDashboardOut, response_model_exclude_unset=True)
+async def family_dashboard(response: Response, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=500), user=Depends(verify_parent)):
+    kids, family_stats = await asyncio.gather(
+        db.kids.find(kid_list_filter(user["id"], cursor), {**KID_SUMMARY, "name_lower": 1}).sort([("name_lower", 1), ("id", 1)]).limit(limit + 1).to_list(limit + 1),
+        family_totals(user["id"]),
+    )
+    if len(kids) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(kids[limit - 1], "name_lower")
+    kids = [{k: v for k, v in kid.items() if k != "name_lower"} for kid in kids[:limit]]
+    in_kids = {"$in": [k["id"] for k in kids]}
+    wallets, tasks, goals, sips, loans = await asyncio.gather(
+        db.wallets.find({"kid_id": in_kids}, {**WALLET_SUMMARY, "kid_id": 1}).to_list(None),
+        db.tasks.find({"kid_id": in_kids, "status": "completed"}, TASK_SUMMARY).sort("created_at", -1).to_list(None),
+        db.goals.find({"kid_id": in_kids, "status": "active"}, {**GOAL_SUMMARY, "kid_id": 1}).to_list(None),
+        db.sips.find({"kid_id": in_kids, "status": "active"}, {**SIP_SUMMARY, "kid_id": 1}).to_list(None),
+        db.loans.find({"kid_id": in_kids, "status": {"$in": ["pending", "active"]}}, {**LOAN_SUMMARY, "kid_id": 1}).to_list(None),
+    )
+    wallets = {w["kid_id"]: w for w in wallets}
+    tasks, goals, sips, loans = group_by_kid(tasks), group_by_kid(goals), group_by_kid(sips), group_by_kid(loans)
+    family = []
+    for kid in kids:
+        kid_loans = loans[kid["id"]]
+        family.append({
+            "kid": kid,
+            "wallet": wallets.get(kid["id"]),
+            "level_info": get_level_for_xp(kid.get("xp", 0)),
+            "pending_tasks": tasks[kid["id"]],
+            "active_goals": goals[kid["id"]],
+            "active_sips": sips[kid["id"]],
+            "active_loans": kid_loans,
+            "pending_approvals": len(tasks[kid["id"]]) + sum(1 for l in kid_loans if l["status"] == "pending"),
+        })
+    return {"kids": family, "stats": family_stats}
+
+# ==================== ANALYTICS ROUTES ====================
+
+@api.get("/analytics/{kid_id}", response_model=AnalyticsOut)
+async def kid_analytics(kid_id: str, granularity: str = Query("week", pattern="^(week|month)$"), periods: int = Query(12, ge=1, le=104), user=Depends(verify_parent)):
+    await require_kid(user, kid_id)
+    return await rollups.trend(db, kid_id, granularity, periods)
+
+# ==================== LEADERBOARD ROUTES ====================
+
+async def family_board(parent_id, metric, limit):
+    board_metric = board_for(metric).metric
+    return await leaderboard.family(db.kids, parent_id, board_metric, LEADERBOARD_METRICS[board_metric], limit)
+
+async def leaderboard_rank(parent_id, kid_id, metric):
+    board = board_for(metric)
+    family = await family_board(parent_id, metric, None)
+    family_rank = next((entry["rank"] for entry in family if entry["id"] == kid_id), None)
+    return {"metric": metric, "family_rank": family_rank, "family_size": len(family), "global_rank": await board.rank(kid_id), "global_size": len(board)}
+
+@api.get("/leaderboard/family", response_model=List[LeaderboardEntryOut])
+async def get_family_leaderboard(metric: str = Query("xp", pattern=METRIC_PATTERN), limit: int = Query(10, ge=1, le=100), user=Depends(verify_parent)):
+    return await family_board(user["id"], metric, limit)
+
+@api.get("/leaderboard/global", response_model=List[LeaderboardEntryOut], response_model_exclude_unset=True)
+async def get_global_leaderboard(metric: str = Query("xp", pattern=METRIC_PATTERN), limit: int = Query(10, ge=1, le=100), user=Depends(verify_parent)):
+    return await board_for(metric).top(limit)
+
+@api.get("/leaderboard/rank/{kid_id}", response_model=LeaderboardRankOut)
+async def get_leaderboard_rank(kid_id: str, metric: str = Query("xp", pattern=METRIC_PATTERN), user=Depends(verify_parent)):
+    await require_kid(user, kid_id)
+    return await leaderboard_rank(user["id"], kid_id, metric)
+
+# ==================== HISTORY ROUTES ====================
+
+def as_utc(when):
+    return when.replace(tzinfo=timezone.utc) if when.tzinfo is None else when.astimezone(timezone.utc)
+
+async def score_history(kid_id, metric, since, until, points):
+    until = as_utc(until) if until else datetime.now(timezone.utc)
+    since = as_utc(since) if since else until - timedelta(days=365)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    series = await history.series(db, kid_id, metric, since, until, points)
+    return {"metric": metric, "since": since.isoformat(), "until": until.isoformat(), "points": series}
+
+@api.get("/history/{kid_id}", response_model=HistoryOut)
+async def get_score_history(kid_id: str, metric: str = Query("xp", pattern="^(xp|credit_score)$"), since: Optional[datetime] = None, until: Optional[datetime] = None, points: int = Query(100, ge=2, le=1000), user=Depends(verify_parent)):
+    await require_kid(user, kid_id)
+    return await score_history(kid_id, metric, since, until, points)
+
+# ==================== APPROVALS ROUTES ====================
+
+@api.get("/approvals", response_model=ApprovalsOut)
+async def approvals_inbox(cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100), user=Depends(verify_parent)):
+    task_query = {"parent_id": user["id"], "status": "completed"}
+    loan_query = {"parent_id": user["id"], "status": "pending"}
+    page = keyset_filter(cursor)
+    order = [("created_at", -1), ("id", -1)]
+    tasks, loans, task_count, loan_count = await asyncio.gather(
+        db.tasks.find({**task_query, **page}, {"_id": 0, "id": 1, "kid_id": 1, "title": 1, "reward_amount": 1, "created_at": 1}).sort(order).limit(limit + 1).to_list(limit + 1),
+        db.loans.find({**loan_query, **page}, {"_id": 0, "id": 1, "kid_id": 1, "purpose": 1, "principal": 1, "created_at": 1}).sort(order).limit(limit + 1).to_list(limit + 1),
+        db.tasks.count_documents(task_query),
+        db.loans.count_documents(loan_query),
+    )
+    items = heapq.merge(
+        ({"kind": "task", "id": t["id"], "kid_id": t["kid_id"], "title": t["title"], "amount": t["reward_amount"], "created_at": t["created_at"]} for t in tasks),
+        ({"kind": "loan", "id": l["id"], "kid_id": l["kid_id"], "title": l["purpose"], "amount": l["principal"], "created_at": l["created_at"]} for l in loans),
+        key=lambda i: (i["created_at"], i["id"]), reverse=True,
+    )
+    items = list(items)
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return {
+        "items": items[:limit],
+        "next_cursor": next_cursor,
+        "counts": {"tasks": task_count, "loans": loan_count, "total": task_count + loan_count},
     }
 
 
 # ==================== KID-SPECIFIC ROUTES ====================
 
-@api.get("/kid/me")
+@api.get("/kid/me", response_model=KidMeOut, response_model_exclude_unset=True)
 async def kid_me(kid=Depends(verify_kid)):
-    wallet = await db.wallets.find_one({"kid_id": kid["id"]}, {"_id": 0})
+    kid = await db.kids.find_one({"id": kid["id"]}, KID_PUBLIC)
+    if not kid:
+        raise HTTPException(status_code=404, detail="Kid not found")
+    wallet = await db.wallets.find_one({"kid_id": kid["id"]}, WALLET_SUMMARY)
     level_info = get_level_for_xp(kid.get("xp", 0))
     next_level = get_next_level(level_info["level"])
     return {**kid, "wallet": wallet, "level_info": level_info, "next_level": next_level}
 
-@api.get("/kid/dashboard")
+@api.get("/kid/dashboard", response_model=DashboardOut, response_model_exclude_unset=True)
 async def kid_dashboard_data(kid=Depends(verify_kid)):
-    kid_fresh = await db.kids.find_one({"id": kid["id"]}, {"_id": 0})
-    wallet = await db.wallets.find_one({"kid_id": kid["id"]}, {"_id": 0})
-    active_tasks = await db.tasks.find({"kid_id": kid["id"], "status": {"$in": ["pending", "completed"]}}, {"_id": 0}).to_list(50)
-    recent_txns = await db.transactions.find({"kid_id": kid["id"]}, {"_id": 0}).sort("created_at", -1).to_list(10)
-    active_goals = await db.goals.find({"kid_id": kid["id"], "status": "active"}, {"_id": 0}).to_list(50)
-    active_sips = await db.sips.find({"kid_id": kid["id"], "status": "active"}, {"_id": 0}).to_list(50)
-    active_loans = await db.loans.find({"kid_id": kid["id"], "status": {"$in": ["pending", "active"]}}, {"_id": 0}).to_list(50)
-    learning = await db.learning_progress.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)
-    level_info = get_level_for_xp(kid_fresh.get("xp", 0))
-    next_level = get_next_level(level_info["level"])
-    return {
-        "kid": kid_fresh, "wallet": wallet, "level_info": level_info, "next_level": next_level,
-        "active_tasks": active_tasks, "recent_transactions": recent_txns, "active_goals": active_goals,
-        "active_sips": active_sips, "active_loans": active_loans, "learning_progress": learning,
-        "stats": {
-            "total_tasks_completed": await db.tasks.count_documents({"kid_id": kid["id"], "status": "approved"}),
-            "total_stories_read": len(learning), "active_goals_count": len(active_goals), "active_sips_count": len(active_sips),
-        }
-    }
+    kid_fresh = await db.kids.find_one({"id": kid["id"]}, KID_SUMMARY)
+    return await build_dashboard(kid_fresh)
 
-@api.get("/kid/tasks")
-async def kid_tasks(kid=Depends(verify_kid)):
-    return await db.tasks.find({"kid_id": kid["id"]}, {"_id": 0}).sort("created_at", -1).to_list(200)
+@api.get("/kid/tasks", response_model=List[TaskOut], response_model_exclude_unset=True)
+async def kid_tasks(view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    return await db.tasks.find({"kid_id": kid["id"]}, pick_projection(view, NO_ID, TASK_SUMMARY)).sort("created_at", -1).to_list(200)
 
-@api.put("/kid/tasks/{task_id}/complete")
+@api.put("/kid/tasks/{task_id}/complete", response_model=TaskOut)
 async def kid_complete_task(task_id: str, kid=Depends(verify_kid)):
-    task = await db.tasks.find_one({"id": task_id, "kid_id": kid["id"]}, {"_id": 0})
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    if task["status"] != "pending":
-        raise HTTPException(status_code=400, detail="Task is not pending")
-    if task["approval_required"]:
-        await db.tasks.update_one({"id": task_id}, {"$set": {"status": "completed"}})
-    else:
-        await db.tasks.update_one({"id": task_id}, {"$set": {"status": "approved"}})
-        await update_wallet_balance(kid["id"], task["reward_amount"], "credit")
-        await add_transaction(kid["id"], "credit", task["reward_amount"], f"Task reward: {task['title']}", "task", task_id)
-        await add_xp(kid["id"], 10)
-        await update_credit_score(kid["id"], 10)
-    return await db.tasks.find_one({"id": task_id}, {"_id": 0})
-
-@api.get("/kid/wallet")
+    return await run_complete_task({"id": task_id, "kid_id": kid["id"]})
+
+@api.get("/kid/wallet", response_model=Optional[WalletOut])
 async def kid_wallet(kid=Depends(verify_kid)):
     return await db.wallets.find_one({"kid_id": kid["id"]}, {"_id": 0})
 
-@api.get("/kid/transactions")
-async def kid_transactions(kid=Depends(verify_kid)):
-    return await db.transactions.find({"kid_id": kid["id"]}, {"_id": 0}).sort("created_at", -1).to_list(50)
+@api.get("/kid/transactions", response_model=List[TransactionOut], response_model_exclude_unset=True)
+async def kid_transactions(before: Optional[str] = None, view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    await flush_transactions(kid["id"])
+    return await archive.transaction_history(db, kid["id"], 50, before, pick_projection(view, NO_ID, TXN_SUMMARY))
 
-@api.get("/kid/goals")
-async def kid_goals(kid=Depends(verify_kid)):
-    return await db.goals.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)
+@api.get("/kid/analytics", response_model=AnalyticsOut)
+async def kid_own_analytics(granularity: str = Query("week", pattern="^(week|month)$"), periods: int = Query(12, ge=1, le=104), kid=Depends(verify_kid)):
+    return await rollups.trend(db, kid["id"], granularity, periods)
 
-@api.put("/kid/goals/{goal_id}/contribute")
+@api.get("/kid/goals", response_model=List[GoalOut], response_model_exclude_unset=True)
+async def kid_goals(view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    return await db.goals.find({"kid_id": kid["id"]}, pick_projection(view, NO_ID, GOAL_SUMMARY)).to_list(100)
+
+@api.get("/kid/goals/forecast", response_model=List[GoalForecastOut])
+async def kid_goal_forecast(kid=Depends(verify_kid)):
+    await flush_transactions(kid["id"])
+    return await goal_forecasts.get(db, kid["id"])
+
+@api.put("/kid/goals/{goal_id}/contribute", response_model=GoalOut)
 async def kid_contribute_goal(goal_id: str, req: GoalContribute, kid=Depends(verify_kid)):
-    goal = await db.goals.find_one({"id": goal_id, "kid_id": kid["id"]}, {"_id": 0})
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    if goal["status"] != "active":
-        raise HTTPException(status_code=400, detail="Goal is not active")
-    await update_wallet_balance(kid["id"], req.amount, "save")
-    new_saved = goal["saved_amount"] + req.amount
-    status = "completed" if new_saved >= goal["target_amount"] else "active"
-    await db.goals.update_one({"id": goal_id}, {"$set": {"saved_amount": new_saved, "status": status}})
-    await add_transaction(kid["id"], "debit", req.amount, f"Goal savings: {goal['title']}", "goal", goal_id)
-    await add_xp(kid["id"], 20)
-    await update_credit_score(kid["id"], 5)
-    return await db.goals.find_one({"id": goal_id}, {"_id": 0})
-
-@api.get("/kid/sip")
-async def kid_sips(kid=Depends(verify_kid)):
-    return await db.sips.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)
-
-@api.post("/kid/sip/{sip_id}/pay")
+    return await run_contribute_goal({"id": goal_id, "kid_id": kid["id"]}, req.amount)
+
+@api.get("/kid/sip", response_model=List[SIPOut], response_model_exclude_unset=True)
+async def kid_sips(view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    return await db.sips.find({"kid_id": kid["id"]}, pick_projection(view, NO_ID, SIP_SUMMARY)).to_list(100)
+
+@api.post("/kid/sip/{sip_id}/pay", response_model=SIPOut)
 async def kid_pay_sip(sip_id: str, kid=Depends(verify_kid)):
-    sip = await db.sips.find_one({"id": sip_id, "kid_id": kid["id"]}, {"_id": 0})
-    if not sip:
-        raise HTTPException(status_code=404, detail="SIP not found")
-    if sip["status"] != "active":
-        raise HTTPException(status_code=400, detail="SIP is not active")
-    await update_wallet_balance(kid["id"], sip["amount"], "save")
-    new_invested = sip["total_invested"] + sip["amount"]
-    payments = sip["payments_made"] + 1
-    monthly_rate = sip["interest_rate"] / 100 / 12
-    new_value = sip["amount"] * ((math.pow(1 + monthly_rate, payments) - 1) / monthly_rate) * (1 + monthly_rate) if monthly_rate > 0 else new_invested
-    await db.sips.update_one({"id": sip_id}, {"$set": {"total_invested": new_invested, "current_value": round(new_value, 2), "payments_made": payments}})
-    await add_transaction(kid["id"], "debit", sip["amount"], f"SIP payment #{payments}", "sip", sip_id)
-    await add_xp(kid["id"], 15)
-    await update_credit_score(kid["id"], 5)
-    return await db.sips.find_one({"id": sip_id}, {"_id": 0})
-
-@api.get("/kid/loans")
-async def kid_loans(kid=Depends(verify_kid)):
-    return await db.loans.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)
-
-@api.post("/kid/loans/{loan_id}/pay")
+    return await run_pay_sip({"id": sip_id, "kid_id": kid["id"]})
+
+@api.get("/kid/loans", response_model=List[LoanOut], response_model_exclude_unset=True)
+async def kid_loans(view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    return await db.loans.find({"kid_id": kid["id"]}, pick_projection(view, NO_ID, LOAN_SUMMARY)).to_list(100)
+
+@api.post("/kid/loans/{loan_id}/pay", response_model=LoanOut)
 async def kid_pay_loan(loan_id: str, kid=Depends(verify_kid)):
-    loan = await db.loans.find_one({"id": loan_id, "kid_id": kid["id"]}, {"_id": 0})
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
-    if loan["status"] != "active":
-        raise HTTPException(status_code=400, detail="Loan is not active")
-    pay_amount = min(loan["emi_amount"], loan["remaining_balance"])
-    await update_wallet_balance(kid["id"], pay_amount, "debit")
-    new_remaining = round(loan["remaining_balance"] - pay_amount, 2)
-    payments = loan["payments_made"] + 1
-    status = "completed" if new_remaining <= 0 else "active"
-    await db.loans.update_one({"id": loan_id}, {"$set": {"remaining_balance": max(0, new_remaining), "payments_made": payments, "status": status}})
-    await add_transaction(kid["id"], "debit", pay_amount, f"EMI payment #{payments}", "emi", loan_id)
-    await add_xp(kid["id"], 15)
-    await update_credit_score(kid["id"], 15)
-    return await db.loans.find_one({"id": loan_id}, {"_id": 0})
+    return await run_pay_loan({"id": loan_id, "kid_id": kid["id"]})
 
 @api.get("/kid/learning/stories")
 async def kid_stories(kid=Depends(verify_kid)):
     return STORIES
 
-@api.get("/kid/learning/progress")
-async def kid_learning_progress(kid=Depends(verify_kid)):
-    return await db.learning_progress.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)
+@api.get("/kid/learning/progress", response_model=List[LearningProgressOut], response_model_exclude_unset=True)
+async def kid_learning_progress(view: str = Query("full", pattern=VIEW_PATTERN), kid=Depends(verify_kid)):
+    return await db.learning_progress.find({"kid_id": kid["id"]}, pick_projection(view, NO_ID, LEARNING_SUMMARY)).to_list(100)
 
 @api.post("/kid/learning/complete")
 async def kid_complete_lesson(req: KidLearningComplete, kid=Depends(verify_kid)):
-    existing = await db.learning_progress.find_one({"kid_id": kid["id"], "story_id": req.story_id}, {"_id": 0})
-    if existing:
-        if req.score > existing.get("score", 0):
-            await db.learning_progress.update_one({"kid_id": kid["id"], "story_id": req.story_id}, {"$set": {"score": req.score}})
-        return {"message": "Progress updated", "already_completed": True}
-    progress = {"id": str(uuid.uuid4()), "kid_id": kid["id"], "story_id": req.story_id, "score": req.score, "completed_at": datetime.now(timezone.utc).isoformat()}
-    await db.learning_progress.insert_one(progress)
-    story = next((s for s in STORIES if s["id"] == req.story_id), None)
-    if story:
-        await add_xp(kid["id"], story["reward_xp"])
-    return {"message": "Lesson completed!", "xp_earned": story["reward_xp"] if story else 0}
+    return await run_complete_lesson(kid["id"], req.story_id, req.answers)
+
+@api.get("/kid/leaderboard/family", response_model=List[LeaderboardEntryOut])
+async def kid_family_leaderboard(metric: str = Query("xp", pattern=METRIC_PATTERN), limit: int = Query(10, ge=1, le=100), kid=Depends(verify_kid)):
+    return await family_board(kid["parent_id"], metric, limit)
+
+@api.get("/kid/leaderboard/global", response_model=List[LeaderboardEntryOut], response_model_exclude_unset=True)
+async def kid_global_leaderboard(metric: str = Query("xp", pattern=METRIC_PATTERN), limit: int = Query(10, ge=1, le=100), kid=Depends(verify_kid)):
+    return await board_for(metric).top(limit)
+
+@api.get("/kid/leaderboard/rank", response_model=LeaderboardRankOut)
+async def kid_leaderboard_rank(metric: str = Query("xp", pattern=METRIC_PATTERN), kid=Depends(verify_kid)):
+    return await leaderboard_rank(kid["parent_id"], kid["id"], metric)
+
+@api.get("/kid/history", response_model=HistoryOut)
+async def kid_score_history(metric: str = Query("xp", pattern="^(xp|credit_score)$"), since: Optional[datetime] = None, until: Optional[datetime] = None, points: int = Query(100, ge=2, le=1000), kid=Depends(verify_kid)):
+    return await score_history(kid["id"], metric, since, until, points)
 
 @api.get("/kid/achievements")
 async def kid_achievements(kid=Depends(verify_kid)):
-    kid_fresh = await db.kids.find_one({"id": kid["id"]}, {"_id": 0})
-    tasks_done = await db.tasks.count_documents({"kid_id": kid["id"], "status": "approved"})
-    stories_done = await db.learning_progress.count_documents({"kid_id": kid["id"]})
-    goals_done = await db.goals.count_documents({"kid_id": kid["id"], "status": "completed"})
-    sip_payments = sum([s.get("payments_made", 0) for s in await db.sips.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)])
-    loan_payments = sum([l.get("payments_made", 0) for l in await db.loans.find({"kid_id": kid["id"]}, {"_id": 0}).to_list(100)])
-    level_info = get_level_for_xp(kid_fresh.get("xp", 0))
-    badges = []
-    if tasks_done >= 1: badges.append({"name": "First Task", "icon": "check-circle", "desc": "Completed your first task"})
-    if tasks_done >= 10: badges.append({"name": "Task Pro", "icon": "check-square", "desc": "Completed 10 tasks"})
-    if stories_done >= 1: badges.append({"name": "Bookworm", "icon": "book-open", "desc": "Read your first story"})
-    if stories_done >= 5: badges.append({"name": "Scholar", "icon": "graduation-cap", "desc": "Read all stories"})
-    if goals_done >= 1: badges.append({"name": "Goal Getter", "icon": "target", "desc": "Achieved your first goal"})
-    if sip_payments >= 3: badges.append({"name": "Investor", "icon": "trending-up", "desc": "Made 3 SIP payments"})
-    if loan_payments >= 1: badges.append({"name": "Responsible", "icon": "shield", "desc": "Made your first EMI payment"})
-    if kid_fresh.get("credit_score", 500) >= 700: badges.append({"name": "Credit Star", "icon": "star", "desc": "Credit score above 700"})
-    for lvl in LEVELS:
-        if kid_fresh.get("level", 1) >= lvl["level"]:
-            badges.append({"name": f"Level {lvl['level']}: {lvl['name']}", "icon": lvl["icon"], "desc": f"Reached level {lvl['level']}"})
-    return {"badges": badges, "stats": {"tasks_completed": tasks_done, "stories_read": stories_done, "goals_achieved": goals_done, "sip_payments": sip_payments, "loan_payments": loan_payments}, "level_info": level_info, "credit_score": kid_fresh.get("credit_score", 500), "xp": kid_fresh.get("xp", 0)}
+    kid_fresh, tasks_done, stories_done, goals_done, sips, loans = await asyncio.gather(
+        db.kids.find_one({"id": kid["id"]}, {"_id": 0, "xp": 1, "level": 1, "credit_score": 1}),
+        db.tasks.count_documents({"kid_id": kid["id"], "status": "approved"}),
+        db.learning_progress.count_documents({"kid_id": kid["id"]}),
+        db.goals.count_documents({"kid_id": kid["id"], "status": "completed"}),
+        db.sips.find({"kid_id": kid["id"]}, {"_id": 0, "payments_made": 1}).to_list(100),
+        db.loans.find({"kid_id": kid["id"]}, {"_id": 0, "payments_made": 1}).to_list(100),
+    )
+    compiled = rulebook.current()
+    credit_score = kid_fresh.get("credit_score", compiled.credit_initial)
+    stats = {
+        "tasks_completed": tasks_done,
+        "stories_read": stories_done,
+        "goals_achieved": goals_done,
+        "sip_payments": sum(s.get("payments_made", 0) for s in sips),
+        "loan_payments": sum(l.get("payments_made", 0) for l in loans),
+    }
+    badges = compiled.badges({**stats, "credit_score": credit_score}, kid_fresh.get("level", 1))
+    return {"badges": badges, "stats": stats, "level_info": compiled.level_for_xp(kid_fresh.get("xp", 0)), "credit_score": credit_score, "xp": kid_fresh.get("xp", 0)}
 
 
+# ==================== ADMIN ROUTES ====================
+
+@api.get("/admin/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str, format: str = Query("json", pattern="^(json|raw)$"), x_profile: Optional[str] = Header(None)):
+    store = getattr(request.app.state, "profiles", None)
+    if store is None or not profiling.authorized(settings.profiling_secret, x_profile):
+        raise HTTPException(status_code=404, detail="Not found")
+    entry = store.get(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    summary, output = entry
+    if format == "raw":
+        return PlainTextResponse(output)
+    return {**summary, "profile": output}
+
 # ==================== CONFIG ROUTES ====================
 
 @api.get("/config/levels")
 async def get_levels():
-    return LEVELS
+    return rulebook.current().levels
 
 @api.get("/config/avatars")
 async def get_avatars():
@@ -968,31 +1614,120 @@ async def get_avatars():
 
 # ==================== APP CONFIG ====================
 
-app.include_router(api)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.on_event("startup")
-async def startup():
+async def ensure_indexes(idempotency_store):
     await db.users.create_index("email", unique=True)
     await db.users.create_index("id", unique=True)
     await db.kids.create_index("id", unique=True)
     await db.kids.create_index("parent_id")
+    await db.kids.create_index([("parent_id", 1), ("name_lower", 1)])
     await db.wallets.create_index("kid_id", unique=True)
     await db.transactions.create_index("kid_id")
     await db.tasks.create_index([("kid_id", 1), ("status", 1)])
     await db.goals.create_index("kid_id")
     await db.sips.create_index("kid_id")
     await db.loans.create_index("kid_id")
+    await db.tasks.create_index([("parent_id", 1), ("status", 1), ("created_at", -1), ("id", -1)])
+    await db.loans.create_index([("parent_id", 1), ("status", 1), ("created_at", -1), ("id", -1)])
     await db.learning_progress.create_index([("kid_id", 1), ("story_id", 1)], unique=True)
-    logger.info("Kids Money API started successfully")
-
-@app.on_event("shutdown")
-async def shutdown():
-    client.close()
+    await idempotency_store.ensure_indexes()
+    await rate_limit_store.ensure_indexes()
+    await revocations.ensure_indexes()
+    await db.sessions.create_index("id", unique=True)
+    await db.sessions.create_index("expires_at", expireAfterSeconds=0)
+    await rollups.ensure_indexes(db)
+    await archive.ensure_indexes(db)
+    await quiz.ensure_indexes(db)
+    await history.ensure_indexes(db)
+    for board in leaderboards.values():
+        await board.ensure_indexes()
+
+async def warm_pool():
+    await asyncio.gather(*(db.ping() for _ in range(max(settings.min_pool_size, 1))))
+
+# Handlers read the module globals below, so each app keeps its own state on
+# app.state and installs it when it starts; only one app can run per process.
+def activate(app: FastAPI):
+    global active_app, settings, rate_limit_store, revocations, leaderboards, goal_forecasts, rulebook, transaction_buffer
+    if active_app is not None and active_app is not app:
+        raise RuntimeError("Another Kids Money app is already running in this process")
+    active_app = app
+    settings = app.state.settings
+    rate_limit_store = app.state.rate_limit_store
+    revocations = app.state.revocations
+    leaderboards = app.state.leaderboards
+    goal_forecasts = app.state.goal_forecasts
+    rulebook = app.state.rulebook
+    transaction_buffer = app.state.transaction_buffer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db, active_app
+    activate(app)
+    db = None
+    try:
+        db = open_repository(settings)
+        if settings.secondary_read_routes:
+            db = routing.RoutedRepository(db)
+        if settings.profiling_secret:
+            db = profiling.ProfiledRepository(db)
+        await warm_pool()
+        await ensure_indexes(app.state.idempotency_store)
+        logger.info("Kids Money API started successfully")
+        yield
+    finally:
+        if transaction_buffer:
+            await transaction_buffer.close()
+        if db is not None:
+            db.close()
+        active_app = None
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    settings = app_settings or Settings.from_env()
+    revocations = tokens.RevocationList(lambda: db.revocations, ttl=settings.access_token_ttl_seconds, sync_interval=settings.revocation_sync_seconds)
+    leaderboards = {
+        metric: leaderboard.Leaderboard(lambda: db.kids, metric, default, refresh_seconds=settings.leaderboard_refresh_seconds)
+        for metric, default in LEADERBOARD_METRICS.items()
+    }
+    rulebook = rules.RuleBook(settings.rules_path, check_interval=settings.rules_reload_seconds)
+    goal_forecasts = forecast.ForecastCache(window_days=settings.goal_forecast_window_days)
+    transaction_buffer = None
+    if settings.transaction_buffer_enabled:
+        transaction_buffer = write_buffer.WriteBuffer(lambda: db.transactions, max_batch=settings.transaction_buffer_max_batch, max_delay=settings.transaction_buffer_max_delay_seconds)
+    rate_limit_store = SharedBuckets(lambda: db.rate_limits) if settings.rate_limit_store == "shared" else LocalBuckets(settings.rate_limit_max_keys)
+    app = FastAPI(title="Kids Money API", default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.include_router(api)
+    app.state.settings = settings
+    app.state.rate_limit_store = rate_limit_store
+    app.state.revocations = revocations
+    app.state.leaderboards = leaderboards
+    app.state.goal_forecasts = goal_forecasts
+    app.state.rulebook = rulebook
+    app.state.transaction_buffer = transaction_buffer
+
+    app.state.idempotency_store = IdempotencyStore(lambda: db.idempotency_keys, ttl=settings.idempotency_ttl_seconds)
+    if settings.secondary_read_routes:
+        names = list(READ_ROUTES) if settings.secondary_read_routes == ["all"] else settings.secondary_read_routes
+        unknown = sorted(set(names) - set(READ_ROUTES))
+        if unknown:
+            raise ValueError(f"Unknown read routes: {', '.join(unknown)}")
+        router = routing.ReadRouter([READ_ROUTES[name] for name in names])
+        app.add_middleware(routing.ReadRoutingMiddleware, router=router, get_repository=lambda: db, principal=rate_limit_principal)
+    app.add_middleware(IdempotencyMiddleware, store=app.state.idempotency_store, paths=MONEY_ROUTES, principal=rate_limit_principal)
+    if settings.rate_limit_enabled:
+        app.add_middleware(RateLimitMiddleware, store=rate_limit_store, limits=RATE_LIMITS, principal=rate_limit_principal)
+
+    if settings.profiling_secret:
+        app.state.profiles = profiling.ProfileStore(directory=settings.profile_dir)
+        app.add_middleware(profiling.ProfilingMiddleware, secret=settings.profiling_secret, store=app.state.profiles)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Server-Timing", "X-Profile-Id"],
+    )
+    return app
+
+app = create_app()
@@ -0,0 +1,89 @@
+"""Runtime settings for the Kids Money API, read from the environment."""
+import os
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+def _optional_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+class Settings(BaseModel):
+    backend: str = Field("motor", pattern="^(motor|memory)$")
+    mongo_url: str = ""
+    db_name: str = ""
+    jwt_secret: Optional[str] = None
+    cors_origins: List[str] = ["*"]
+    idempotency_ttl_seconds: int = 86400
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    compressors: List[str] = []
+    server_selection_timeout_ms: int = 30000
+    connect_timeout_ms: int = 20000
+    socket_timeout_ms: Optional[int] = None
+    access_token_ttl_seconds: int = 900
+    refresh_token_ttl_seconds: int = 30 * 86400
+    revocation_sync_seconds: float = 5
+    rate_limit_enabled: bool = True
+    rate_limit_store: str = Field("local", pattern="^(local|shared)$")
+    rate_limit_max_keys: int = 100000
+    leaderboard_refresh_seconds: float = 60
+    goal_forecast_window_days: int = 90
+    rules_path: Optional[str] = None
+    rules_reload_seconds: float = 5
+    transaction_buffer_enabled: bool = False
+    transaction_buffer_max_batch: int = 500
+    transaction_buffer_max_delay_seconds: float = 0.05
+    secondary_read_routes: List[str] = []
+    profiling_secret: Optional[str] = None
+    profile_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls):
+        backend = os.environ.get('DB_BACKEND', 'motor')
+        in_memory = backend == "memory"
+        return cls(
+            backend=backend,
+            mongo_url=os.environ.get('MONGO_URL', '') if in_memory else os.environ['MONGO_URL'],
+            db_name=os.environ.get('DB_NAME', '') if in_memory else os.environ['DB_NAME'],
+            jwt_secret=os.environ.get('JWT_SECRET'),
+            cors_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+            idempotency_ttl_seconds=int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400)),
+            max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+            min_pool_size=int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+            compressors=[c for c in os.environ.get('MONGO_COMPRESSORS', '').split(',') if c],
+            server_selection_timeout_ms=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000)),
+            connect_timeout_ms=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 20000)),
+            socket_timeout_ms=_optional_int('MONGO_SOCKET_TIMEOUT_MS'),
+            access_token_ttl_seconds=int(os.environ.get('ACCESS_TOKEN_TTL_SECONDS', 900)),
+            refresh_token_ttl_seconds=int(os.environ.get('REFRESH_TOKEN_TTL_SECONDS', 30 * 86400)),
+            revocation_sync_seconds=float(os.environ.get('REVOCATION_SYNC_SECONDS', 5)),
+            rate_limit_enabled=os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no'),
+            rate_limit_store=os.environ.get('RATE_LIMIT_STORE', 'local'),
+            rate_limit_max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)),
+            leaderboard_refresh_seconds=float(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 60)),
+            goal_forecast_window_days=int(os.environ.get('GOAL_FORECAST_WINDOW_DAYS', 90)),
+            rules_path=os.environ.get('RULES_PATH') or None,
+            rules_reload_seconds=float(os.environ.get('RULES_RELOAD_SECONDS', 5)),
+            transaction_buffer_enabled=os.environ.get('TRANSACTION_BUFFER_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+            transaction_buffer_max_batch=int(os.environ.get('TRANSACTION_BUFFER_MAX_BATCH', 500)),
+            transaction_buffer_max_delay_seconds=float(os.environ.get('TRANSACTION_BUFFER_MAX_DELAY_SECONDS', 0.05)),
+            secondary_read_routes=[r for r in os.environ.get('SECONDARY_READ_ROUTES', '').split(',') if r],
+            profiling_secret=os.environ.get('PROFILING_SECRET') or None,
+            profile_dir=os.environ.get('PROFILE_DIR') or None,
+        )
+
+    def client_options(self):
+        """Keyword arguments for AsyncIOMotorClient."""
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms,
+        }
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        return options
@@ -0,0 +1,30 @@
+"""
+Shared fixtures for the backend tests:
+- bearer: Authorization header for a token
+- make_app: in-memory app factory with rate limiting off; keyword
+  arguments override the Settings fields
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+from settings import Settings  # noqa: E402
+
+JWT_SECRET = "backend-test-secret-0123456789abcdef"
+
+
+@pytest.fixture
+def bearer():
+    def header(token):
+        return {"Authorization": f"Bearer {token}"}
+    return header
+
+
+@pytest.fixture
+def make_app():
+    def make(**overrides):
+        return server.create_app(Settings(**{"backend": "memory", "jwt_secret": JWT_SECRET, "rate_limit_enabled": False, **overrides}))
+    return make
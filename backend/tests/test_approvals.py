@@ -0,0 +1,92 @@
+"""
+Tests for the parent approvals inbox:
+- Completed tasks and pending loans are merged newest first
+- Keyset pages (created_at, id) have no gaps or repeats, including ties on
+  created_at across both collections
+- Counts cover the whole inbox, and a malformed cursor is rejected
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+TASKS = [
+    ("a", "2024-01-03T10:00:00", "completed"),
+    ("c", "2024-01-03T10:00:00", "completed"),
+    ("d", "2024-01-02T10:00:00", "completed"),
+    ("g", "2024-01-01T10:00:00", "completed"),
+    ("h", "2024-01-04T10:00:00", "pending"),
+]
+LOANS = [
+    ("b", "2024-01-03T10:00:00", "pending"),
+    ("e", "2024-01-02T10:00:00", "pending"),
+    ("f", "2024-01-01T10:00:00", "pending"),
+    ("i", "2024-01-04T10:00:00", "active"),
+]
+INBOX = ["c", "b", "a", "e", "d", "g", "f"]
+
+
+@pytest.fixture
+def inbox(monkeypatch, bearer, make_app):
+    backend = MemoryRepository()
+    monkeypatch.setattr(server, "open_repository", lambda settings: backend)
+    with TestClient(make_app()) as client:
+        signup = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()
+        parent_id = signup["user"]["id"]
+        asyncio.run(backend.tasks.insert_many(
+            [{"id": i, "parent_id": parent_id, "kid_id": "k1", "title": f"Task {i}", "reward_amount": 500, "status": s, "created_at": at} for i, at, s in TASKS]
+            + [{"id": "j", "parent_id": "someone-else", "kid_id": "k9", "title": "Theirs", "reward_amount": 100, "status": "completed", "created_at": "2024-01-05T10:00:00"}]
+        ))
+        asyncio.run(backend.loans.insert_many(
+            [{"id": i, "parent_id": parent_id, "kid_id": "k2", "purpose": f"Loan {i}", "principal": 2050, "status": s, "created_at": at} for i, at, s in LOANS]
+        ))
+        yield client, bearer(signup["token"])
+
+
+def walk(client, headers, limit):
+    pages, params = [], {"limit": limit}
+    while True:
+        page = client.get("/api/approvals", params=params, headers=headers).json()
+        pages.append(page)
+        if not page["next_cursor"]:
+            return pages
+        params["cursor"] = page["next_cursor"]
+
+
+class TestInbox:
+    """Merged, paged approvals"""
+
+    def test_01_single_page(self, inbox):
+        """Tasks and loans interleave newest first; other parents and settled items are excluded"""
+        client, headers = inbox
+        page = client.get("/api/approvals", headers=headers).json()
+        assert [item["id"] for item in page["items"]] == INBOX and page["next_cursor"] is None
+        assert [item["kind"] for item in page["items"][:3]] == ["task", "loan", "task"]
+        assert page["items"][1] == {"kind": "loan", "id": "b", "kid_id": "k2", "title": "Loan b", "amount": 20.5, "created_at": "2024-01-03T10:00:00"}
+        assert page["items"][0]["amount"] == 5
+
+    @pytest.mark.parametrize("limit", [1, 2, 3, 6])
+    def test_02_pages_have_no_gaps_or_repeats(self, inbox, limit):
+        """Walking the cursor visits every item once, even when a page boundary splits a created_at tie"""
+        client, headers = inbox
+        pages = walk(client, headers, limit)
+        assert [item["id"] for page in pages for item in page["items"]] == INBOX
+        assert all(len(page["items"]) == limit for page in pages[:-1]) and 0 < len(pages[-1]["items"]) <= limit
+
+    def test_03_counts(self, inbox):
+        """Counts are for the whole inbox, not the page"""
+        client, headers = inbox
+        pages = walk(client, headers, 2)
+        assert all(page["counts"] == {"tasks": 4, "loans": 3, "total": 7} for page in pages)
+
+    def test_04_bad_cursor(self, inbox):
+        """A cursor that does not decode is a 400"""
+        client, headers = inbox
+        for cursor in ("%%%", "bm8tc2VwYXJhdG9y", "é"):
+            assert client.get("/api/approvals", params={"cursor": cursor}, headers=headers).status_code == 400
@@ -0,0 +1,112 @@
+"""
+Tests for the transaction archival tier:
+- The archive cutoff is aligned to a month boundary
+- Bucket totals follow the reconciliation ledger rules
+- Bucket upserts are guarded so an interrupted run cannot double-archive
+- A re-run pushes only the entries a bucket is missing and deletes only
+  hot rows that are confirmed archived
+"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import archive  # noqa: E402
+from archive import archive_cutoff, bucket_update  # noqa: E402
+from reconcile import ledger_contribution  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+def txn(id, type, amount, category, created_at):
+    return {"id": id, "type": type, "amount": amount, "description": "", "category": category, "reference_id": None, "created_at": created_at}
+
+
+class TestArchiveCutoff:
+    """Horizon handling"""
+
+    def test_01_cutoff_is_start_of_month(self):
+        """Whole months are archived so a kid-month bucket is written once"""
+        now = datetime(2024, 3, 15, 12, 30, tzinfo=timezone.utc)
+        assert archive_cutoff(365, now) == "2023-03-01T00:00:00+00:00"
+        assert archive_cutoff(10, now) == "2024-03-01T00:00:00+00:00"
+
+    def test_02_cutoff_compares_with_created_at(self):
+        """ISO strings order the same way as the timestamps they encode"""
+        cutoff = archive_cutoff(30, datetime(2024, 3, 15, tzinfo=timezone.utc))
+        assert "2024-01-31T23:59:59.999999+00:00" < cutoff < "2024-02-01T00:00:00.000001+00:00"
+
+
+class TestBucketUpdate:
+    """Kid-month bucket writes"""
+
+    def test_01_totals_match_ledger_rules(self):
+        """Savings and refunds move total_saved, not earned or spent"""
+        entries = [
+            txn("t4", "credit", 300, "goal_refund", "2023-05-20T00:00:00+00:00"),
+            txn("t3", "debit", 500, "goal", "2023-05-10T00:00:00+00:00"),
+            txn("t2", "debit", 250, "purchase", "2023-05-05T00:00:00+00:00"),
+            txn("t1", "credit", 1000, "task", "2023-05-01T00:00:00+00:00"),
+        ]
+        update = bucket_update("k1", "2023-05", entries)
+        assert update._doc["$inc"] == {
+            "count": 4, "totals.balance": 550, "totals.total_earned": 1000,
+            "totals.total_spent": 250, "totals.total_saved": 200,
+        }
+        assert update._doc["$min"] == {"first_at": "2023-05-01T00:00:00+00:00"}
+        assert update._doc["$max"] == {"last_at": "2023-05-20T00:00:00+00:00"}
+
+    def test_02_guarded_upsert(self):
+        """A bucket already holding these ids does not match, so the upsert hits the unique index"""
+        update = bucket_update("k1", "2023-05", [txn("t1", "credit", 10, "task", "2023-05-01T00:00:00+00:00")])
+        assert update._filter == {"kid_id": "k1", "month": "2023-05", "entries.id": {"$nin": ["t1"]}}
+        assert update._upsert
+
+    def test_03_contribution_signs(self):
+        """Debits reduce the balance, credits increase it"""
+        assert ledger_contribution(txn("a", "debit", 4, "sip", ""))["balance"] == -4
+        assert ledger_contribution(txn("b", "credit", 4, "bonus", ""))["balance"] == 4
+
+
+class TestArchiveRun:
+    """archive() against buckets left by an interrupted run"""
+
+    def hot(self):
+        return [txn(f"t{i}", "credit", 100 * (i + 1), "task", f"2020-05-0{i + 1}T00:00:00+00:00") for i in range(4)]
+
+    def test_01_bucket_holding_part_of_a_batch(self):
+        """Entries already in the bucket are not pushed again, the rest are added, and every hot row is removed"""
+        db = MemoryRepository()
+
+        async def scenario():
+            await archive.ensure_indexes(db)
+            rows = self.hot()
+            await db.transactions.insert_many([{"kid_id": "k1", **row} for row in rows])
+            # An earlier run pushed t0 and t1 but stopped before deleting them.
+            await db.transactions_archive.bulk_write([bucket_update("k1", "2020-05", rows[1::-1])])
+            report = await archive.archive(db)
+            return report, await db.transactions_archive.find({}, {"_id": 0}).to_list(None), await db.transactions.count_documents({})
+
+        report, buckets, hot_left = asyncio.run(scenario())
+        [bucket] = buckets
+        assert report["transactions_moved"] == 4 and hot_left == 0
+        assert [e["id"] for e in bucket["entries"]] == ["t3", "t2", "t1", "t0"]
+        assert bucket["count"] == 4 and bucket["totals"]["balance"] == 1000 and bucket["totals"]["total_earned"] == 1000
+        assert bucket["first_at"] == "2020-05-01T00:00:00+00:00" and bucket["last_at"] == "2020-05-04T00:00:00+00:00"
+
+    def test_02_lost_race_keeps_hot_rows(self, monkeypatch):
+        """If a concurrent run's bucket wins the unique key, rows that did not land stay in the hot collection"""
+        db = MemoryRepository()
+
+        async def conflict(updates, ordered=True):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+
+        async def scenario():
+            await db.transactions.insert_many([{"kid_id": "k1", **row} for row in self.hot()])
+            monkeypatch.setattr(db.transactions_archive, "bulk_write", conflict)
+            await archive.archive(db)
+            return await db.transactions.count_documents({})
+
+        assert asyncio.run(scenario()) == 4
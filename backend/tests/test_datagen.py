@@ -0,0 +1,96 @@
+"""
+Tests for the synthetic data generator:
+- The same seed produces the same documents
+- Wallets, rollups, levels and loan balances agree exactly with the generated history
+- Documents validate against the API response models
+- Family ranges are written in chunks with insert_many
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import datagen  # noqa: E402
+import rules  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+END = datetime(2026, 1, 1, tzinfo=timezone.utc)
+RULES = rules.load(rules.DEFAULT_PATH)
+OPTIONS = datagen.Options(years=1, tasks_per_month=(4, 10))
+AVATARS = [a["id"] for a in server.AVATARS]
+
+
+def family(seed, index):
+    return datagen.family_documents(seed, index, END, OPTIONS, RULES, server.STORIES, AVATARS, "hash")
+
+
+class TestFamilies:
+    """Generated documents"""
+
+    def test_01_deterministic(self):
+        """Documents depend only on the seed and family index"""
+        assert family(7, 3) == family(7, 3)
+        assert family(7, 3)["kids"] != family(8, 3)["kids"]
+        assert datagen.password_hash(7) == datagen.password_hash(7)
+
+    def test_02_consistent_history(self):
+        """Wallet totals, rollups, XP levels and loans follow from the transactions"""
+        docs = defaultdict(list)
+        for index in range(5):
+            datagen.family_documents(1, index, END, OPTIONS, RULES, server.STORIES, AVATARS, "hash", docs)
+        ledger = defaultdict(lambda: defaultdict(int))
+        for txn in docs["transactions"]:
+            sign = 1 if txn["type"] == "credit" else -1
+            ledger[txn["kid_id"]]["balance"] += sign * txn["amount"]
+            assert txn["created_at"] <= END.isoformat()
+        for wallet in docs["wallets"]:
+            assert wallet["balance"] >= 0
+            assert wallet["balance"] == ledger[wallet["kid_id"]]["balance"]
+            assert wallet["balance"] == wallet["total_earned"] - wallet["total_spent"] - wallet["total_saved"]
+        for kid in docs["kids"]:
+            assert kid["level"] == RULES.level_for_xp(kid["xp"])["level"]
+            assert RULES.credit_min <= kid["credit_score"] <= RULES.credit_max
+        paid = defaultdict(int)
+        for txn in docs["transactions"]:
+            if txn["category"] == "emi":
+                paid[txn["reference_id"]] += txn["amount"]
+        for loan in docs["loans"]:
+            assert loan["principal"] - paid[loan["id"]] == loan["remaining_balance"]
+            assert (loan["status"] == "completed") == (loan["remaining_balance"] == 0)
+
+        buckets = datagen.rollup_documents(docs["transactions"])
+        monthly = [b for b in buckets if b["granularity"] == "month"]
+        assert sum(b["count"] for b in monthly) == len(docs["transactions"])
+        assert sum(b["earned"] for b in monthly) == sum(w["total_earned"] for w in docs["wallets"])
+        assert all(isinstance(txn["amount"], int) for txn in docs["transactions"])
+
+    def test_03_api_shapes(self):
+        """Every generated document is a valid API response"""
+        docs = family(2, 0)
+        models = {
+            "kids": server.KidOut, "wallets": server.WalletOut, "tasks": server.TaskOut, "goals": server.GoalOut,
+            "sips": server.SIPOut, "loans": server.LoanOut, "learning_progress": server.LearningProgressOut,
+            "transactions": server.TransactionOut,
+        }
+        for name, model in models.items():
+            for doc in docs[name]:
+                model.model_validate(doc)
+        assert {t["status"] for t in docs["tasks"]} <= {"pending", "completed", "approved", "rejected"}
+        assert {k["avatar"] for k in (doc for index in range(10) for doc in family(2, index)["kids"])} <= set(AVATARS)
+
+
+class TestPopulate:
+    """Chunked writes"""
+
+    def test_01_ranges_and_counts(self):
+        """Ranges cover every family once and counts match the inserted documents"""
+        assert datagen.ranges(10, 4) == [(0, 3), (3, 6), (6, 9), (9, 10)]
+        db = MemoryRepository()
+        counts = asyncio.run(datagen.populate(db, 1, 0, 6, END, OPTIONS, RULES, server.STORIES, AVATARS, "hash", chunk_size=500))
+        stored = {name: asyncio.run(db[name].count_documents({})) for name in datagen.COLLECTIONS}
+        print(f"✓ {sum(counts.values())} documents for 6 families")
+        assert counts == stored and counts["users"] == 6
+        assert counts["transactions"] > 100 and counts["rollups"] > 0
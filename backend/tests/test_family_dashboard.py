@@ -0,0 +1,107 @@
+"""
+Tests for the family dashboard:
+- Tasks, goals, SIPs and loans are fetched with one $in query per collection
+  and grouped under the right kid
+- Per-kid and family pending approvals count completed tasks and pending loans
+- Large families are paged by name with a keyset cursor; stats cover every kid
+"""
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+
+def signup(client, bearer, email):
+    token = client.post("/api/auth/signup", json={"full_name": "P", "email": email, "password": "pw"}).json()["token"]
+    return bearer(token)
+
+
+def add_kid(client, headers, name, balance=0):
+    return client.post("/api/kids", json={"name": name, "age": 9, "starting_balance": balance}, headers=headers).json()
+
+
+def completed_task(client, headers, kid, title):
+    task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": title, "reward_amount": 5}, headers=headers).json()
+    client.put(f"/api/tasks/{task['id']}/complete", headers=headers)
+    return task
+
+
+def loan(client, headers, kid, approve=False):
+    created = client.post("/api/loans/request", json={"kid_id": kid["id"], "amount": 20, "purpose": "Bike"}, headers=headers).json()
+    if approve:
+        client.post(f"/api/loans/{created['id']}/approve", headers=headers)
+    return created
+
+
+class TestGrouping:
+    """Batched reads grouped per kid"""
+
+    def test_01_items_land_on_their_kid(self, bearer, make_app):
+        """Each kid sees only their own items, other families see none of them"""
+        with TestClient(make_app()) as client:
+            parent = signup(client, bearer, "p@x.com")
+            ann, bob, cal = (add_kid(client, parent, name, balance) for name, balance in (("Ann", 10), ("Bob", 2.5), ("Cal", 0)))
+            done = completed_task(client, parent, ann, "Dishes")
+            client.post("/api/tasks", json={"kid_id": ann["id"], "title": "Open", "reward_amount": 1}, headers=parent)
+            pending = loan(client, parent, bob)
+            active = loan(client, parent, bob, approve=True)
+            client.post("/api/goals", json={"kid_id": cal["id"], "title": "Kite", "target_amount": 15}, headers=parent)
+            client.post("/api/sip", json={"kid_id": ann["id"], "amount": 1}, headers=parent)
+
+            other = signup(client, bearer, "q@x.com")
+            completed_task(client, other, add_kid(client, other, "Dan"), "Bins")
+            dashboard = client.get("/api/dashboard/family", headers=parent).json()
+
+        rows = {row["kid"]["name"]: row for row in dashboard["kids"]}
+        assert list(rows) == ["Ann", "Bob", "Cal"]
+        assert [t["id"] for t in rows["Ann"]["pending_tasks"]] == [done["id"]] and len(rows["Ann"]["active_sips"]) == 1
+        assert {l["id"]: l["status"] for l in rows["Bob"]["active_loans"]} == {pending["id"]: "pending", active["id"]: "active"}
+        assert [g["title"] for g in rows["Cal"]["active_goals"]] == ["Kite"] and rows["Cal"]["active_loans"] == []
+        assert [row["pending_approvals"] for row in rows.values()] == [1, 1, 0]
+        assert rows["Bob"]["wallet"]["balance"] == 22.5
+        assert dashboard["stats"] == {"kids_count": 3, "total_balance": 32.5, "pending_approvals": 2}
+
+    def test_02_one_query_per_collection(self, bearer, make_app, monkeypatch):
+        """The number of reads does not grow with the number of kids"""
+        with TestClient(make_app()) as client:
+            parent = signup(client, bearer, "p@x.com")
+            kids = [add_kid(client, parent, f"Kid {i}") for i in range(6)]
+            calls = {}
+            for name in ("wallets", "tasks", "goals", "sips", "loans"):
+                collection = server.db.collection(name)
+                find = collection.find
+
+                def counting(query, *args, _name=name, _find=find, **kwargs):
+                    calls.setdefault(_name, []).append(query)
+                    return _find(query, *args, **kwargs)
+                monkeypatch.setattr(collection, "find", counting)
+            client.get("/api/dashboard/family", headers=parent)
+
+        assert {name: len(queries) for name, queries in calls.items()} == dict.fromkeys(("wallets", "tasks", "goals", "sips", "loans"), 1)
+        assert all(sorted(queries[0]["kid_id"]["$in"]) == sorted(k["id"] for k in kids) for queries in calls.values())
+
+
+class TestPaging:
+    """Families larger than one page"""
+
+    def test_01_pages_cover_every_kid(self, bearer, make_app):
+        """Pages follow X-Next-Cursor without gaps or repeats; stats stay family-wide"""
+        with TestClient(make_app()) as client:
+            parent = signup(client, bearer, "p@x.com")
+            for name in ("Eve", "ann", "Dot", "Bob", "Cal"):
+                completed_task(client, parent, add_kid(client, parent, name, 1), "Chore")
+            pages, params = [], {"limit": 2}
+            while True:
+                response = client.get("/api/dashboard/family", params=params, headers=parent)
+                pages.append(response.json())
+                if "X-Next-Cursor" not in response.headers:
+                    break
+                params["cursor"] = response.headers["X-Next-Cursor"]
+            bad = client.get("/api/dashboard/family", params={"cursor": "%%%"}, headers=parent)
+
+        assert [[row["kid"]["name"] for row in page["kids"]] for page in pages] == [["ann", "Bob"], ["Cal", "Dot"], ["Eve"]]
+        assert all(page["stats"] == {"kids_count": 5, "total_balance": 5, "pending_approvals": 5} for page in pages)
+        assert bad.status_code == 400
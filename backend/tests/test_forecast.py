@@ -0,0 +1,85 @@
+"""
+Tests for goal forecasting:
+- Completion dates follow recent contribution velocity
+- Deadlines are flagged when the projected date falls after them
+- Forecasts are cached until a goal changes
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import forecast  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def goal(goal_id, target, saved, deadline=None, age_days=60):
+    created = (NOW - timedelta(days=age_days)).isoformat()
+    return {"id": goal_id, "title": goal_id, "target_amount": target, "saved_amount": saved, "deadline": deadline, "status": "active", "created_at": created}
+
+
+class TestProjection:
+    """Velocity and projected dates"""
+
+    def test_01_projects_from_velocity(self):
+        """A goal saving 2/day with 20 left lands in 10 days"""
+        goals = [goal("bike", 100, 80, deadline="2024-06-05"), goal("book", 30, 10, deadline="2024-12-31"), goal("idle", 50, 0)]
+        contributions = {"bike": {"amount": 120, "count": 12, "last_at": "2024-05-30"}, "book": {"amount": 10, "count": 1}}
+        bike, book, idle = forecast.project(goals, contributions, NOW, window_days=90)
+        assert bike["daily_rate"] == 2 and bike["projected_date"] == "2024-06-11"
+        assert bike["on_track"] is False and bike["required_daily_rate"] == 5
+        assert book["projected_date"] == "2024-09-29" and book["on_track"] is True
+        assert idle["projected_date"] is None and idle["on_track"] is None
+
+    def test_02_window_caps_old_goals(self):
+        """Goals older than the window divide by the window, not their age"""
+        [old] = forecast.project([goal("old", 100, 10, age_days=400)], {"old": {"amount": 90}}, NOW, window_days=90)
+        assert old["daily_rate"] == 1
+
+
+class TestForecastAPI:
+    """Endpoint and cache"""
+
+    def test_01_cached_until_next_contribution(self, monkeypatch, bearer, make_app):
+        """Repeat reads skip the aggregation; a contribution forces a recompute"""
+        app = make_app()
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "starting_balance": 100, "pin": "1234"}, headers=bearer(token)).json()
+            created = client.post("/api/goals", json={"kid_id": kid["id"], "title": "Bike", "target_amount": 50}, headers=bearer(token)).json()
+            calls = []
+            aggregate = server.db.transactions.aggregate
+            monkeypatch.setattr(server.db.transactions, "aggregate", lambda pipeline: calls.append(pipeline) or aggregate(pipeline))
+
+            first = client.get(f"/api/goals/{kid['id']}/forecast", headers=bearer(token)).json()
+            client.get(f"/api/goals/{kid['id']}/forecast", headers=bearer(token))
+            assert len(calls) == 1 and first[0]["daily_rate"] == 0
+            client.put(f"/api/goals/{created['id']}/contribute", json={"amount": 10}, headers=bearer(token))
+            after = client.get(f"/api/goals/{kid['id']}/forecast", headers=bearer(token)).json()
+            assert len(calls) == 2
+            assert after[0]["saved_amount"] == 10 and after[0]["daily_rate"] == 10 and after[0]["projected_date"]
+
+            server.goal_forecasts.invalidate(kid["id"])
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            assert client.get("/api/kid/goals/forecast", headers=bearer(kid_token)).json() == after
+            assert client.get("/api/goals/not-mine/forecast", headers=bearer(token)).status_code == 404
+
+    def test_02_stamp_catches_other_workers(self):
+        """A goal changed behind the cache's back is recomputed"""
+        db = MemoryRepository()
+        cache = forecast.ForecastCache()
+
+        async def scenario():
+            await db.goals.insert_one({**goal("g", 100, 0), "kid_id": "k"})
+            before = await cache.get(db, "k")
+            await db.goals.update_one({"id": "g"}, {"$set": {"saved_amount": 40}})
+            return before, await cache.get(db, "k")
+
+        before, after = asyncio.run(scenario())
+        assert before[0]["remaining"] == 100 and after[0]["remaining"] == 60
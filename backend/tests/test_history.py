@@ -0,0 +1,88 @@
+"""
+Tests for XP and credit-score history:
+- Each event appends to one kid-month bucket with a single upsert
+- Range queries only return events inside the window
+- Downsampling bounds the payload and keeps the last value of each bin
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import history  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+class TestRecording:
+    """Bucketed writes"""
+
+    def test_01_one_bucket_per_kid_month(self):
+        """An event's XP and credit changes share one push; a new month starts another bucket"""
+        db = MemoryRepository()
+
+        async def scenario():
+            await history.ensure_indexes(db)
+            jan = datetime(2024, 1, 31, 23, 0, tzinfo=timezone.utc)
+            await history.record(db, "k", [("xp", 25, 25), ("credit_score", 5, 505)], jan)
+            await history.record(db, "k", [("xp", 10, 35)], jan + timedelta(hours=2))
+            return await db.score_history.find({}, {"_id": 0}).sort("month", 1).to_list(None)
+
+        jan, feb = asyncio.run(scenario())
+        assert jan["month"] == "2024-01" and jan["count"] == 1
+        assert jan["xp"]["d"] == [25] and jan["credit_score"]["v"] == [505]
+        assert feb["month"] == "2024-02" and feb["xp"]["v"] == [35]
+
+    def test_02_api_records_changes(self, bearer, make_app):
+        """Completing a lesson and a task shows up in the kid's XP series"""
+        with TestClient(make_app()) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token)).json()
+            client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-1", "answers": [0, 1, 1]}, headers=bearer(token))
+            task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": "Dishes", "reward_amount": 5, "approval_required": False}, headers=bearer(token)).json()
+            client.put(f"/api/tasks/{task['id']}/complete", headers=bearer(token))
+            xp = client.get(f"/api/history/{kid['id']}", headers=bearer(token)).json()
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            credit = client.get("/api/kid/history?metric=credit_score", headers=bearer(kid_token)).json()
+            assert client.get("/api/history/not-mine", headers=bearer(token)).status_code == 404
+        assert [p["value"] for p in xp["points"]][0] == 25 and len(xp["points"]) >= 2
+        assert all(p["events"] == 1 for p in credit["points"])
+
+
+class TestRangeQueries:
+    """Reads and downsampling"""
+
+    def test_01_window_and_downsampling(self):
+        """Thousands of events come back as at most `points` bins"""
+        db = MemoryRepository()
+        start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        count = 5000
+
+        async def scenario():
+            xp = 0
+            for i in range(count):
+                xp += 5
+                await history.record(db, "k", [("xp", 5, xp)], start + timedelta(hours=2 * i))
+            started = time.perf_counter()
+            points = await history.series(db, "k", "xp", start, start + timedelta(days=365, seconds=-1), points=52)
+            elapsed = time.perf_counter() - started
+            window = await history.series(db, "k", "xp", start + timedelta(days=10), start + timedelta(days=11, seconds=-1), points=100)
+            return points, elapsed, window
+
+        points, elapsed, window = asyncio.run(scenario())
+        print(f"✓ {count} events -> {len(points)} points in {elapsed * 1000:.1f}ms")
+        assert len(points) <= 52
+        assert sum(p["events"] for p in points) == 365 * 12
+        assert points[-1]["value"] == 365 * 12 * 5
+        assert len(window) == 12 and all(p["t"].startswith("2023-01-11") for p in window)
+
+    def test_02_downsample_keeps_short_series(self):
+        """Series shorter than the point budget are returned as-is"""
+        events = [(0, 1, 1), (10, 2, 3)]
+        assert history.downsample(events, 0, 100, 10) == [
+            {"t": history.iso(0), "value": 1, "delta": 1, "events": 1},
+            {"t": history.iso(10), "value": 3, "delta": 2, "events": 1},
+        ]
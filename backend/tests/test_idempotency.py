@@ -0,0 +1,145 @@
+"""
+Tests for the Idempotency-Key layer:
+- LRU front cache eviction and expiry
+- First response is stored and replayed for duplicates
+- Key reuse with a different body is rejected
+- Server errors release the key so the client can retry
+- Keys follow the authenticated caller across access-token refreshes
+"""
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from idempotency import IdempotencyMiddleware, IdempotencyStore, LRUCache  # noqa: E402
+
+
+class KeyCollection:
+    """Minimal async stand-in for the idempotency_keys collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, query, update):
+        self.docs[query["_id"]].update(update["$set"])
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc and doc["state"] == query["state"]:
+            del self.docs[query["_id"]]
+
+
+def make_client():
+    app = FastAPI()
+    calls = {"pay": 0, "fail": 0}
+
+    @app.post("/api/sip/{sip_id}/pay")
+    async def pay(sip_id: str, body: dict = None):
+        calls["pay"] += 1
+        return {"sip_id": sip_id, "payments_made": calls["pay"]}
+
+    @app.post("/api/loans/{loan_id}/pay")
+    async def fail(loan_id: str):
+        calls["fail"] += 1
+        if calls["fail"] == 1:
+            raise HTTPException(status_code=503, detail="Try again")
+        return {"loan_id": loan_id}
+
+    collection = KeyCollection()
+    store = IdempotencyStore(lambda: collection)
+    app.add_middleware(IdempotencyMiddleware, store=store, paths=[r"^/api/sip/[^/]+/pay$", r"^/api/loans/[^/]+/pay$"])
+    return TestClient(app), calls, store
+
+
+class TestLRUCache:
+    """In-process front cache"""
+
+    def test_01_evicts_least_recently_used(self):
+        """Oldest untouched entry is evicted first"""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+
+    def test_02_entries_expire(self):
+        """Entries past their TTL are dropped"""
+        cache = LRUCache(ttl=-1)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestIdempotencyMiddleware:
+    """Replay behaviour for money-moving endpoints"""
+
+    def test_01_duplicate_is_replayed(self):
+        """Second request with the same key returns the stored response without re-running"""
+        client, calls, _ = make_client()
+        headers = {"Idempotency-Key": "k1", "Authorization": "Bearer parent"}
+        first = client.post("/api/sip/s1/pay", headers=headers, json={})
+        second = client.post("/api/sip/s1/pay", headers=headers, json={})
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert second.headers["idempotent-replayed"] == "true"
+        assert calls["pay"] == 1
+
+    def test_02_keys_are_scoped_to_caller(self):
+        """The same key from a different caller runs the handler again"""
+        client, calls, _ = make_client()
+        client.post("/api/sip/s1/pay", headers={"Idempotency-Key": "k1", "Authorization": "Bearer a"}, json={})
+        client.post("/api/sip/s1/pay", headers={"Idempotency-Key": "k1", "Authorization": "Bearer b"}, json={})
+        assert calls["pay"] == 2
+
+    def test_03_different_body_is_rejected(self):
+        """Reusing a key with another payload returns 422"""
+        client, calls, _ = make_client()
+        client.post("/api/sip/s1/pay", headers={"Idempotency-Key": "k1"}, json={"amount": 1})
+        response = client.post("/api/sip/s1/pay", headers={"Idempotency-Key": "k1"}, json={"amount": 2})
+        assert response.status_code == 422
+        assert calls["pay"] == 1
+
+    def test_04_server_error_releases_key(self):
+        """A 5xx response is not stored, so the retry runs the handler"""
+        client, calls, _ = make_client()
+        assert client.post("/api/loans/l1/pay", headers={"Idempotency-Key": "k1"}).status_code == 503
+        assert client.post("/api/loans/l1/pay", headers={"Idempotency-Key": "k1"}).status_code == 200
+        assert calls["fail"] == 2
+
+    def test_05_requests_without_key_pass_through(self):
+        """No header means no idempotency bookkeeping"""
+        client, calls, store = make_client()
+        client.post("/api/sip/s1/pay", json={})
+        client.post("/api/sip/s1/pay", json={})
+        assert calls["pay"] == 2
+        assert len(store.cache) == 0
+
+    def test_06_replay_survives_token_refresh(self, make_app):
+        """A retry with a refreshed access token replays instead of moving money twice"""
+        app = make_app()
+        with TestClient(app) as client:
+            session = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()
+            auth = {"Authorization": f"Bearer {session['token']}"}
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "starting_balance": 100}, headers=auth).json()
+            goal = client.post("/api/goals", json={"kid_id": kid["id"], "title": "Bike", "target_amount": 50}, headers=auth).json()
+            first = client.put(f"/api/goals/{goal['id']}/contribute", json={"amount": 10}, headers={**auth, "Idempotency-Key": "abc"})
+            refreshed = client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]}).json()["token"]
+            retry = client.put(f"/api/goals/{goal['id']}/contribute", json={"amount": 10}, headers={"Authorization": f"Bearer {refreshed}", "Idempotency-Key": "abc"})
+            wallet = client.get(f"/api/wallet/{kid['id']}", headers=auth).json()
+        assert refreshed != session["token"]
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert first.json()["saved_amount"] == retry.json()["saved_amount"] == 10
+        assert wallet["total_saved"] == 10
@@ -0,0 +1,78 @@
+"""
+Tests for kid listing on large accounts:
+- Keyset pages walk every kid once in name order
+- Filters and name prefix search combine with paging
+- Older kids get their name key from the backfill
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import onboarding  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+class TestKidListing:
+    """GET /kids paging and search"""
+
+    def test_01_classroom_pages(self, bearer, make_app):
+        """A 5,000-kid account pages through every kid exactly once"""
+        with TestClient(make_app()) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            rows = [{"name": f"Kid {i:04d}", "age": 6 + i % 6, "ui_theme": "girl" if i % 2 else "boy"} for i in range(5000)]
+            assert client.post("/api/kids/import", json=rows, headers=bearer(token)).status_code == 200
+
+            started = time.perf_counter()
+            first = client.get("/api/kids", params={"view": "summary", "limit": 500}, headers=bearer(token))
+            elapsed = time.perf_counter() - started
+            print(f"✓ first page of 500 in {elapsed * 1000:.0f}ms")
+            assert len(first.json()) == 500 and "name_lower" not in first.json()[0]
+            assert set(first.json()[0]) <= set(server.KID_SUMMARY)
+
+            names, cursor = [], None
+            while True:
+                params = {"view": "summary", "limit": 500, **({"cursor": cursor} if cursor else {})}
+                page = client.get("/api/kids", params=params, headers=bearer(token))
+                names += [kid["name"] for kid in page.json()]
+                cursor = page.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+        assert names == sorted(row["name"] for row in rows)
+
+    def test_02_filters_and_prefix(self, bearer, make_app):
+        """Age, theme and prefix filters narrow the page and still paginate"""
+        with TestClient(make_app()) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            for name, age in [("Anna", 9), ("annie", 7), ("Ben", 9), ("Andy", 9)]:
+                client.post("/api/kids", json={"name": name, "age": age, "pin": "1234"}, headers=bearer(token))
+            client.put(f"/api/kids/{client.get('/api/kids', params={'q': 'Ben'}, headers=bearer(token)).json()[0]['id']}", json={"name": "Anders"}, headers=bearer(token))
+
+            found = client.get("/api/kids", params={"q": "AN"}, headers=bearer(token)).json()
+            assert [kid["name"] for kid in found] == ["Anders", "Andy", "Anna", "annie"]
+            nine = client.get("/api/kids", params={"q": "an", "age": 9, "limit": 2}, headers=bearer(token))
+            assert [kid["name"] for kid in nine.json()] == ["Anders", "Andy"]
+            rest = client.get("/api/kids", params={"q": "an", "age": 9, "limit": 2, "cursor": nine.headers["X-Next-Cursor"]}, headers=bearer(token))
+            assert [kid["name"] for kid in rest.json()] == ["Anna"] and "X-Next-Cursor" not in rest.headers
+            assert client.get("/api/kids", params={"level": 2}, headers=bearer(token)).json() == []
+
+
+class TestBackfill:
+    """Name keys for kids created before listing used them"""
+
+    def test_01_backfill_names(self):
+        """Kids without a name key get the lowercase name"""
+        db = MemoryRepository()
+
+        async def scenario():
+            await db.kids.insert_many([{"id": "k1", "parent_id": "p", "name": "ZoE"}, {"id": "k2", "parent_id": "p", "name": "Al", "name_lower": "al"}])
+            report = await onboarding.backfill_names(db)
+            return report, await db.kids.find({}, {"_id": 0, "id": 1, "name_lower": 1}).sort("id", 1).to_list(None)
+
+        report, kids = asyncio.run(scenario())
+        assert report == {"updated": 1}
+        assert kids == [{"id": "k1", "name_lower": "zoe"}, {"id": "k2", "name_lower": "al"}]
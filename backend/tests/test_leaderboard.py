@@ -0,0 +1,93 @@
+"""
+Tests for leaderboards:
+- Family boards rank siblings with shared ranks for ties
+- The global board only lists opted-in kids and follows XP/credit changes without a reload
+- Rank lookups bisect the cached board instead of counting documents
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import leaderboard  # noqa: E402
+import server  # noqa: E402
+from memorydb import MemoryCollection  # noqa: E402
+
+
+def family(client, bearer, email, names):
+    token = client.post("/api/auth/signup", json={"full_name": "P", "email": email, "password": "pw"}).json()["token"]
+    kids = [client.post("/api/kids", json={"name": name, "age": 9, "pin": "1234"}, headers=bearer(token)).json() for name in names]
+    return bearer(token), kids
+
+
+class TestBoards:
+    """Family and global boards"""
+
+    def test_01_family_board(self, make_app, bearer):
+        """Siblings are ordered by XP, ties share a rank"""
+        with TestClient(make_app()) as client:
+            headers, (ann, bob, cal) = family(client, bearer, "p@x.com", ["Ann", "Bob", "Cal"])
+            client.post("/api/learning/complete", json={"kid_id": bob["id"], "story_id": "story-1", "answers": [0, 1, 1]}, headers=headers)
+            board = client.get("/api/leaderboard/family", headers=headers).json()
+            assert [(e["rank"], e["xp"]) for e in board] == [(1, 25), (2, 0), (2, 0)] and board[0]["name"] == "Bob"
+            rank = client.get(f"/api/leaderboard/rank/{cal['id']}?metric=level", headers=headers).json()
+        assert rank == {"metric": "level", "family_rank": 2, "family_size": 3, "global_rank": None, "global_size": 0}
+
+    def test_02_global_board_is_opt_in(self, monkeypatch, bearer, make_app):
+        """Opted-in kids from any family appear; XP changes reorder without a reload"""
+        with TestClient(make_app()) as client:
+            first, (ann, bob) = family(client, bearer, "a@x.com", ["Ann", "Bob"])
+            second, (cal,) = family(client, bearer, "b@x.com", ["Cal"])
+            client.put(f"/api/kids/{ann['id']}", json={"leaderboard_opt_in": True}, headers=first)
+            client.put(f"/api/kids/{cal['id']}", json={"leaderboard_opt_in": True}, headers=second)
+            assert sorted(e["name"] for e in client.get("/api/leaderboard/global", headers=first).json()) == ["Ann", "Cal"]
+
+            def forbidden(*args, **kwargs):
+                raise AssertionError("board reload")
+            client.post("/api/learning/complete", json={"kid_id": cal["id"], "story_id": "story-2", "answers": [1, 1, 2]}, headers=second)
+            monkeypatch.setattr(server.db.kids, "find", forbidden)
+            board = client.get("/api/leaderboard/global", headers=first).json()
+            assert [(e["rank"], e["name"], e["xp"]) for e in board] == [(1, "Cal", 25), (2, "Ann", 0)]
+            assert "id" not in board[0]
+            monkeypatch.undo()
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "a@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            rank = client.get("/api/kid/leaderboard/rank", headers=bearer(kid_token)).json()
+        assert rank["global_rank"] == 2 and rank["global_size"] == 2
+
+    def test_03_deleted_kids_leave_the_board(self, make_app, bearer):
+        """Deleting an opted-in kid removes its entry"""
+        with TestClient(make_app()) as client:
+            headers, (ann,) = family(client, bearer, "p@x.com", ["Ann"])
+            client.put(f"/api/kids/{ann['id']}", json={"leaderboard_opt_in": True}, headers=headers)
+            client.delete(f"/api/kids/{ann['id']}", headers=headers)
+            assert client.get("/api/leaderboard/global?metric=credit_score", headers=headers).json() == []
+
+
+class TestRankLookup:
+    """Sorted-list board"""
+
+    def test_01_rank_lookup_speed(self):
+        """Rank and top-N stay fast with many opted-in kids"""
+        kids = MemoryCollection("kids")
+        count = 20000
+
+        async def scenario():
+            for i in range(count):
+                await kids.insert_one({"id": f"k{i}", "name": f"Kid {i}", "xp": i % 997, "leaderboard_opt_in": True})
+            board = leaderboard.Leaderboard(lambda: kids, "xp")
+            await board.load()
+            started = time.perf_counter()
+            for i in range(1000):
+                await board.rank(f"k{i}")
+            elapsed = time.perf_counter() - started
+            board.update({"id": "k5", "name": "Kid 5", "xp": 5000, "leaderboard_opt_in": True})
+            return elapsed, await board.rank("k996"), await board.top(2)
+
+        elapsed, rank, top = asyncio.run(scenario())
+        print(f"✓ 1000 rank lookups over {count} kids: {elapsed * 1000:.1f}ms")
+        assert elapsed < 0.5
+        assert rank == 2
+        assert [(e["rank"], e["xp"]) for e in top] == [(1, 5000), (2, 996)] and top[0]["name"] == "Kid 5"
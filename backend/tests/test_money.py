@@ -0,0 +1,107 @@
+"""
+Tests for integer minor-unit money:
+- Request amounts are parsed half-up into paise and rendered back as rupees
+- Stored amounts are ints, so balances, EMIs and $sum totals are exact
+- migrate() converts legacy float documents once and leaves ints alone
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import money  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+class TestConversion:
+    """Boundary conversion"""
+
+    def test_01_to_minor(self):
+        """Decimal half-up rounding, not binary float rounding"""
+        assert money.to_minor(0.1) == 10 and money.to_minor("19.999") == 2000
+        assert money.to_minor(1.005) == 101 and money.to_minor(-2.675) == -268
+        assert money.to_minor(7) == 700 and money.to_minor(0) == 0
+        for bad in ("abc", float("nan"), float("inf"), True):
+            with pytest.raises(ValueError):
+                money.to_minor(bad)
+
+    def test_02_round_trip(self):
+        """Minor units render back as the rupee amount that was sent"""
+        assert [money.to_major(money.to_minor(v)) for v in (0.1, 0.3, 12.34, 99999.99)] == [0.1, 0.3, 12.34, 99999.99]
+        assert money.round_minor(845.5) == 846 and money.round_minor(845.49) == 845
+        assert money.to_major(None) is None
+
+
+class TestStoredAmounts:
+    """What the API writes"""
+
+    def test_01_exact_balances(self, monkeypatch, bearer, make_app):
+        """Ten-paise rewards add up exactly; the loan is paid down to exactly zero"""
+        backend = MemoryRepository()
+        monkeypatch.setattr(server, "open_repository", lambda settings: backend)
+        app = make_app()
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234", "starting_balance": 0.2}, headers=bearer(token)).json()
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            for i in range(10):
+                task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": f"T{i}", "reward_amount": 0.1, "approval_required": False}, headers=bearer(token)).json()
+                client.put(f"/api/kid/tasks/{task['id']}/complete", headers=bearer(kid_token))
+            assert client.post("/api/tasks", json={"kid_id": kid["id"], "title": "Bad", "reward_amount": "lots"}, headers=bearer(token)).status_code == 422
+
+            loan = client.post("/api/loans/request", json={"kid_id": kid["id"], "amount": 100, "purpose": "Bike", "duration_months": 6, "interest_rate": 5}, headers=bearer(token)).json()
+            client.post(f"/api/loans/{loan['id']}/approve", headers=bearer(token))
+            paid = [client.post(f"/api/kid/loans/{loan['id']}/pay", headers=bearer(kid_token)).json() for _ in range(loan["payments_made"], 6)]
+            wallet = client.get(f"/api/wallet/{kid['id']}", headers=bearer(token)).json()
+
+        assert loan["emi_amount"] == 16.91 and loan["principal"] == 100
+        assert [p["remaining_balance"] for p in paid] == [83.09, 66.18, 49.27, 32.36, 15.45, 0]
+        assert paid[-1]["status"] == "completed" and paid[-1]["last_payment_amount"] == 15.45
+        assert wallet["balance"] == 1.2 and wallet["total_earned"] == 101.2
+
+        stored = asyncio.run(backend.wallets.find_one({"kid_id": kid["id"]}))
+        amounts = asyncio.run(backend.transactions.find({"kid_id": kid["id"]}).to_list(None))
+        assert stored["balance"] == 120 and all(isinstance(t["amount"], int) for t in amounts)
+        [total] = asyncio.run(backend.transactions.aggregate([
+            {"$match": {"kid_id": kid["id"], "category": "task"}},
+            {"$group": {"_id": None, "earned": {"$sum": "$amount"}}},
+        ]).to_list(None))
+        print(f"✓ 10 x 0.1 rewards: {total['earned']} paise (float sum {sum([0.1] * 10)})")
+        assert total["earned"] == 100
+
+
+class TestMigration:
+    """Legacy float documents"""
+
+    def test_01_converts_once(self):
+        """Doubles become paise, ints and missing fields are left alone, re-runs are no-ops"""
+        db = MemoryRepository()
+
+        async def scenario():
+            await db.wallets.insert_many([
+                {"kid_id": "k1", "balance": 10.1, "total_earned": 20.3, "total_spent": 4.9, "total_saved": 5.3},
+                {"kid_id": "k2", "balance": 500, "total_earned": 500, "total_spent": 0, "total_saved": 0},
+            ])
+            await db.transactions.insert_many([{"id": str(i), "kid_id": "k1", "amount": 0.1} for i in range(3)])
+            await db.loans.insert_one({"id": "l1", "principal": 50.0, "emi_amount": 8.46, "remaining_balance": 50.0})
+            await db.transactions_archive.insert_one({
+                "kid_id": "k1", "month": "2023-05", "count": 2,
+                "entries": [{"id": "a", "amount": 2.5}, {"id": "b", "amount": 1.15}],
+                "totals": {"balance": 1.35, "total_earned": 2.5, "total_spent": 1.15, "total_saved": 0},
+            })
+            first = await money.migrate(db)
+            second = await money.migrate(db)
+            return first, second, await db.wallets.find({}, {"_id": 0}).to_list(None), await db.loans.find_one({}, {"_id": 0}), await db.transactions_archive.find_one({}, {"_id": 0})
+
+        first, second, wallets, loan, bucket = asyncio.run(scenario())
+        assert first == {"wallets": 1, "transactions": 3, "tasks": 0, "goals": 0, "sips": 0, "loans": 1, "rollups": 0, "transactions_archive": 1}
+        assert not any(second.values())
+        assert wallets[0] == {"kid_id": "k1", "balance": 1010, "total_earned": 2030, "total_spent": 490, "total_saved": 530}
+        assert wallets[1]["balance"] == 500
+        assert loan == {"id": "l1", "principal": 5000, "emi_amount": 846, "remaining_balance": 5000}
+        assert [e["amount"] for e in bucket["entries"]] == [250, 115]
+        assert bucket["totals"] == {"balance": 135, "total_earned": 250, "total_spent": 115, "total_saved": 0}
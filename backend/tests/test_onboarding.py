@@ -0,0 +1,123 @@
+"""
+Tests for bulk kid onboarding:
+- CSV and JSON imports create kids, wallets, starting balances and rollups
+- One bad row rejects the whole file and nothing is written
+- Ten thousand kids import in seconds with chunked inserts
+- The import-kids command validates avatars and seeds credit scores from
+  the rules file, like the API
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import orjson
+from fastapi.testclient import TestClient
+from typer.testing import CliRunner
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import cli  # noqa: E402
+import onboarding  # noqa: E402
+import rollups  # noqa: E402
+import rules  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+AVATARS = {a["id"] for a in server.AVATARS}
+
+CSV = b"""name,age,avatar,pin,starting_balance
+Ann,9,fox,1234,25
+Bob,7,,4321,
+"""
+
+
+def lines(response):
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+class TestImportAPI:
+    """Streaming import endpoint"""
+
+    def test_01_csv_import(self, bearer, make_app):
+        """Rows stream back as created with wallets, transactions and rollups"""
+        with TestClient(make_app()) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            response = client.post("/api/kids/import", content=CSV, headers={**bearer(token), "Content-Type": "text/csv"})
+            results = lines(response)
+            assert response.headers["content-type"] == "application/x-ndjson"
+            assert [r.get("status") for r in results[:-1]] == ["created", "created"]
+            assert results[-1] == {"summary": {"rows": 2, "created": 2, "errors": 0}}
+            ann = results[0]["kid_id"]
+            assert client.get(f"/api/wallet/{ann}", headers=bearer(token)).json()["balance"] == 25
+            assert client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "bob", "pin": "4321"}).status_code == 200
+            history = client.get(f"/api/wallet/{ann}/transactions", headers=bearer(token)).json()
+            trend = client.get(f"/api/analytics/{ann}", headers=bearer(token)).json()
+        assert [t["amount"] for t in history] == [25]
+        assert trend["by_category"] == [{"category": "initial", "earned": 25, "spent": 0, "count": 1}]
+
+    def test_02_invalid_rows_write_nothing(self, bearer, make_app):
+        """Errors are reported per row and the import is rejected as a whole"""
+        with TestClient(make_app()) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token))
+            rows = [{"name": "ANN", "age": 8}, {"name": "Cal", "age": "x"}, {"name": "Dee", "age": 6, "avatar": "dragon"}, {"name": "Eve", "age": 5, "parent_email": "other@x.com"}, {"name": "Fay", "age": 5}]
+            results = lines(client.post("/api/kids/import", json=rows, headers=bearer(token)))
+            assert [r.get("status") for r in results[:-1]] == ["error", "error", "error", "error", "skipped"]
+            assert "already used" in results[0]["errors"][0] and results[1]["errors"][0].startswith("age")
+            assert results[-1]["summary"]["created"] == 0
+            assert len(client.get("/api/kids", headers=bearer(token)).json()) == 1
+            assert client.post("/api/kids/import", content=b"[1, 2", headers={**bearer(token), "Content-Type": "application/json"}).status_code == 400
+
+
+class TestBulkWrites:
+    """Chunked writes for large files"""
+
+    def test_01_ten_thousand_kids(self):
+        """Many parents, resolved by email, and ten thousand kids in one import"""
+        db = MemoryRepository()
+        count = 10000
+
+        async def scenario():
+            await rollups.ensure_indexes(db)
+            await db.users.insert_many([{"id": f"p{i}", "email": f"school{i}@x.com"} for i in range(20)])
+            rows = [{"parent_email": f"School{i % 20}@x.com", "name": f"Kid {i}", "age": 8, "starting_balance": 10} for i in range(count)]
+            started = time.perf_counter()
+            results = [result async for result in onboarding.run_import(db, rows, AVATARS, 500)]
+            elapsed = time.perf_counter() - started
+            return results, elapsed, await db.kids.count_documents({"parent_id": "p3"}), await db.transactions.count_documents({})
+
+        results, elapsed, per_parent, txns = asyncio.run(scenario())
+        print(f"✓ imported {count} kids in {elapsed:.2f}s")
+        assert results[-1] == {"summary": {"rows": count, "created": count, "errors": 0}}
+        assert per_parent == count // 20 and txns == count
+        assert elapsed < 10
+
+
+class TestCommandLine:
+    """import-kids"""
+
+    def run(self, monkeypatch, tmp_path, rows):
+        db = MemoryRepository()
+        asyncio.run(db.users.insert_one({"id": "p1", "email": "p@x.com"}))
+        rulebook = json.loads(rules.DEFAULT_PATH.read_text())
+        rulebook["credit_score"]["initial"] = 650
+        (tmp_path / "rules.json").write_text(json.dumps(rulebook))
+        (tmp_path / "kids.json").write_text(json.dumps(rows))
+        monkeypatch.setenv("DB_BACKEND", "memory")
+        monkeypatch.setenv("RULES_PATH", str(tmp_path / "rules.json"))
+        monkeypatch.setattr(cli, "open_repository", lambda settings: db)
+        result = CliRunner().invoke(cli.app, ["import-kids", str(tmp_path / "kids.json")])
+        return result, asyncio.run(db.kids.find({}, {"_id": 0}).to_list(None))
+
+    def test_01_uses_rules_credit_score(self, monkeypatch, tmp_path):
+        """Imported kids start at the configured credit score"""
+        result, kids = self.run(monkeypatch, tmp_path, [{"parent_email": "p@x.com", "name": "Ann", "age": 9, "avatar": "owl"}])
+        assert result.exit_code == 0
+        assert [(k["name"], k["avatar"], k["credit_score"]) for k in kids] == [("Ann", "owl", 650)]
+
+    def test_02_rejects_unknown_avatars(self, monkeypatch, tmp_path):
+        """An avatar the app does not offer fails the file, as it does over HTTP"""
+        result, kids = self.run(monkeypatch, tmp_path, [{"parent_email": "p@x.com", "name": "Ann", "age": 9, "avatar": "dog"}])
+        assert result.exit_code == 1 and kids == []
+        assert "unknown avatar 'dog'" in result.output
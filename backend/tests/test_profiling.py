@@ -0,0 +1,102 @@
+"""
+Tests for on-demand request profiling:
+- Only requests with the right secret are profiled
+- Profiles split CPU from time awaiting the database and are fetchable
+- Sampled stacks come back in collapsed (flamegraph) format
+- Without a secret nothing is installed
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import profiling  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+SECRET = "profile-secret"
+
+
+def kid_session(client, bearer):
+    token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+    kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234", "starting_balance": 10}, headers=bearer(token)).json()
+    kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+    return token, kid, kid_token
+
+
+class TestProfileAccounting:
+    """Merging database waits"""
+
+    def test_01_overlapping_calls_merge(self):
+        """Gathered queries count once toward mongo time; each call is listed"""
+        profile = profiling.Profile("GET", "/x", "sample")
+        profile.operations = [("kids.find_one", 0.0, 0.010), ("wallets.find_one", 0.005, 0.012), ("tasks.find.to_list", 0.020, 0.025)]
+        summary = profile.summary(200, wall=0.030, cpu=0.004)
+        assert summary["mongo_ms"] == 17.0 and summary["other_wait_ms"] == 9.0
+        assert [op["name"] for op in summary["operations"]][0] == "kids.find_one"
+
+    def test_02_timed_cursor_chain(self):
+        """Sort/limit chains stay timed through to_list"""
+        db = profiling.ProfiledRepository(MemoryRepository())
+        profile = profiling.Profile("GET", "/x", "sample")
+
+        async def scenario():
+            await db.tasks.insert_many([{"id": str(i)} for i in range(3)])
+            token = profiling._active.set(profile)
+            try:
+                rows = await db.tasks.find({}, {"_id": 0}).sort("id", -1).limit(2).to_list(None)
+                count = await db.tasks.count_documents({})
+            finally:
+                profiling._active.reset(token)
+            return rows, count
+
+        rows, count = asyncio.run(scenario())
+        assert rows == [{"id": "2"}, {"id": "1"}] and count == 3
+        assert [name for name, _, _ in profile.operations] == ["tasks.find.to_list", "tasks.count_documents"]
+
+
+class TestProfilingAPI:
+    """Profiled requests end to end"""
+
+    def test_01_sampled_request(self, tmp_path, bearer, make_app):
+        """The secret header yields Server-Timing, an id and a stored collapsed profile"""
+        with TestClient(make_app(profiling_secret=SECRET, profile_dir=str(tmp_path))) as client:
+            _, _, kid_token = kid_session(client, bearer)
+            plain = client.get("/api/kid/achievements", headers=bearer(kid_token))
+            wrong = client.get("/api/kid/achievements", headers={**bearer(kid_token), "X-Profile": "guess"})
+            assert "x-profile-id" not in plain.headers and "x-profile-id" not in wrong.headers
+
+            response = client.get("/api/kid/achievements", headers={**bearer(kid_token), "X-Profile": SECRET})
+            assert response.status_code == 200 and response.json()["stats"]["tasks_completed"] == 0
+            assert response.headers["server-timing"].startswith("cpu;dur=")
+            profile_id = response.headers["x-profile-id"]
+
+            assert client.get(f"/api/admin/profiles/{profile_id}").status_code == 404
+            profile = client.get(f"/api/admin/profiles/{profile_id}", headers={"X-Profile": SECRET}).json()
+            raw = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "raw"}, headers={"X-Profile": SECRET}).text
+        print(f"✓ wall {profile['wall_ms']}ms, cpu {profile['cpu_ms']}ms, mongo {profile['mongo_ms']}ms over {profile['mongo_calls']} calls")
+        assert profile["path"] == "/api/kid/achievements" and profile["mode"] == "sample"
+        assert profile["mongo_calls"] >= 6 and 0 < profile["mongo_ms"] <= profile["wall_ms"]
+        assert {op["name"] for op in profile["operations"]} >= {"tasks.count_documents", "kids.find_one"}
+        assert raw == profile["profile"]
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in raw.splitlines())
+        assert (tmp_path / f"{profile_id}.json").exists() and (tmp_path / f"{profile_id}.folded").exists()
+
+    def test_02_cprofile_mode(self, bearer, make_app):
+        """cProfile output names the handler"""
+        with TestClient(make_app(profiling_secret=SECRET)) as client:
+            token, kid, _ = kid_session(client, bearer)
+            response = client.get(f"/api/dashboard/kid/{kid['id']}", headers={**bearer(token), "X-Profile": SECRET, "X-Profile-Mode": "cprofile"})
+            profile = client.get(f"/api/admin/profiles/{response.headers['x-profile-id']}", headers={"X-Profile": SECRET}).json()
+        assert profile["mode"] == "cprofile" and "build_dashboard" in profile["profile"]
+
+    def test_03_disabled_without_secret(self, bearer, make_app):
+        """No secret: no middleware, no wrapped repository, no admin route"""
+        with TestClient(make_app()) as client:
+            token, kid, _ = kid_session(client, bearer)
+            response = client.get(f"/api/dashboard/kid/{kid['id']}", headers={**bearer(token), "X-Profile": ""})
+            assert "x-profile-id" not in response.headers
+            assert not isinstance(server.db, profiling.ProfiledRepository)
+            assert client.get("/api/admin/profiles/abc", headers={"X-Profile": ""}).status_code == 404
@@ -0,0 +1,121 @@
+"""
+Response-size metrics for projection-trimmed reads:
+- Dashboard payload with full documents vs summary projections
+- Kid list never carries the plaintext PIN
+- Summary list views only ship the projected fields
+"""
+import sys
+import uuid
+from pathlib import Path
+from typing import List
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+
+
+def project(doc, projection):
+    """Apply a Mongo-style projection to a plain dict"""
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(fields.values()):
+        return {k: v for k, v in doc.items() if fields.get(k)}
+    return {k: v for k, v in doc.items() if k not in fields and k != "_id"}
+
+
+def encoded_size(model, payload, exclude_unset=True):
+    adapter = TypeAdapter(model)
+    value = adapter.validate_python(payload)
+    return len(ORJSONResponse(adapter.dump_python(value, mode="json", exclude_unset=exclude_unset)).body)
+
+
+KID = {
+    "_id": "oid", "id": str(uuid.uuid4()), "parent_id": str(uuid.uuid4()), "name": "Ann", "age": 9,
+    "avatar": "panda", "grade": "4", "ui_theme": "girl", "pin": "1234", "level": 3, "xp": 320,
+    "credit_score": 640, "created_at": "2024-01-01T00:00:00+00:00",
+}
+WALLET = {"_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "balance": 12050, "total_earned": 30000, "total_spent": 8000, "total_saved": 9950}
+TASKS = [{
+    "_id": "oid", "id": str(uuid.uuid4()), "parent_id": KID["parent_id"], "kid_id": KID["id"], "title": f"Chore {i}",
+    "description": "Tidy the room, fold the laundry, water the plants and feed the cat before dinner. " * 3,
+    "reward_amount": 1000, "penalty_amount": 200, "frequency": "weekly", "approval_required": True,
+    "status": "pending", "created_at": "2024-06-01T10:00:00+00:00",
+} for i in range(20)]
+TXNS = [{
+    "_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "type": "credit", "amount": 1000,
+    "description": f"Task approved: Chore {i}", "category": "task", "reference_id": str(uuid.uuid4()),
+    "created_at": "2024-06-01T10:00:00+00:00",
+} for i in range(10)]
+GOALS = [{
+    "_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "parent_id": KID["parent_id"], "title": "Bike",
+    "target_amount": 15000, "saved_amount": 4000, "deadline": None, "status": "active", "created_at": "2024-05-01T00:00:00+00:00",
+} for _ in range(3)]
+SIPS = [{
+    "_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "parent_id": KID["parent_id"], "amount": 500,
+    "interest_rate": 8.0, "frequency": "monthly", "total_invested": 3000, "current_value": 3071, "payments_made": 6,
+    "status": "active", "created_at": "2024-01-01T00:00:00+00:00",
+} for _ in range(2)]
+LOANS = [{
+    "_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "parent_id": KID["parent_id"], "principal": 5000,
+    "interest_rate": 5.0, "duration_months": 6, "emi_amount": 846, "remaining_balance": 3308, "payments_made": 2,
+    "purpose": "New headphones for music class", "status": "active", "created_at": "2024-03-01T00:00:00+00:00",
+}]
+LEARNING = [{"_id": "oid", "id": str(uuid.uuid4()), "kid_id": KID["id"], "story_id": f"story-{i}", "score": 3, "completed_at": "2024-02-01T00:00:00+00:00"} for i in range(1, 6)]
+
+
+def dashboard(kid_p, wallet_p, task_p, txn_p, goal_p, sip_p, loan_p, learning_p):
+    level_info = server.get_level_for_xp(KID["xp"])
+    return {
+        "kid": project(KID, kid_p),
+        "wallet": project(WALLET, wallet_p),
+        "level_info": level_info,
+        "next_level": server.get_next_level(level_info["level"]),
+        "active_tasks": [project(t, task_p) for t in TASKS],
+        "recent_transactions": [project(t, txn_p) for t in TXNS],
+        "active_goals": [project(g, goal_p) for g in GOALS],
+        "active_sips": [project(s, sip_p) for s in SIPS],
+        "active_loans": [project(l, loan_p) for l in LOANS],
+        "learning_progress": [project(l, learning_p) for l in LEARNING],
+        "stats": {"total_tasks_completed": 12, "total_stories_read": 5, "active_goals_count": 3, "active_sips_count": 2},
+    }
+
+
+class TestDashboardPayloadSize:
+    """Dashboard response size before/after summary projections"""
+
+    def test_01_summary_dashboard_is_smaller(self):
+        """Summary projections shrink the dashboard payload"""
+        full = dashboard(*([server.NO_ID] * 8))
+        summary = dashboard(server.KID_SUMMARY, server.WALLET_SUMMARY, server.TASK_SUMMARY, server.TXN_SUMMARY,
+                            server.GOAL_SUMMARY, server.SIP_SUMMARY, server.LOAN_SUMMARY, server.LEARNING_SUMMARY)
+        before = encoded_size(server.DashboardOut, full)
+        after = encoded_size(server.DashboardOut, summary)
+        print(f"✓ dashboard payload: {before} bytes full, {after} bytes summary ({100 * (before - after) / before:.0f}% smaller)")
+        assert after < before * 0.6
+
+    def test_02_summary_dashboard_has_no_secrets(self):
+        """Summary kid document carries no PIN or parent id"""
+        kid = project(KID, server.KID_SUMMARY)
+        assert "pin" not in kid and "parent_id" not in kid
+
+
+class TestListViews:
+    """List endpoint projections"""
+
+    def test_01_kid_list_hides_pin(self):
+        """Full kid list view drops the PIN"""
+        kids = [project(KID, server.pick_projection("full", server.KID_PUBLIC, server.KID_SUMMARY))]
+        payload = TypeAdapter(List[server.KidOut]).dump_python(TypeAdapter(List[server.KidOut]).validate_python(kids), exclude_unset=True)
+        assert "pin" not in payload[0]
+        assert payload[0]["name"] == "Ann"
+
+    def test_02_summary_transaction_list_is_smaller(self):
+        """Summary transaction list only ships projected fields"""
+        before = encoded_size(List[server.TransactionOut], [project(t, server.NO_ID) for t in TXNS])
+        summary = [project(t, server.pick_projection("summary", server.NO_ID, server.TXN_SUMMARY)) for t in TXNS]
+        after = encoded_size(List[server.TransactionOut], summary)
+        print(f"✓ transaction list: {before} bytes full, {after} bytes summary")
+        assert after < before
+        assert "reference_id" not in TypeAdapter(List[server.TransactionOut]).dump_python(
+            TypeAdapter(List[server.TransactionOut]).validate_python(summary), exclude_unset=True)[0]
@@ -0,0 +1,112 @@
+"""
+Tests for server-side quiz grading:
+- Submitted answers are graded against the precompiled answer key
+- Malformed submissions are rejected before anything is written
+- Per-question counters feed the hardest-questions report without reading progress
+"""
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import quiz  # noqa: E402
+import server  # noqa: E402
+
+
+def start(client, bearer):
+    session = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()
+    kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(session["token"])).json()
+    return bearer(session["token"]), kid
+
+
+class TestGrading:
+    """Answer key and grading"""
+
+    def test_01_answer_key_matches_stories(self):
+        """Every story compiles to one (correct, options) entry per question"""
+        for story in server.STORIES:
+            key = server.ANSWER_KEY[story["id"]]
+            assert [q.correct for q in key] == [q["correct"] for q in story["questions"]]
+            assert quiz.grade(key, [q.correct for q in key]) == (True,) * len(key)
+
+    def test_02_graded_completion(self, make_app, bearer):
+        """The server computes the score and stores per-question results"""
+        with TestClient(make_app()) as client:
+            headers, kid = start(client, bearer)
+            response = client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-1", "answers": [0, 0, 1]}, headers=headers).json()
+            assert response["score"] == 2 and response["results"] == [True, False, True]
+            assert response["xp_earned"] == 25
+            retry = client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-1", "answers": [0, 1, 1]}, headers=headers).json()
+            assert retry["already_completed"] and retry["score"] == 3
+            progress = client.get(f"/api/learning/progress/{kid['id']}", headers=headers).json()
+        assert progress[0]["score"] == 3 and progress[0]["attempts"] == 2
+        assert progress[0]["answers"] == [0, 1, 1] and progress[0]["results"] == [True, True, True]
+        print(f"✓ graded: {response['results']} then {retry['results']}")
+
+    def test_03_rejects_malformed_answers(self, make_app, bearer):
+        """Wrong answer counts, out-of-range options and unknown stories fail cleanly"""
+        with TestClient(make_app()) as client:
+            headers, kid = start(client, bearer)
+            submit = lambda body: client.post("/api/learning/complete", json={"kid_id": kid["id"], **body}, headers=headers)
+            assert submit({"story_id": "story-1", "answers": [0, 1]}).status_code == 400
+            assert submit({"story_id": "story-1", "answers": [0, 1, 9]}).status_code == 400
+            assert submit({"story_id": "story-1"}).status_code == 422
+            assert submit({"story_id": "story-99", "answers": [0, 1, 1]}).status_code == 404
+            assert client.post("/api/learning/complete", json={"kid_id": "not-mine", "story_id": "story-1", "answers": [0, 1, 1]}, headers=headers).status_code == 404
+            assert client.get(f"/api/learning/progress/{kid['id']}", headers=headers).json() == []
+            assert client.get("/api/learning/analytics/questions", headers=headers).json() == []
+
+    def test_04_reported_score_is_ignored(self, make_app, bearer):
+        """A client-reported score without answers is rejected and nothing is stored"""
+        with TestClient(make_app()) as client:
+            headers, kid = start(client, bearer)
+            response = client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-2", "score": 3}, headers=headers)
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            kid_response = client.post("/api/kid/learning/complete", json={"story_id": "story-2", "score": 3}, headers=bearer(kid_token))
+            progress = client.get(f"/api/learning/progress/{kid['id']}", headers=headers).json()
+            after = client.get(f"/api/kids/{kid['id']}", headers=headers).json()
+        assert response.status_code == kid_response.status_code == 422 and progress == []
+        assert after["xp"] == 0
+
+
+    def test_05_losing_a_first_completion_race(self, make_app, bearer, monkeypatch):
+        """When a concurrent submission creates the progress document first, this one is still graded and stored"""
+        with TestClient(make_app()) as client:
+            headers, kid = start(client, bearer)
+            progress = server.db.learning_progress
+            upsert = progress.find_one_and_update
+
+            async def raced(query, update, **kwargs):
+                if kwargs.get("upsert"):
+                    await upsert(query, {"$setOnInsert": {"id": "winner", "completed_at": "2024-01-01T00:00:00"}, "$set": {"score": 1}, "$inc": {"attempts": 1}}, upsert=True)
+                    raise DuplicateKeyError("E11000 duplicate key")
+                return await upsert(query, update, **kwargs)
+            monkeypatch.setattr(progress, "find_one_and_update", raced)
+            response = client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-1", "answers": [0, 1, 1]}, headers=headers).json()
+            stored = client.get(f"/api/learning/progress/{kid['id']}", headers=headers).json()
+            stats = client.get("/api/learning/analytics/questions", headers=headers).json()
+        assert response["already_completed"] and response["score"] == 3
+        assert [(p["id"], p["score"], p["answers"], p["attempts"]) for p in stored] == [("winner", 3, [0, 1, 1], 2)]
+        assert all(row["attempts"] == 1 for row in stats)
+
+
+class TestAnalytics:
+    """Hardest questions"""
+
+    def test_01_hardest_first(self, monkeypatch, bearer, make_app):
+        """Counters from parent and kid submissions rank questions by correct rate"""
+        with TestClient(make_app()) as client:
+            headers, kid = start(client, bearer)
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            client.post("/api/learning/complete", json={"kid_id": kid["id"], "story_id": "story-4", "answers": [1, 0, 1]}, headers=headers)
+            client.post("/api/kid/learning/complete", json={"story_id": "story-4", "answers": [1, 3, 1]}, headers=bearer(kid_token))
+
+            def forbidden(*args, **kwargs):
+                raise AssertionError("progress scan")
+            monkeypatch.setattr(server.db.learning_progress, "find", forbidden)
+            rows = client.get("/api/learning/analytics/questions?limit=2", headers=headers).json()
+        assert [(r["story_id"], r["question_index"]) for r in rows] == [("story-4", 1), ("story-4", 0)]
+        assert rows[0]["correct"] == 0 and rows[0]["attempts"] == 2 and rows[0]["choice_counts"] == [1, 0, 0, 1]
+        assert rows[1]["correct_rate"] == 1.0
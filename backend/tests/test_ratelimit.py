@@ -0,0 +1,150 @@
+"""
+Tests for token-bucket rate limiting:
+- Buckets allow a burst, then report how long until the next token
+- The local store stays bounded and sweeps idle buckets
+- The shared store enforces the same budget through a collection
+- Kid PIN guessing is throttled with a Retry-After header
+- Regex-like kid names neither match other kids nor open new buckets
+- PIN budgets are per family and address, under a looser cap per family
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from memorydb import MemoryCollection  # noqa: E402
+from ratelimit import LocalBuckets, SharedBuckets  # noqa: E402
+from server import KID_FAMILY_PIN_LIMIT  # noqa: E402
+
+
+def from_address(app):
+    """Serve app with the client address taken from an X-Test-IP header."""
+    async def asgi(scope, receive, send):
+        if scope["type"] == "http":
+            scope = {**scope, "client": (dict(scope["headers"]).get(b"x-test-ip", b"10.0.0.1").decode(), 50000)}
+        await app(scope, receive, send)
+    return asgi
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def spend(store, key, times, rate=0.5, burst=3):
+    return [await store.take(key, rate, burst) for _ in range(times)]
+
+
+class TestLocalBuckets:
+    """In-process buckets"""
+
+    def test_01_burst_then_wait(self):
+        """Three requests pass, the fourth waits for one token at 0.5/s"""
+        clock = Clock()
+        store = LocalBuckets(clock=clock)
+        assert asyncio.run(spend(store, "k", 4)) == [0, 0, 0, 2.0]
+        clock.now += 2
+        assert asyncio.run(spend(store, "k", 2)) == [0, 2.0]
+
+    def test_02_keys_are_independent_and_bounded(self):
+        """The least recently used bucket is dropped past max_keys"""
+        store = LocalBuckets(max_keys=2, clock=Clock())
+        asyncio.run(spend(store, "a", 3))
+        asyncio.run(spend(store, "b", 1))
+        asyncio.run(spend(store, "c", 1))
+        assert len(store) == 2
+        assert asyncio.run(spend(store, "a", 1)) == [0]
+
+    def test_03_sweep_drops_full_buckets(self):
+        """Refilled buckets carry no state and are swept; partial ones stay"""
+        clock = Clock()
+        store = LocalBuckets(clock=clock)
+        asyncio.run(spend(store, "idle", 1))
+        clock.now += 1.5
+        asyncio.run(spend(store, "busy", 3))
+        clock.now += 1
+        store.sweep()
+        assert len(store) == 1
+
+
+class TestSharedBuckets:
+    """Collection-backed buckets"""
+
+    def test_01_same_budget_across_workers(self):
+        """Two stores on one collection draw from the same bucket"""
+        clock = Clock()
+        collection = MemoryCollection("rate_limits")
+        first = SharedBuckets(lambda: collection, clock=clock)
+        second = SharedBuckets(lambda: collection, clock=clock)
+
+        async def scenario():
+            return await spend(first, "k", 2) + await spend(second, "k", 2)
+
+        assert asyncio.run(scenario()) == [0, 0, 0, 2.0]
+
+
+class TestKidLoginThrottle:
+    """PIN brute-force protection"""
+
+    def test_01_pin_guesses_are_limited(self, make_app):
+        """After ten wrong PINs the account answers 429 with Retry-After"""
+        app = make_app(rate_limit_enabled=True)
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers={"Authorization": f"Bearer {token}"})
+            statuses = [
+                client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "ann", "pin": f"{pin:04d}"}).status_code
+                for pin in range(11)
+            ]
+            blocked = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "ann", "pin": "1234"})
+        assert statuses[:10] == [401] * 10 and statuses[10] == 429
+        assert blocked.status_code == 429
+        assert int(blocked.headers["retry-after"]) >= 1
+
+    def test_02_name_variants_share_the_budget(self, make_app):
+        """Pattern names are matched literally and count against the family's budget from that address"""
+        app = make_app(rate_limit_enabled=True)
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers={"Authorization": f"Bearer {token}"})
+            wildcard = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": ".*", "pin": "1234"})
+            names = ["A.*", ".*(?:)", "ANN", "a.n"] * 3
+            statuses = [
+                client.post("/api/auth/kid-login", json={"parent_email": "P@x.com", "kid_name": name, "pin": "0000"}).status_code
+                for name in names
+            ]
+        assert wildcard.status_code == 401
+        assert statuses[:9] == [401] * 9 and set(statuses[9:]) == {429}
+
+    def test_03_other_addresses_can_still_log_in(self, make_app):
+        """Guessing from one address throttles that address, not the whole family"""
+        app = make_app(rate_limit_enabled=True)
+
+        with TestClient(from_address(app)) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers={"Authorization": f"Bearer {token}"})
+            guesses = [
+                client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": f"{pin:04d}"}).status_code
+                for pin in range(11)
+            ]
+            blocked = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"})
+            other = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}, headers={"X-Test-IP": "10.0.0.2"})
+        assert guesses[10] == 429 and blocked.status_code == 429
+        assert other.status_code == 200 and other.json()["kid"]["name"] == "Ann"
+
+    def test_04_family_cap_across_addresses(self, make_app):
+        """Spreading guesses over many addresses still runs into the looser per-family budget"""
+        app = make_app(rate_limit_enabled=True)
+
+        with TestClient(from_address(app)) as client:
+            client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"})
+            statuses = [
+                client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "0000"}, headers={"X-Test-IP": f"10.1.0.{i}"}).status_code
+                for i in range(KID_FAMILY_PIN_LIMIT.burst + 1)
+            ]
+        assert set(statuses[:-1]) == {401} and statuses[-1] == 429
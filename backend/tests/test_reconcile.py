@@ -0,0 +1,140 @@
+"""
+Tests for the ledger reconciliation engine:
+- kid_id ranges partition the uuid keyspace without gaps or overlaps
+- Shards split the ranges between processes
+- Drift detection is exact on minor units
+- Against MongoDB (MONGO_TEST_URL), the report finds seeded drift and the
+  guarded repair fixes it without overwriting a wallet that moved meanwhile
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from reconcile import diff_wallet, kid_id_ranges, range_filter, reconcile, repair  # noqa: E402
+
+
+def in_range(kid_id, lo, hi):
+    return (lo is None or kid_id >= lo) and (hi is None or kid_id < hi)
+
+
+class TestKidIdRanges:
+    """Keyspace chunking"""
+
+    def test_01_every_kid_lands_in_exactly_one_range(self):
+        """Random uuid4 ids match one range each"""
+        ranges = kid_id_ranges(16)
+        assert len(ranges) == 16
+        for _ in range(2000):
+            kid_id = str(uuid.uuid4())
+            assert sum(in_range(kid_id, lo, hi) for lo, hi in ranges) == 1
+
+    def test_02_open_ended_edges(self):
+        """First and last ranges are unbounded so odd ids are still covered"""
+        ranges = kid_id_ranges(4)
+        assert ranges[0][0] is None and ranges[-1][1] is None
+        assert range_filter(None, None) == {}
+        assert range_filter("40", "80") == {"kid_id": {"$gte": "40", "$lt": "80"}}
+
+    def test_03_shards_cover_all_ranges(self):
+        """Shards i/n together select every range once"""
+        ranges = kid_id_ranges(10)
+        sharded = [r for shard in range(3) for r in ranges[shard::3]]
+        assert sorted(sharded, key=str) == sorted(ranges, key=str)
+
+
+class TestDiffWallet:
+    """Mismatch detection"""
+
+    def test_01_matching_wallet_has_no_diff(self):
+        """Equal minor-unit totals match; a single paisa is drift"""
+        row = {"kid_id": "k", "balance": 1010, "total_earned": 2000, "total_spent": 490, "total_saved": 500,
+               "ledger": {"balance": 1010, "total_earned": 2000, "total_spent": 490, "total_saved": 500, "transactions": 4}}
+        assert diff_wallet(row) == {}
+        assert diff_wallet({**row, "balance": 1011}) == {"balance": {"wallet": 1011, "ledger": 1010}}
+
+    def test_02_drift_is_reported_per_field(self):
+        """Only drifted fields are returned, with both values"""
+        row = {"kid_id": "k", "balance": 1500, "total_earned": 2000, "total_spent": 0, "total_saved": 500,
+               "ledger": {"balance": 1000, "total_earned": 2000, "total_spent": 0, "total_saved": 1000, "transactions": 3}}
+        assert diff_wallet(row) == {
+            "balance": {"wallet": 1500, "ledger": 1000},
+            "total_saved": {"wallet": 500, "ledger": 1000},
+        }
+
+
+def txn(kid_id, type, amount, category):
+    return {"id": str(uuid.uuid4()), "kid_id": kid_id, "type": type, "amount": amount, "category": category}
+
+
+class RacingWallets:
+    """db.wallets whose guarded update loses a race with a concurrent credit to one kid"""
+
+    def __init__(self, wallets, kid_id):
+        self.wallets = wallets
+        self.kid_id = kid_id
+
+    def aggregate(self, pipeline):
+        return self.wallets.aggregate(pipeline)
+
+    async def update_one(self, query, update):
+        if query["kid_id"] == self.kid_id:
+            await self.wallets.update_one({"kid_id": self.kid_id}, {"$inc": {"balance": 100, "total_earned": 100}})
+        return await self.wallets.update_one(query, update)
+
+
+@pytest.mark.skipif(not os.environ.get("MONGO_TEST_URL"), reason="set MONGO_TEST_URL to a MongoDB 5.0+ server")
+class TestAgainstMongo:
+    """ledger_pipeline, reconcile_range and repair on a real server"""
+
+    def test_01_report_and_guarded_repair(self):
+        """Drift is reported, repaired, and a wallet changed mid-repair is skipped"""
+        from motor.motor_asyncio import AsyncIOMotorClient
+        name = f"kidsmoney_reconcile_{uuid.uuid4().hex[:8]}"
+        clean, drifted, racing, archived = (str(uuid.uuid4()) for _ in range(4))
+
+        async def scenario():
+            client = AsyncIOMotorClient(os.environ["MONGO_TEST_URL"])
+            db = client[name]
+            try:
+                await db.transactions.create_index("kid_id")
+                await db.transactions_archive.create_index("kid_id")
+                await db.transactions.insert_many([
+                    txn(clean, "credit", 1000, "task"), txn(clean, "debit", 300, "goal"),
+                    txn(drifted, "credit", 2000, "task"), txn(drifted, "debit", 500, "purchase"),
+                    txn(drifted, "debit", 300, "goal"), txn(drifted, "credit", 200, "goal_refund"),
+                    txn(racing, "credit", 700, "task"),
+                    txn(archived, "credit", 100, "task"),
+                ])
+                await db.transactions_archive.insert_one({"kid_id": archived, "month": "2024-01", "count": 2, "entries": [],
+                                                          "totals": {"balance": 400, "total_earned": 500, "total_spent": 100, "total_saved": 0}})
+                await db.wallets.insert_many([
+                    {"kid_id": clean, "balance": 700, "total_earned": 1000, "total_spent": 0, "total_saved": 300},
+                    {"kid_id": drifted, "balance": 1500, "total_earned": 2000, "total_spent": 500, "total_saved": 0},
+                    {"kid_id": racing, "balance": 0, "total_earned": 0, "total_spent": 0, "total_saved": 0},
+                    {"kid_id": archived, "balance": 500, "total_earned": 600, "total_spent": 100, "total_saved": 0},
+                ])
+                report = await reconcile(db, chunks=4, parallel=2)
+                fixed = await repair(SimpleNamespace(wallets=RacingWallets(db.wallets, racing)), report["mismatches"])
+                after = await reconcile(db, chunks=4)
+                wallets = {w["kid_id"]: w for w in await db.wallets.find({}, {"_id": 0}).to_list(None)}
+                return report, fixed, after, wallets
+            finally:
+                await client.drop_database(name)
+                client.close()
+
+        report, fixed, after, wallets = asyncio.run(scenario())
+        assert report["kids_checked"] == 4 and report["transactions_scanned"] == 10
+        assert {m["kid_id"]: m["fields"] for m in report["mismatches"]} == {
+            drifted: {"balance": {"wallet": 1500, "ledger": 1400}, "total_saved": {"wallet": 0, "ledger": 100}},
+            racing: {"balance": {"wallet": 0, "ledger": 700}, "total_earned": {"wallet": 0, "ledger": 700}},
+        }
+        assert fixed == {"repaired": 1, "skipped": 1}
+        assert wallets[drifted] == {"kid_id": drifted, "balance": 1400, "total_earned": 2000, "total_spent": 500, "total_saved": 100}
+        assert wallets[racing]["balance"] == 100 and wallets[racing]["total_earned"] == 100
+        assert [m["kid_id"] for m in after["mismatches"]] == [racing]
@@ -0,0 +1,154 @@
+"""
+Tests for the repository layer and the in-memory backend:
+- Filters used by the handlers ($or keysets, case-insensitive $regex, $in, dotted array paths)
+- Operator and pipeline updates, upserts and find_one_and_update return modes
+- Unique indexes raise DuplicateKeyError like MongoDB
+- The full API runs in-process on the memory backend
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+from memorydb import MemoryCollection  # noqa: E402
+from repository import MemoryRepository, open_repository  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def seeded():
+    tasks = MemoryCollection("tasks")
+    await tasks.create_index([("parent_id", 1), ("status", 1)])
+    for i, status in enumerate(["pending", "completed", "completed", "approved"]):
+        await tasks.insert_one({"id": f"t{i}", "parent_id": "p1", "status": status, "title": f"Task {i}", "created_at": f"2024-01-0{i + 1}"})
+    return tasks
+
+
+class TestMemoryQueries:
+    """Filter semantics"""
+
+    def test_01_keyset_or_filter(self):
+        """The approvals cursor filter pages by (created_at, id) descending"""
+        async def scenario():
+            tasks = await seeded()
+            page = {"$or": [{"created_at": {"$lt": "2024-01-03"}}, {"created_at": "2024-01-03", "id": {"$lt": "t2"}}]}
+            return await tasks.find({"parent_id": "p1", "status": "completed", **page}, {"_id": 0, "id": 1}).sort([("created_at", -1), ("id", -1)]).to_list(None)
+        assert run(scenario()) == [{"id": "t1"}]
+
+    def test_02_regex_and_in(self):
+        """Kid login matches names case-insensitively; $in uses the hash index"""
+        async def scenario():
+            tasks = await seeded()
+            by_title = await tasks.find_one({"title": {"$regex": "^task 3$", "$options": "i"}}, {"_id": 0, "id": 1})
+            by_status = await tasks.count_documents({"parent_id": {"$in": ["p1", "p2"]}, "status": {"$in": ["pending", "approved"]}})
+            return by_title, by_status
+        assert run(scenario()) == ({"id": "t3"}, 2)
+
+    def test_03_dotted_paths_into_arrays(self):
+        """'entries.id' matches any element, as used by the archive guard"""
+        async def scenario():
+            archive = MemoryCollection("transactions_archive")
+            await archive.insert_one({"kid_id": "k", "entries": [{"id": "a"}, {"id": "b"}]})
+            return (
+                await archive.count_documents({"entries.id": "b"}),
+                await archive.count_documents({"entries.id": {"$nin": ["b", "c"]}}),
+                await archive.count_documents({"missing": None}),
+            )
+        assert run(scenario()) == (1, 0, 1)
+
+
+class TestMemoryUpdates:
+    """Write semantics"""
+
+    def test_01_pipeline_update(self):
+        """Pipeline stages see the output of earlier stages"""
+        async def scenario():
+            goals = MemoryCollection("goals")
+            await goals.insert_one({"id": "g", "saved_amount": 25, "target_amount": 30, "status": "active"})
+            return await goals.find_one_and_update(
+                {"id": "g", "status": "active"},
+                server.goal_saved_pipeline(5),
+                projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+            )
+        assert run(scenario()) == {"id": "g", "saved_amount": 30, "target_amount": 30, "status": "completed"}
+
+    def test_02_upsert_returns_none_before_insert(self):
+        """$setOnInsert only applies when the upsert creates the document"""
+        async def scenario():
+            progress = MemoryCollection("learning_progress")
+            update = {"$max": {"score": 2}, "$setOnInsert": {"id": "p"}}
+            first = await progress.find_one_and_update({"kid_id": "k", "story_id": "s"}, update, upsert=True)
+            update = {"$max": {"score": 1}, "$setOnInsert": {"id": "other"}}
+            second = await progress.find_one_and_update({"kid_id": "k", "story_id": "s"}, update, projection={"_id": 0}, upsert=True)
+            return first, second
+        assert run(scenario()) == (None, {"kid_id": "k", "story_id": "s", "score": 2, "id": "p"})
+
+    def test_03_unique_indexes(self):
+        """Unique keys and _id collisions raise DuplicateKeyError"""
+        async def scenario():
+            users = MemoryCollection("users")
+            await users.create_index("email", unique=True)
+            await users.insert_one({"_id": "u1", "email": "a@x.com"})
+            with pytest.raises(DuplicateKeyError):
+                await users.insert_one({"email": "a@x.com"})
+            with pytest.raises(DuplicateKeyError):
+                await users.insert_one({"_id": "u1", "email": "b@x.com"})
+            await users.insert_one({"email": "b@x.com"})
+            with pytest.raises(DuplicateKeyError):
+                await users.update_one({"email": "b@x.com"}, {"$set": {"email": "a@x.com"}})
+            return await users.count_documents({})
+        assert run(scenario()) == 2
+
+    def test_04_unordered_bulk_write_collects_errors(self):
+        """Every request runs; duplicate keys are reported as code 11000"""
+        async def scenario():
+            rollups = MemoryCollection("rollups")
+            await rollups.create_index([("kid_id", 1), ("period", 1)], unique=True)
+            await rollups.insert_one({"kid_id": "k", "period": "2024-01", "n": 1})
+            with pytest.raises(BulkWriteError) as raised:
+                await rollups.bulk_write([
+                    UpdateOne({"kid_id": "k", "period": "2024-01", "n": 5}, {"$inc": {"n": 1}}, upsert=True),
+                    UpdateOne({"kid_id": "k", "period": "2024-02"}, {"$inc": {"n": 1}}, upsert=True),
+                ], ordered=False)
+            return raised.value.details, await rollups.count_documents({})
+        details, total = run(scenario())
+        assert [e["code"] for e in details["writeErrors"]] == [11000]
+        assert details["nUpserted"] == 1 and total == 2
+
+
+class TestInProcessAPI:
+    """The API on the memory backend"""
+
+    def test_01_backend_selection(self):
+        """DB_BACKEND=memory needs no connection settings"""
+        assert isinstance(open_repository(Settings(backend="memory")), MemoryRepository)
+
+    def test_02_requests_per_second(self, make_app):
+        """Parent flow works end to end and serves reads quickly"""
+        app = make_app(rate_limit_enabled=True)
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "starting_balance": 100, "pin": "1234"}, headers=headers).json()
+            task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": "Dishes", "reward_amount": 10}, headers=headers).json()
+            assert client.put(f"/api/tasks/{task['id']}/complete", headers=headers).status_code == 200
+            assert client.put(f"/api/tasks/{task['id']}/approve", headers=headers).status_code == 200
+            assert client.get(f"/api/wallet/{kid['id']}", headers=headers).json()["balance"] == 110
+
+            requests = 300
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.get(f"/api/dashboard/kid/{kid['id']}", headers=headers)
+            rate = requests / (time.perf_counter() - started)
+        print(f"✓ in-process dashboard reads: {rate:.0f} req/s")
+        assert rate > 100
@@ -0,0 +1,47 @@
+"""
+Tests for transaction rollups:
+- ISO week and month period keys sort chronologically
+- Trend windows start the right number of periods back
+- add_transaction emits one upserted $inc per granularity
+"""
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rollups import first_period, period_key, rollup_updates  # noqa: E402
+
+
+class TestPeriodKeys:
+    """Bucket keys"""
+
+    def test_01_week_and_month_keys(self):
+        """ISO week keys are zero padded and use the ISO year"""
+        assert period_key("week", datetime(2024, 3, 5, tzinfo=timezone.utc)) == "2024-W10"
+        assert period_key("week", datetime(2021, 1, 2, tzinfo=timezone.utc)) == "2020-W53"
+        assert period_key("month", datetime(2024, 3, 5, tzinfo=timezone.utc)) == "2024-03"
+
+    def test_02_keys_sort_chronologically(self):
+        """String order matches time order so $gte range scans work"""
+        assert period_key("week", datetime(2024, 2, 1)) < period_key("week", datetime(2024, 11, 1))
+        assert period_key("month", datetime(2023, 12, 1)) < period_key("month", datetime(2024, 1, 1))
+
+    def test_03_first_period(self):
+        """Window start counts the current period as the first one"""
+        now = datetime(2024, 3, 15, tzinfo=timezone.utc)
+        assert first_period("month", 1, now) == "2024-03"
+        assert first_period("month", 3, now) == "2024-01"
+        assert first_period("month", 4, now) == "2023-12"
+        assert first_period("week", 2, now) == "2024-W10"
+
+
+class TestRollupUpdates:
+    """Incremental maintenance from add_transaction"""
+
+    def test_01_one_upsert_per_granularity(self):
+        """A debit increments spent and count in the week and month buckets"""
+        txn = {"kid_id": "k1", "type": "debit", "amount": 750, "category": "sip", "created_at": "2024-03-05T10:00:00+00:00"}
+        updates = rollup_updates(txn)
+        filters = [u._filter for u in updates]
+        assert {f["period"] for f in filters} == {"2024-W10", "2024-03"}
+        assert all(u._doc == {"$inc": {"spent": 750, "count": 1}} and u._upsert for u in updates)
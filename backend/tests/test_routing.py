@@ -0,0 +1,205 @@
+"""
+Tests for read-preference routing:
+- Configured GET routes use the secondary view, everything else the primary
+- Each caller's next session resumes from their last operation time
+- Views are dropped once the request ends
+- Session views pass the session to every call and serialize all of them
+- Against a real replica set (REPLICA_SET_URL), a kid reads their own writes
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import routing  # noqa: E402
+import server  # noqa: E402
+from repository import MemoryRepository, Repository, SessionView  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+class FakeSession:
+    clock = 0
+
+    def __init__(self):
+        self.cluster_time = None
+        self.operation_time = None
+        self.resumed_from = None
+        self.ended = False
+
+    def advance_cluster_time(self, cluster_time):
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time):
+        self.resumed_from = operation_time
+        self.operation_time = operation_time
+
+    def tick(self):
+        FakeSession.clock += 1
+        self.operation_time = FakeSession.clock
+        self.cluster_time = {"clusterTime": FakeSession.clock}
+
+    async def end_session(self):
+        self.ended = True
+
+
+class FakeView(Repository):
+    def __init__(self, base, session, secondary):
+        self.base = base
+        self.session = session
+        self.secondary = secondary
+        self.active = True
+
+    def collection(self, name):
+        self.session.tick()
+        return self.base.collection(name)
+
+
+class ReplicaSetStandIn(MemoryRepository):
+    """Memory backend that records the sessions and views the middleware asks for."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    async def start_session(self):
+        return FakeSession()
+
+    def view(self, session, secondary=False):
+        view = FakeView(self, session, secondary)
+        self.requests.append(view)
+        return view
+
+
+class TestReadRouter:
+    """Route matching and per-caller clocks"""
+
+    def test_01_matching(self):
+        """Only reads on configured routes go to secondaries"""
+        router = routing.ReadRouter([server.READ_ROUTES["wallet"], server.READ_ROUTES["dashboards"]])
+        assert router.reads_from_secondary("GET", "/api/wallet/k1")
+        assert router.reads_from_secondary("GET", "/api/kid/dashboard")
+        assert not router.reads_from_secondary("GET", "/api/wallet/k1/transactions")
+        assert not router.reads_from_secondary("POST", "/api/kid/dashboard")
+
+    def test_02_clock_only_moves_forward(self):
+        """Older operation times never replace newer ones and the map is bounded"""
+        router = routing.ReadRouter([], max_principals=2)
+        newer, older = FakeSession(), FakeSession()
+        newer.operation_time, newer.cluster_time = 5, {"clusterTime": 5}
+        older.operation_time, older.cluster_time = 3, {"clusterTime": 3}
+        router.remember("kid", newer)
+        router.remember("kid", older)
+        fresh = FakeSession()
+        router.resume("kid", fresh)
+        assert (fresh.resumed_from, fresh.cluster_time) == (5, {"clusterTime": 5})
+        router.remember("a", newer)
+        router.remember("b", newer)
+        assert len(router) == 2 and fresh.resumed_from == 5
+
+
+class TestSessionView:
+    """Collections bound to a session"""
+
+    def test_01_every_call_is_serialized(self):
+        """Reads, cursor fetches and writes all get the session and never overlap"""
+        calls, running = [], []
+
+        async def exclusive(name, session):
+            running.append(name)
+            assert len(running) == 1
+            await asyncio.sleep(0.01)
+            running.pop()
+            calls.append((name, session))
+
+        class Cursor:
+            def __init__(self, session):
+                self.session = session
+
+            def sort(self, *args):
+                return self
+
+            async def to_list(self, length):
+                await exclusive("to_list", self.session)
+                return []
+
+        class Collection:
+            def find(self, query, session=None):
+                return Cursor(session)
+
+            async def find_one(self, query, session=None):
+                await exclusive("find_one", session)
+
+            async def insert_one(self, doc, session=None):
+                await exclusive("insert_one", session)
+
+        async def scenario():
+            view = SessionView({"tasks": Collection()}, "s1")
+            await asyncio.gather(
+                view.tasks.find({}).sort("id").to_list(None),
+                view.tasks.find_one({}),
+                *(view.tasks.insert_one({"n": n}) for n in range(3)),
+            )
+
+        asyncio.run(scenario())
+        assert sorted(calls) == [("find_one", "s1")] + [("insert_one", "s1")] * 3 + [("to_list", "s1")]
+
+
+class TestMiddleware:
+    """Sessions and views per request"""
+
+    def test_01_routes_and_resumes(self, monkeypatch, bearer, make_app):
+        """Dashboard polls read from the secondary view after the write that preceded them"""
+        backend = ReplicaSetStandIn()
+        monkeypatch.setattr(server, "open_repository", lambda settings: backend)
+        app = make_app(secondary_read_routes=["dashboards", "tasks"])
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token)).json()
+            task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": "Dishes", "reward_amount": 5}, headers=bearer(token)).json()
+            kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+            client.put(f"/api/kid/tasks/{task['id']}/complete", headers=bearer(kid_token))
+            completed_at = backend.requests[-1].session.operation_time
+            dashboard = client.get("/api/kid/dashboard", headers=bearer(kid_token)).json()
+            assert isinstance(server.db, routing.RoutedRepository) and server.db.collection("kids") is backend.kids
+
+        complete, poll = backend.requests[-2:]
+        assert [t["status"] for t in dashboard["active_tasks"]] == ["completed"]
+        assert (complete.secondary, poll.secondary) == (False, True)
+        assert poll.session.resumed_from == completed_at
+        assert all(view.session.ended and not view.active for view in backend.requests)
+        assert len(backend.requests) == 4
+
+    def test_02_unknown_route_name(self, make_app):
+        """Misconfigured route names fail at startup"""
+        with pytest.raises(ValueError, match="walet"):
+            make_app(secondary_read_routes=["walet"])
+
+
+@pytest.mark.skipif(not os.environ.get("REPLICA_SET_URL"), reason="set REPLICA_SET_URL to a local three-member replica set")
+class TestReplicaSet:
+    """Causal reads from real secondaries"""
+
+    def test_01_read_your_writes(self, bearer):
+        """Every poll right after a completion sees that completion"""
+        name = f"kidsmoney_routing_{uuid.uuid4().hex[:8]}"
+        settings = Settings(backend="motor", mongo_url=os.environ["REPLICA_SET_URL"], db_name=name, jwt_secret="routing-test-secret-0123456789abcdef",
+                            rate_limit_enabled=False, secondary_read_routes=["all"])
+        app = server.create_app(settings)
+        try:
+            with TestClient(app) as client:
+                token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+                kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token)).json()
+                kid_token = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"]
+                for i in range(20):
+                    task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": f"Task {i}", "reward_amount": 1}, headers=bearer(token)).json()
+                    client.put(f"/api/kid/tasks/{task['id']}/complete", headers=bearer(kid_token))
+                    tasks = client.get("/api/kid/tasks", headers=bearer(kid_token)).json()
+                    assert {t["id"]: t["status"] for t in tasks}[task["id"]] == "completed"
+        finally:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            asyncio.run(AsyncIOMotorClient(settings.mongo_url).drop_database(name))
@@ -0,0 +1,73 @@
+"""
+Tests for the gamification rules engine:
+- Level lookups bisect the thresholds and agree with the database $switch
+- Event awards apply XP and credit in one kid update
+- Badges come from the precomputed stats
+- Editing the rules file takes effect without a restart
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import rules  # noqa: E402
+from memorydb import evaluate  # noqa: E402
+
+DATA = json.loads(rules.DEFAULT_PATH.read_text())
+
+
+class TestCompiledRules:
+    """Lookup structures"""
+
+    def test_01_level_lookup(self):
+        """Bisect lookups match a linear scan and the update expression at every boundary"""
+        compiled = rules.Rules(DATA)
+        for xp in [0, 1, 99, 100, 101, 249, 250, 4000, 7499, 7500, 10 ** 6]:
+            linear = [lvl for lvl in DATA["levels"] if xp >= lvl["xp_required"]][-1]
+            assert compiled.level_for_xp(xp) == linear
+            assert evaluate(compiled.level_expr, {"xp": xp}) == linear["level"]
+        assert compiled.next_level(10) is None and compiled.next_level(1)["name"] == "Smart Saver"
+
+    def test_02_badges_from_stats(self):
+        """Thresholds per stat and level badges come back in rule order"""
+        compiled = rules.Rules(DATA)
+        stats = {"tasks_completed": 12, "stories_read": 1, "credit_score": 650}
+        names = [badge["name"] for badge in compiled.badges(stats, level=2)]
+        assert names == ["First Task", "Task Pro", "Bookworm", "Level 1: Money Beginner", "Level 2: Smart Saver"]
+        assert compiled.award("task_rejected") == rules.Award(xp=0, credit=-10)
+        assert compiled.award("unknown") == rules.Award()
+
+
+class TestAwards:
+    """Rules applied by the API"""
+
+    def test_01_hot_reload(self, tmp_path, bearer, make_app):
+        """Changing the rules file changes the next award without restarting"""
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps(DATA))
+        app = make_app(rules_path=str(path), rules_reload_seconds=0)
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token)).json()
+
+            def approve(title):
+                task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": title, "reward_amount": 1, "approval_required": False}, headers=bearer(token)).json()
+                client.put(f"/api/tasks/{task['id']}/complete", headers=bearer(token))
+                return client.get(f"/api/kids/{kid['id']}", headers=bearer(token)).json()
+
+            first = approve("One")
+            assert (first["xp"], first["credit_score"]) == (10, 510)
+            path.write_text(json.dumps({**DATA, "events": {**DATA["events"], "task_approved": {"xp": 100, "credit": 1}}}))
+            os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 5))
+            second = approve("Two")
+            assert (second["xp"], second["level"], second["credit_score"]) == (110, 2, 511)
+
+            path.write_text("{not json")
+            os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+            assert client.get("/api/config/levels").json()[1]["name"] == "Smart Saver"
+            achievements = client.get("/api/kid/achievements", headers=bearer(client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()["token"])).json()
+        assert [b["name"] for b in achievements["badges"]] == ["First Task", "Level 1: Money Beginner", "Level 2: Smart Saver"]
+        assert achievements["stats"]["tasks_completed"] == 2
@@ -0,0 +1,97 @@
+"""
+Tests for response serialization:
+- 200-row transaction list through jsonable_encoder + json (old path)
+- Same list through the precompiled TransactionOut model + ORJSONResponse (new path)
+- Stored amounts are integer paise; the new path renders them as rupees
+- Routes answer through ORJSONResponse by default
+- The speedup benchmark runs only with RUN_BENCHMARKS set, so timing noise
+  on a loaded machine cannot fail the suite
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from money import SCALE  # noqa: E402
+from server import TransactionOut  # noqa: E402
+
+ROWS = [
+    {
+        "id": str(uuid.uuid4()),
+        "kid_id": "kid-1",
+        "type": "credit" if i % 2 else "debit",
+        "amount": i * 125,
+        "description": f"Task reward: chore #{i}",
+        "category": "task",
+        "reference_id": str(uuid.uuid4()),
+        "created_at": "2024-06-01T10:00:00.000000+00:00",
+    }
+    for i in range(200)
+]
+ROUNDS = 200
+
+TRANSACTIONS = TypeAdapter(List[TransactionOut])
+
+
+def encode_legacy(rows):
+    return json.dumps(jsonable_encoder(rows)).encode("utf-8")
+
+
+def encode_fast(rows):
+    value = TRANSACTIONS.validate_python(rows)
+    return ORJSONResponse(TRANSACTIONS.dump_python(value, mode="json")).body
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            fn(ROWS)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class TestTransactionListSerialization:
+    """Encoding 200-row transaction lists"""
+
+    def test_01_payloads_match(self):
+        """Fast path produces the legacy JSON document with paise rendered as rupees"""
+        legacy = [{**row, "amount": row["amount"] / SCALE} for row in json.loads(encode_legacy(ROWS))]
+        assert orjson.loads(encode_fast(ROWS)) == legacy
+        assert legacy[5]["amount"] == 6.25
+
+    def test_02_routes_use_orjson(self, bearer, make_app):
+        """List routes answer through ORJSONResponse with amounts in rupees"""
+        app = make_app()
+        assert app.router.default_response_class is ORJSONResponse
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "starting_balance": 12.5}, headers=bearer(token)).json()
+            listed = client.get(f"/api/wallet/{kid['id']}/transactions", headers=bearer(token))
+        assert listed.headers["content-type"] == "application/json"
+        assert [t["amount"] for t in listed.json()] == [12.5]
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to time the serializers")
+class TestSerializationBenchmark:
+    """Wall-clock comparison"""
+
+    def test_01_fast_path_is_faster(self):
+        """Precompiled model + orjson beats jsonable_encoder by a wide margin"""
+        legacy = best_of(encode_legacy)
+        fast = best_of(encode_fast)
+        speedup = legacy / fast
+        print(f"✓ legacy {legacy * 1000 / ROUNDS:.3f} ms/list, fast {fast * 1000 / ROUNDS:.3f} ms/list, {speedup:.1f}x")
+        assert speedup > 2, f"Expected at least 2x speedup, got {speedup:.2f}x"
@@ -0,0 +1,143 @@
+"""
+Tests for the app factory and startup path:
+- Importing server opens no connections and stays within the import budget
+- Pool, compression and timeout settings are read from the environment
+- The lifespan builds the client from settings, warms the pool and closes it
+- create_app leaves earlier apps alone; only one app runs per process
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+os.environ.setdefault("DB_NAME", "kids_money_test")
+import repository  # noqa: E402
+import server  # noqa: E402
+from settings import Settings  # noqa: E402
+
+IMPORT_BUDGET_SECONDS = 1.5
+STARTUP_BUDGET_SECONDS = 0.25
+
+MEASURE_IMPORT = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+
+
+class FakeCollection:
+    async def create_index(self, *args, **kwargs):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.pings = 0
+
+    def __getattr__(self, name):
+        return FakeCollection()
+
+    def __getitem__(self, name):
+        return FakeCollection()
+
+    async def command(self, name):
+        self.pings += 1
+
+
+class FakeClient:
+    def __init__(self, url, **options):
+        self.url = url
+        self.options = options
+        self.database = FakeDatabase()
+        self.closed = False
+
+    def __getitem__(self, name):
+        return self.database
+
+    def close(self):
+        self.closed = True
+
+
+class TestAppState:
+    """Several apps in one process"""
+
+    def test_01_apps_keep_their_own_state(self):
+        """A later create_app does not change an earlier app, and two apps cannot run at once"""
+        first = server.create_app(Settings(backend="memory", jwt_secret="a" * 32, rate_limit_max_keys=10))
+        second = server.create_app(Settings(backend="memory", jwt_secret="b" * 32, rate_limit_max_keys=20))
+        assert first.state.settings.jwt_secret == "a" * 32 and first.state.rulebook is not second.state.rulebook
+
+        async def cycle():
+            async with server.lifespan(first):
+                assert server.settings is first.state.settings and server.rate_limit_store is first.state.rate_limit_store
+                with pytest.raises(RuntimeError, match="already running"):
+                    async with server.lifespan(second):
+                        pass
+                assert server.settings is first.state.settings
+            async with server.lifespan(second):
+                assert server.settings is second.state.settings and server.leaderboards is second.state.leaderboards
+
+        asyncio.run(cycle())
+        assert server.active_app is None
+
+
+class TestImportBudget:
+    """Import-time cost"""
+
+    def test_01_import_is_fast_and_offline(self):
+        """An unreachable MONGO_URL does not slow down or break the import"""
+        env = {**os.environ, "MONGO_URL": "mongodb://127.0.0.1:1", "DB_NAME": "kids_money_test"}
+        samples = []
+        for _ in range(3):
+            result = subprocess.run([sys.executable, "-c", MEASURE_IMPORT], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+            samples.append(float(result.stdout.strip().splitlines()[-1]))
+        best = min(samples)
+        print(f"✓ import server: {best * 1000:.0f}ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f}ms)")
+        assert best < IMPORT_BUDGET_SECONDS
+
+
+class TestSettings:
+    """Environment parsing"""
+
+    def test_01_pool_settings_from_env(self, monkeypatch):
+        """Pool size, compressors and timeouts map onto client options"""
+        monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+        monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+        monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+        monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "10000")
+        options = Settings.from_env().client_options()
+        assert options["maxPoolSize"] == 50 and options["minPoolSize"] == 5
+        assert options["compressors"] == "zstd,zlib"
+        assert options["socketTimeoutMS"] == 10000
+
+    def test_02_defaults(self):
+        """Compression stays off unless configured"""
+        options = Settings(mongo_url="mongodb://db", db_name="x").client_options()
+        assert "compressors" not in options
+        assert options["maxPoolSize"] == 100 and options["socketTimeoutMS"] is None
+
+
+class TestLifespan:
+    """Client lifecycle"""
+
+    def test_01_startup_warms_pool_within_budget(self, monkeypatch):
+        """The client is created at startup with the configured options and closed at shutdown"""
+        monkeypatch.setattr(repository, "AsyncIOMotorClient", FakeClient)
+        started = time.perf_counter()
+        app = server.create_app(Settings(mongo_url="mongodb://db", db_name="x", min_pool_size=4, max_pool_size=8))
+
+        async def cycle():
+            async with server.lifespan(app):
+                elapsed = time.perf_counter() - started
+                client = server.db.client
+                assert client.options["maxPoolSize"] == 8
+                assert client.database.pings == 4
+            return client, elapsed
+
+        client, elapsed = asyncio.run(cycle())
+        print(f"✓ create_app + startup: {elapsed * 1000:.1f}ms")
+        assert client.closed
+        assert elapsed < STARTUP_BUDGET_SECONDS
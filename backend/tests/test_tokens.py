@@ -0,0 +1,117 @@
+"""
+Tests for short-lived access tokens:
+- Parent and kid requests authorize from token claims without a principal lookup
+- Refresh tokens rotate, and replaying an old one ends the session
+- Logout and kid deletion revoke outstanding access tokens
+- Revocations written by one worker reach another on its next sync
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import jwt
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import server  # noqa: E402
+import tokens  # noqa: E402
+from memorydb import MemoryCollection  # noqa: E402
+
+SECRET = "token-test-secret-0123456789abcdef"
+
+
+def start(client, bearer):
+    session = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()
+    kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(session["token"])).json()
+    return session, kid
+
+
+class TestClaims:
+    """Authorization from claims"""
+
+    def test_01_no_principal_lookup(self, monkeypatch, bearer, make_app):
+        """Parent routes for owned kids skip the users and kids lookups"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            _, kid = start(client, bearer)
+            login = client.post("/api/auth/login", json={"email": "p@x.com", "password": "pw"}).json()
+            claims = jwt.decode(login["token"], SECRET, algorithms=["HS256"])
+            assert claims["typ"] == "access" and claims["kid_ids"] == [kid["id"]]
+            assert login["expires_in"] == 900
+
+            async def forbidden(*args, **kwargs):
+                raise AssertionError("principal lookup")
+            monkeypatch.setattr(server.db.users, "find_one", forbidden)
+            monkeypatch.setattr(server.db.kids, "count_documents", forbidden)
+            response = client.get(f"/api/wallet/{kid['id']}", headers=bearer(login["token"]))
+        assert response.status_code == 200
+
+    def test_02_new_kid_falls_back_to_database(self, bearer, make_app):
+        """A kid created after the token was issued is still reachable"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            session, _ = start(client, bearer)
+            other = client.post("/api/kids", json={"name": "Bob", "age": 7, "pin": "4321"}, headers=bearer(session["token"])).json()
+            assert client.get(f"/api/wallet/{other['id']}", headers=bearer(session["token"])).status_code == 200
+            assert client.get("/api/wallet/not-mine", headers=bearer(session["token"])).status_code == 404
+
+    def test_03_legacy_tokens_still_work(self, bearer, make_app):
+        """Tokens issued before access/refresh split keep the lookup path"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            session, _ = start(client, bearer)
+            user_id = session["user"]["id"]
+            legacy = jwt.encode({"user_id": user_id, "role": "parent", "exp": datetime.now(timezone.utc) + timedelta(days=7)}, SECRET, algorithm="HS256")
+            assert client.get("/api/kids", headers=bearer(legacy)).status_code == 200
+
+
+class TestSessions:
+    """Refresh and revocation"""
+
+    def test_01_refresh_rotates(self, bearer, make_app):
+        """Each refresh returns a new pair; replaying the old one ends the session"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            session, _ = start(client, bearer)
+            first = client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+            assert first.status_code == 200
+            replay = client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+            assert replay.status_code == 401
+            assert client.get("/api/kids", headers=bearer(first.json()["token"])).status_code == 401
+            assert client.post("/api/auth/refresh", json={"refresh_token": first.json()["refresh_token"]}).status_code == 401
+
+    def test_02_access_token_is_not_a_refresh_token(self, bearer, make_app):
+        """Token types are not interchangeable"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            session, _ = start(client, bearer)
+            assert client.post("/api/auth/refresh", json={"refresh_token": session["token"]}).status_code == 401
+            assert client.get("/api/kids", headers=bearer(session["refresh_token"])).status_code == 401
+
+    def test_03_logout_and_kid_deletion_revoke(self, bearer, make_app):
+        """Revoked sessions and deleted kids are rejected immediately"""
+        with TestClient(make_app(jwt_secret=SECRET)) as client:
+            session, kid = start(client, bearer)
+            kid_session = client.post("/api/auth/kid-login", json={"parent_email": "p@x.com", "kid_name": "Ann", "pin": "1234"}).json()
+            assert client.get("/api/kid/wallet", headers=bearer(kid_session["token"])).status_code == 200
+            assert client.delete(f"/api/kids/{kid['id']}", headers=bearer(session["token"])).status_code == 200
+            assert client.get("/api/kid/wallet", headers=bearer(kid_session["token"])).status_code == 401
+            assert client.post("/api/tasks", json={"kid_id": kid["id"], "title": "T", "reward_amount": 1}, headers=bearer(session["token"])).status_code == 404
+            assert client.post("/api/auth/logout", headers=bearer(session["token"])).status_code == 200
+            assert client.get("/api/kids", headers=bearer(session["token"])).status_code == 401
+
+
+class TestRevocationList:
+    """Cross-worker sync"""
+
+    def test_01_sync_picks_up_other_workers(self):
+        """A revocation from worker A is seen by worker B after its sync"""
+        collection = MemoryCollection("revocations")
+        worker_a = tokens.RevocationList(lambda: collection, sync_interval=60)
+        worker_b = tokens.RevocationList(lambda: collection, sync_interval=60)
+
+        async def scenario():
+            await worker_b.sync()
+            await worker_a.revoke("sid-1")
+            await worker_b.sync()
+            before = worker_b.is_revoked({"sid": "sid-1"})
+            await worker_b.sync(force=True)
+            return before, worker_b.is_revoked({"sid": "sid-1"}), worker_b.is_revoked({"sid": "sid-2"})
+
+        assert asyncio.run(scenario()) == (False, True, False)
@@ -0,0 +1,167 @@
+"""
+Tests for the transaction write buffer:
+- Inserts coalesce into batches by size and by time window
+- A kid's reads flush that kid's queued writes first
+- Failed batches are kept for retry and shutdown flushes what is left
+- Background flush failures never reach the caller and are retried on a timer
+- Background flushes do not inherit the triggering request's routing view
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import routing  # noqa: E402
+import server  # noqa: E402
+import write_buffer  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+
+
+class TestBatching:
+    """Coalescing inserts"""
+
+    def test_01_size_and_window(self):
+        """Full batches write immediately and the remainder after max_delay"""
+        db = MemoryRepository()
+        calls = []
+        insert_many = db.transactions.insert_many
+
+        async def counting(docs, **kwargs):
+            calls.append(len(docs))
+            return await insert_many(docs, **kwargs)
+
+        db.transactions.insert_many = counting
+
+        async def scenario():
+            buffer = write_buffer.WriteBuffer(lambda: db.transactions, max_batch=100, max_delay=0.01)
+            for i in range(250):
+                await buffer.add({"id": str(i), "kid_id": f"k{i % 5}"})
+            written = await db.transactions.count_documents({})
+            await asyncio.sleep(0.05)
+            return buffer.stats(), written, await db.transactions.count_documents({})
+
+        stats, before_window, after_window = asyncio.run(scenario())
+        print(f"✓ {stats}")
+        assert calls == [100, 100, 50]
+        assert (before_window, after_window) == (200, 250)
+        assert stats["pending"] == 0 and stats["largest_batch"] == 100 and stats["mean_batch"] == 83.3
+        assert stats["max_latency_ms"] > 0
+
+    def test_02_flush_kid(self):
+        """Only kids with queued documents trigger a flush"""
+        db = MemoryRepository()
+
+        async def scenario():
+            buffer = write_buffer.WriteBuffer(lambda: db.transactions, max_batch=100, max_delay=60)
+            await buffer.add({"id": "1", "kid_id": "a"})
+            await buffer.flush_kid("b")
+            untouched = await db.transactions.count_documents({})
+            await buffer.flush_kid("a")
+            await buffer.close()
+            return untouched, await db.transactions.count_documents({"kid_id": "a"}), buffer.pending("a")
+
+        assert asyncio.run(scenario()) == (0, 1, 0)
+
+    def test_03_failed_batch_is_retried(self):
+        """A failed insert keeps its documents queued for the next flush"""
+        db = MemoryRepository()
+        insert_many = db.transactions.insert_many
+        attempts = []
+
+        async def flaky(docs, **kwargs):
+            attempts.append(len(docs))
+            if len(attempts) == 1:
+                raise ConnectionError("primary stepped down")
+            return await insert_many(docs, **kwargs)
+
+        db.transactions.insert_many = flaky
+
+        async def scenario():
+            buffer = write_buffer.WriteBuffer(lambda: db.transactions, max_batch=10, max_delay=60)
+            for i in range(3):
+                await buffer.add({"id": str(i), "kid_id": "a"})
+            with pytest.raises(ConnectionError):
+                await buffer.flush()
+            queued = buffer.pending("a")
+            await buffer.close()
+            return queued, buffer.stats(), await db.transactions.count_documents({})
+
+        queued, stats, written = asyncio.run(scenario())
+        assert (queued, written, attempts) == (3, 3, [3, 3])
+        assert stats["failures"] == 1 and stats["documents"] == 3
+
+    def test_04_background_failures_retry(self):
+        """A failed size-triggered flush does not raise from add(), and failed timed flushes reschedule"""
+        db = MemoryRepository()
+        insert_many = db.transactions.insert_many
+        attempts = []
+
+        async def flaky(docs, **kwargs):
+            attempts.append(len(docs))
+            if len(attempts) <= 2:
+                raise ConnectionError("primary stepped down")
+            return await insert_many(docs, **kwargs)
+
+        db.transactions.insert_many = flaky
+
+        async def scenario():
+            buffer = write_buffer.WriteBuffer(lambda: db.transactions, max_batch=2, max_delay=0.01)
+            await buffer.add({"id": "1", "kid_id": "a"})
+            await buffer.add({"id": "2", "kid_id": "a"})
+            queued = buffer.pending("a")
+            await asyncio.sleep(0.2)
+            return queued, buffer.stats(), await db.transactions.count_documents({})
+
+        queued, stats, written = asyncio.run(scenario())
+        assert (queued, written, attempts) == (2, 2, [2, 2, 2])
+        assert stats["failures"] == 2 and stats["pending"] == 0
+
+
+    def test_05_background_flushes_leave_the_request_view(self):
+        """Timed and size-triggered flushes resolve the collection without the caller's session view"""
+        db = MemoryRepository()
+        seen = []
+
+        def collection():
+            seen.append(routing._current_view.get())
+            return db.transactions
+
+        async def scenario():
+            buffer = write_buffer.WriteBuffer(collection, max_batch=2, max_delay=0.01)
+            token = routing._current_view.set("request view")
+            try:
+                await buffer.add({"id": "1", "kid_id": "a"})
+                await buffer.add({"id": "2", "kid_id": "a"})
+                await buffer.add({"id": "3", "kid_id": "b"})
+                await asyncio.sleep(0.05)
+            finally:
+                routing._current_view.reset(token)
+            return await db.transactions.count_documents({})
+
+        assert asyncio.run(scenario()) == 3
+        assert seen == [None, None]
+
+
+class TestBufferedAPI:
+    """Buffered transaction log behind the API"""
+
+    def test_01_reads_see_buffered_writes(self, bearer, make_app):
+        """Transactions written through the buffer show up on the kid's next read and survive shutdown"""
+        app = make_app(transaction_buffer_enabled=True, transaction_buffer_max_delay_seconds=60)
+        with TestClient(app) as client:
+            token = client.post("/api/auth/signup", json={"full_name": "P", "email": "p@x.com", "password": "pw"}).json()["token"]
+            kid = client.post("/api/kids", json={"name": "Ann", "age": 9, "pin": "1234"}, headers=bearer(token)).json()
+            for title in ("One", "Two"):
+                task = client.post("/api/tasks", json={"kid_id": kid["id"], "title": title, "reward_amount": 5, "approval_required": False}, headers=bearer(token)).json()
+                client.put(f"/api/tasks/{task['id']}/complete", headers=bearer(token))
+            assert server.transaction_buffer.pending(kid["id"]) == 2
+            history = client.get(f"/api/wallet/{kid['id']}/transactions", headers=bearer(token)).json()
+            assert [t["amount"] for t in history] == [5, 5]
+            third = client.post("/api/tasks", json={"kid_id": kid["id"], "title": "Three", "reward_amount": 7, "approval_required": False}, headers=bearer(token)).json()
+            client.put(f"/api/tasks/{third['id']}/complete", headers=bearer(token))
+            buffer, repo = server.transaction_buffer, server.db
+        assert buffer.pending() == 0
+        assert asyncio.run(repo.transactions.count_documents({"kid_id": kid["id"]})) == 3
@@ -0,0 +1,82 @@
+"""Short-lived access tokens, refresh tokens and the revocation list.
+
+Access tokens carry the claims handlers need (user_id, role, kid_id for
+kids, owned kid_ids for parents, and the session id), so authorizing a
+request needs no principal lookup. Revocations (logout, deleted kids) are
+written to a TTL-indexed collection and mirrored in an in-process set that
+each worker refreshes at most every sync_interval seconds. An entry only
+has to outlive the access tokens it blocks; refresh always re-reads the
+session from the database.
+"""
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+ACCESS = "access"
+REFRESH = "refresh"
+ALGORITHM = "HS256"
+MAX_KID_CLAIMS = 50
+
+
+def encode(secret, claims, ttl, typ):
+    now = datetime.now(timezone.utc)
+    payload = {**claims, "typ": typ, "jti": uuid.uuid4().hex, "iat": now, "exp": now + timedelta(seconds=ttl)}
+    return jwt.encode(payload, secret, algorithm=ALGORITHM)
+
+
+def decode(secret, token):
+    return jwt.decode(token, secret, algorithms=[ALGORITHM])
+
+
+def access_claims(user_id, role, sid, kid_id=None, kid_ids=None):
+    claims = {"user_id": user_id, "role": role, "sid": sid}
+    if kid_id:
+        claims["kid_id"] = kid_id
+    if kid_ids is not None and len(kid_ids) <= MAX_KID_CLAIMS:
+        claims["kid_ids"] = list(kid_ids)
+    return claims
+
+
+class RevocationList:
+    def __init__(self, get_collection, ttl=900, sync_interval=5, clock=time.monotonic):
+        self.get_collection = get_collection
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.clock = clock
+        self._revoked = {}
+        self._cursor = ""
+        self._next_sync = 0.0
+
+    async def ensure_indexes(self):
+        await self.get_collection().create_index("expires_at", expireAfterSeconds=0)
+        await self.get_collection().create_index("created_at")
+
+    async def revoke(self, value):
+        """Block a session id or subject (kid id) for one access-token lifetime."""
+        now = datetime.now(timezone.utc)
+        await self.get_collection().insert_one({"value": value, "created_at": now.isoformat(), "expires_at": now + timedelta(seconds=self.ttl)})
+        self._revoked[value] = self.clock() + self.ttl
+
+    async def sync(self, force=False):
+        now = self.clock()
+        if not force and now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        window_start = (datetime.now(timezone.utc) - timedelta(seconds=self.ttl)).isoformat()
+        since = max(self._cursor, window_start)
+        cursor = self.get_collection().find({"created_at": {"$gte": since}}, {"_id": 0, "value": 1, "created_at": 1}).sort("created_at", 1)
+        async for entry in cursor:
+            self._revoked[entry["value"]] = now + self.ttl
+            self._cursor = entry["created_at"]
+        self._revoked = {value: until for value, until in self._revoked.items() if until > now}
+
+    def is_revoked(self, claims):
+        return any(claims.get(field) in self._revoked for field in ("sid", "kid_id"))
+
+    def __contains__(self, value):
+        return value in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
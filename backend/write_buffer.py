@@ -0,0 +1,149 @@
+"""Write-behind buffer that coalesces inserts into insert_many batches.
+
+add() queues a document and returns; the queue is written as one
+unordered insert_many when it reaches max_batch documents or max_delay
+seconds after the first queued document, whichever comes first. Flushes
+run one at a time, so flush_kid() -- called before reading a kid's
+documents -- also waits for a batch already in flight and a kid always
+reads their own writes. close() writes whatever is left on shutdown.
+A failed background flush (timed or size-triggered from add()) is logged
+and its documents stay queued; a new timer retries them with doubling
+delay up to MAX_RETRY_DELAY, so add() never fails after the caller has
+already moved money. Background flushes run in a fresh context: their
+batch holds other callers' documents, so they must not pick up the
+request-scoped state (routing's session view) of whoever triggered them.
+stats() reports batch sizes and the latency the buffer added between
+add() and the end of the insert.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+MAX_RETRY_DELAY = 5.0
+
+
+class WriteBuffer:
+    def __init__(self, get_collection, max_batch=500, max_delay=0.05, key="kid_id", clock=time.monotonic):
+        self.get_collection = get_collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.key = key
+        self.clock = clock
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._retry_delay = None
+        self._keys = {}
+        self.batches = 0
+        self.documents = 0
+        self.largest_batch = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _track(self, doc, step):
+        value = doc.get(self.key)
+        count = self._keys.get(value, 0) + step
+        if count > 0:
+            self._keys[value] = count
+        else:
+            self._keys.pop(value, None)
+
+    async def add(self, doc):
+        self._pending.append((doc, self.clock()))
+        self._track(doc, 1)
+        if len(self._pending) >= self.max_batch:
+            await self._detached(self._flush_in_background())
+        self._schedule()
+
+    def _detached(self, coro):
+        return asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+
+    def _schedule(self):
+        if self._pending and self._timer is None:
+            self._timer = self._detached(self._flush_later(self._retry_delay or self.max_delay))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self._flush_in_background()
+        self._schedule()
+
+    async def _flush_in_background(self):
+        try:
+            await self.flush()
+        except Exception:
+            self._retry_delay = min(MAX_RETRY_DELAY, 2 * (self._retry_delay or self.max_delay))
+            logger.exception("Buffered insert failed; %d documents queued for retry in %.2fs", len(self._pending), self._retry_delay)
+        else:
+            self._retry_delay = None
+
+    def pending(self, value=None):
+        return len(self._pending) if value is None else self._keys.get(value, 0)
+
+    async def flush_kid(self, value):
+        """Write any queued or in-flight documents for one key value before a read."""
+        if value in self._keys:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                await self.get_collection().insert_many([doc for doc, _ in batch], ordered=False)
+            except BulkWriteError as exc:
+                # Unordered: everything except the reported failures was written.
+                # A duplicate key means an earlier attempt already wrote the document.
+                failed = {error["index"] for error in exc.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY}
+                self._record([entry for index, entry in enumerate(batch) if index not in failed])
+                if failed:
+                    self._retry([entry for index, entry in enumerate(batch) if index in failed])
+                    raise
+            except Exception:
+                self._retry(batch)
+                raise
+            else:
+                self._record(batch)
+            return len(batch)
+
+    def _retry(self, entries):
+        self.failures += 1
+        self._pending[:0] = entries
+
+    def _record(self, batch):
+        now = self.clock()
+        for doc, queued_at in batch:
+            self._track(doc, -1)
+            waited = now - queued_at
+            self.total_latency += waited
+            self.max_latency = max(self.max_latency, waited)
+        self.batches += 1
+        self.documents += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        logger.info("Write buffer closed: %s", self.stats())
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "documents": self.documents,
+            "largest_batch": self.largest_batch,
+            "mean_batch": round(self.documents / self.batches, 1) if self.batches else 0,
+            "mean_latency_ms": round(1000 * self.total_latency / self.documents, 2) if self.documents else 0,
+            "max_latency_ms": round(1000 * self.max_latency, 2),
+            "failures": self.failures,
+        }
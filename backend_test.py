@@ -4,11 +4,13 @@ import requests
 import json
 import sys
 from datetime import datetime
+from pathlib import Path
 import uuid
 
 class KidsMoneyAPITester:
-    def __init__(self, base_url="https://finlit-firebase-app.preview.emergentagent.com/api"):
+    def __init__(self, base_url="https://finlit-firebase-app.preview.emergentagent.com/api", http=requests):
         self.base_url = base_url
+        self.http = http
         self.token = None
         self.test_user_email = f"test_{int(datetime.now().timestamp())}@example.com"
         self.test_user_password = "TestPass123!@#"
@@ -49,13 +51,13 @@ class KidsMoneyAPITester:
 
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers)
+                response = self.http.get(url, headers=headers)
             elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers)
+                response = self.http.post(url, json=data, headers=headers)
             elif method == 'PUT':
-                response = requests.put(url, json=data, headers=headers)
+                response = self.http.put(url, json=data, headers=headers)
             elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
+                response = self.http.delete(url, headers=headers)
             else:
                 raise ValueError(f"Unsupported method: {method}")
 
@@ -442,7 +444,7 @@ class KidsMoneyAPITester:
             {
                 "kid_id": self.test_kid_id,
                 "story_id": "story-1",
-                "score": 3
+                "answers": [0, 1, 1]
             },
             200
         )
@@ -547,9 +549,24 @@ class KidsMoneyAPITester:
             "test_results": self.test_results
         }
 
+def in_process_client():
+    """Serve the API from this process on the in-memory backend"""
+    sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+    from fastapi.testclient import TestClient
+    import server
+    from settings import Settings
+
+    app = server.create_app(Settings(backend="memory", jwt_secret=uuid.uuid4().hex))
+    client = TestClient(app)
+    client.__enter__()
+    return client
+
 def main():
     """Main test execution"""
-    tester = KidsMoneyAPITester()
+    if "--in-process" in sys.argv:
+        tester = KidsMoneyAPITester("http://testserver/api", http=in_process_client())
+    else:
+        tester = KidsMoneyAPITester()
     summary = tester.run_all_tests()
     
     # Return appropriate exit code